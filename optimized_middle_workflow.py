@@ -16,22 +16,34 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 import logging
-import librosa
-import soundfile as sf
 import concurrent.futures
 import threading
 
 from typing import Dict
-import shutil
 
 from src.ai.advanced_audio_processor import AdvancedAudioProcessor
 from src.ai.advanced_key_detector import AdvancedKeyDetector
+from src.core.audio_cache import load_audio_range
+from src.core.audio_io import probe
+from src.core.audio_buffer import AudioBuffer
+from src.core.shared_audio import resolve_audio_buffer
+from src.core.artifact_writer import ArtifactWriter
+from src.core.beat_index import lookup_beat
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
-def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, output_dir: str = None) -> Dict:
-    """Chạy workflow cắt 30s (15-45s), tách giọng, detect key, so sánh & chấm điểm."""
+def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, output_dir: str = None,
+                 save_artifacts: bool = True, beat_buffer=None) -> Dict:
+    """Chạy workflow cắt 30s (15-45s), tách giọng, detect key, so sánh & chấm điểm.
+
+    Các bước truyền AudioBuffer trong bộ nhớ; save_artifacts=False bỏ qua
+    việc ghi file slice/vocals ra output_dir. beat_buffer (AudioBuffer hoặc
+    handle SharedAudioBuffer khi chạy trong worker process) thay cho việc
+    decode lại beat_file.
+    """
+    beat_buffer = resolve_audio_buffer(beat_buffer)
+
     # 0) Chuẩn bị thư mục xuất
     if output_dir is None:
         output_dir = os.path.join(os.path.dirname(__file__), 'Audio_separator_ui', 'clean_song_output')
@@ -39,46 +51,60 @@ def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, outp
 
     base_stem = os.path.splitext(os.path.basename(karaoke_file))[0]
 
+    # Artifact được ghi ở background, song song với tách giọng / detect key
+    writer = ArtifactWriter()
+
+    def finish(result: Dict) -> Dict:
+        """Chờ ghi artifact xong, đưa lỗi ghi file (nếu có) vào result"""
+        artifact_errors = writer.wait()
+        writer.close()
+        if artifact_errors:
+            result["artifact_errors"] = artifact_errors
+            for field in ("sliced_karaoke", "vocals_export"):
+                if result.get(field) in artifact_errors:
+                    result[field] = None
+        return result
+
     # 1) Cắt audio thông minh dựa trên độ dài file
     try:
-        audio, sr = librosa.load(karaoke_file, sr=None, mono=True)
-        total_duration = len(audio) / sr
+        # Chỉ đọc header để lấy độ dài, sau đó decode đúng đoạn cần cắt
+        info = probe(karaoke_file)
+        total_duration = info['duration']
         
-        logger.info(f"📊 File duration: {total_duration:.2f}s")
+        logger.info(f"📊 File duration: {total_duration:.2f}s "
+                    f"({info['sample_rate']}Hz, {info['channels'] or '?'} kênh)")
         
         # Logic cắt thông minh
         if total_duration <= duration:
             # File ngắn: sử dụng toàn bộ file
             logger.info(f"📁 File ngắn ({total_duration:.2f}s ≤ {duration}s), sử dụng toàn bộ file")
             start_t = 0.0
-            end_t = total_duration
-            slice_audio = audio
+            end_t = None
         elif total_duration <= 60.0:
             # File trung bình: cắt từ giữa
             logger.info(f"📁 File trung bình ({total_duration:.2f}s), cắt từ giữa")
             start_t = max(0, (total_duration - duration) / 2)
             end_t = start_t + duration
-            start_sample = int(start_t * sr)
-            end_sample = int(end_t * sr)
-            slice_audio = audio[start_sample:end_sample]
         else:
             # File dài: cắt từ 15s như cũ
             logger.info(f"📁 File dài ({total_duration:.2f}s), cắt từ 15s")
             start_t = 15.0
             end_t = start_t + duration
-            start_sample = int(start_t * sr)
-            end_sample = int(end_t * sr)
-            slice_audio = audio[start_sample:end_sample]
         
-        # Lưu file đã cắt
-        actual_duration = len(slice_audio) / sr
-        sliced_path = os.path.join(output_dir, f"{base_stem}_slice_{int(start_t)}s_{int(start_t + actual_duration)}s.wav")
-        sf.write(sliced_path, slice_audio, sr)
+        slice_audio, sr = load_audio_range(karaoke_file, start_t, end_t, sr=None, mono=True)
+        slice_buffer = AudioBuffer(slice_audio, sr, path=karaoke_file if end_t is None else None, offset=start_t)
+        
+        # Lưu file đã cắt (artifact, không dùng lại ở các bước sau)
+        actual_duration = slice_buffer.duration
+        sliced_path = None
+        if save_artifacts:
+            sliced_path = os.path.join(output_dir, f"{base_stem}_slice_{int(start_t)}s_{int(start_t + actual_duration)}s.wav")
+            writer.write_audio(sliced_path, slice_audio, sr)
         
         logger.info(f"✅ Đã cắt audio: {actual_duration:.2f}s từ {start_t:.1f}s")
         
     except Exception as e:
-        return {"success": False, "error": f"Lỗi cắt audio: {e}"}
+        return finish({"success": False, "error": f"Lỗi cắt audio: {e}"})
 
     # 2) Khởi tạo Key Detector và bắt đầu Beat Key Detection ngay lập tức
     logger.info("🎼 Khởi tạo Key Detector và bắt đầu Beat Key Detection...")
@@ -90,26 +116,38 @@ def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, outp
     else:
         logger.info("💻 GPU acceleration DISABLED, using CPU")
     
+    def detect_beat(audio_type):
+        # Key của beat được cache theo nội dung file: beat dùng lại không phải phân tích lại
+        if beat_buffer is not None:
+            return keydet.detect_key_cached(beat_file, audio_type, audio=beat_buffer.audio, sr=beat_buffer.sr)
+        return keydet.detect_key_cached(beat_file, audio_type)
+    
+    # Beat trong beat index: key đã tính offline, không phân tích beat online
+    beat_analysis = lookup_beat(beat_file)
+    
     def detect_beat_key():
         """Detect key cho beat với focus vào accuracy"""
+        if beat_analysis is not None and beat_analysis.key is not None:
+            logger.info(f"📇 Beat key từ beat index: {beat_analysis.key['key']}")
+            return dict(beat_analysis.key)
         try:
             logger.info(f"🎵 Đang phát hiện key cho beat...")
             # Sử dụng audio_type='beat' để trigger beat-specific analysis
-            result = keydet.detect_key(beat_file, audio_type='beat')
+            result = detect_beat('beat')
             if result and 'key' in result:
                 logger.info(f"✅ Beat key detected: {result['key']}")
                 return result
             else:
                 # Fallback: thử với instrumental
                 logger.info("🔄 Fallback: thử với audio_type='instrumental'...")
-                result = keydet.detect_key(beat_file, audio_type='instrumental')
+                result = detect_beat('instrumental')
                 if result and 'key' in result:
                     logger.info(f"✅ Beat key detected (fallback): {result['key']}")
                     return result
                 else:
                     # Final fallback: vocals method
                     logger.info("🔄 Final fallback: thử với audio_type='vocals'...")
-                    result = keydet.detect_key(beat_file, audio_type='vocals')
+                    result = detect_beat('vocals')
                     if result and 'key' in result:
                         logger.info(f"✅ Beat key detected (final fallback): {result['key']}")
                         return result
@@ -117,35 +155,30 @@ def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, outp
             logger.warning(f"Beat key detection failed: {e}")
         return None
     
+    vocals_export = None
+    if save_artifacts:
+        vocals_export = os.path.join(output_dir, f"{base_stem}_slice_vocals.wav")
+    
     def separate_vocals():
-        """Tách giọng từ đoạn audio đã cắt"""
+        """Tách giọng từ đoạn audio đã cắt (trong bộ nhớ)"""
         try:
             logger.info("🎤 Bắt đầu tách giọng hát...")
             audio_proc = AdvancedAudioProcessor(fast_mode=False)
-            vocals_path = audio_proc.separate_vocals(sliced_path)
-            if not vocals_path or not os.path.exists(vocals_path):
-                return None, None
-            
-            # Xuất/copy vocals đã tách ra output_dir
-            vocals_ext = os.path.splitext(vocals_path)[1]
-            vocals_export = os.path.join(output_dir, f"{base_stem}_slice_vocals{vocals_ext}")
-            try:
-                shutil.copy2(vocals_path, vocals_export)
-            except Exception:
-                # fallback: nếu copy fail vẫn dùng vocals_path gốc
-                vocals_export = vocals_path
+            vocals = audio_proc.separate_vocals_array(slice_buffer, output_path=vocals_export, writer=writer)
+            if vocals is None or len(vocals.audio) == 0:
+                return None
             
             logger.info("✅ Tách giọng hoàn thành!")
-            return vocals_path, vocals_export
+            return vocals
         except Exception as e:
             logger.warning(f"Vocal separation failed: {e}")
-            return None, None
+            return None
     
-    def detect_vocals_key(vocals_export):
+    def detect_vocals_key(vocals):
         """Detect key cho vocals"""
         try:
             logger.info("🎤 Đang phát hiện key cho vocals...")
-            result = keydet.detect_key(vocals_export, audio_type='vocals')
+            result = keydet.detect_key_array(vocals.audio, vocals.sr, audio_type='vocals', audio_path=vocals.path)
             logger.info(f"✅ Vocals key detected: {result.get('key', 'Unknown')}")
             return result
         except Exception as e:
@@ -165,16 +198,16 @@ def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, outp
         logger.info("🎉 Beat key detection hoàn thành!")
         
         # Chờ vocal separation hoàn thành
-        vocals_path, vocals_export = vocals_sep_future.result()
-        if not vocals_export:
-            return {"success": False, "error": "Tách giọng thất bại"}
+        vocals = vocals_sep_future.result()
+        if vocals is None:
+            return finish({"success": False, "error": "Tách giọng thất bại"})
         
         # Detect vocals key sau khi separation hoàn thành
-        vocals_key = detect_vocals_key(vocals_export)
+        vocals_key = detect_vocals_key(vocals)
     
     logger.info("🎉 Hoàn thành tất cả key detection!")
     if not (vocals_key and 'key' in vocals_key and beat_key and 'key' in beat_key):
-        return {"success": False, "error": "Phát hiện key thất bại"}
+        return finish({"success": False, "error": "Phát hiện key thất bại"})
 
     # 4) So sánh key và tính điểm đơn giản
     v_key = vocals_key['key']
@@ -188,16 +221,16 @@ def run_workflow(karaoke_file: str, beat_file: str, duration: float = 30.0, outp
         score = 50.0
         match = False
 
-    return {
+    return finish({
         "success": True,
         "inputs": {"karaoke_file": karaoke_file, "beat_file": beat_file},
         "sliced_karaoke": sliced_path,
-        "vocals_src": vocals_path,
+        "vocals_src": vocals.path,
         "vocals_export": vocals_export,
         "vocals_key": vocals_key,
         "beat_key": beat_key,
         "key_compare": {"match": match, "similarity": similarity, "score": score}
-    }
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark key detection: hybrid đầy đủ so với cascade (early exit)
+
+Với mỗi file, chạy hybrid 'full' và 'cascade' ở từng ngưỡng margin, đo thời
+gian và so kết quả với nhãn (nếu có --labels) hoặc với kết quả của 'full'.
+
+Cách dùng:
+    python scripts/benchmark_key_cascade.py beat1.mp3 beat2.mp3 --audio-type beat
+    python scripts/benchmark_key_cascade.py assets/audio/*.mp3 --labels labels.csv --margins 0.05 0.1 0.2
+
+labels.csv: mỗi dòng "path,key,scale" (ví dụ "assets/audio/test.mp3,A,minor")
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.audio_cache import load_audio
+from src.core.config import KEY_CONFIG
+from src.ai.advanced_key_detector import AdvancedKeyDetector
+
+
+def load_labels(path):
+    """{abspath: 'A minor'} từ file CSV path,key,scale"""
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) >= 3 and not row[0].startswith('#'):
+                labels[os.path.abspath(row[0].strip())] = f"{row[1].strip()} {row[2].strip()}"
+    return labels
+
+
+def run_once(detector, audio, sr, audio_type, audio_path, mode):
+    # Bản copy để FeatureBank không dùng lại đặc trưng của lần chạy trước
+    start = time.perf_counter()
+    result = detector.detect_key_array(audio.copy(), sr, audio_type, audio_path=audio_path, mode=mode)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid vs cascade key detection")
+    parser.add_argument('files', nargs='+', help="Audio files")
+    parser.add_argument('--audio-type', default='beat', choices=['beat', 'vocals', 'general'])
+    parser.add_argument('--labels', help="CSV path,key,scale with ground-truth keys")
+    parser.add_argument('--margins', nargs='+', type=float, default=[KEY_CONFIG['cascade_margin']],
+                        help="Cascade margin thresholds to evaluate")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    labels = load_labels(args.labels) if args.labels else {}
+    detector = AdvancedKeyDetector()
+
+    configs = [('full', None)] + [('cascade', margin) for margin in args.margins]
+    stats = {config: {'time': 0.0, 'correct': 0, 'early': 0} for config in configs}
+    n_files = 0
+
+    for path in args.files:
+        try:
+            audio, sr = load_audio(path, sr=22050)
+        except Exception as e:
+            print(f"❌ {path}: {e}")
+            continue
+        n_files += 1
+
+        results = {}
+        for config in configs:
+            mode, margin = config
+            if margin is not None:
+                KEY_CONFIG['cascade_margin'] = margin
+            result, elapsed = run_once(detector, audio, sr, args.audio_type, path, mode)
+            results[config] = result
+            stats[config]['time'] += elapsed
+            stats[config]['early'] += result.get('path') == 'cascade:template'
+
+        # Nhãn thật nếu có, nếu không thì lấy kết quả full làm chuẩn
+        reference = labels.get(os.path.abspath(path))
+        if reference is None:
+            reference = f"{results[('full', None)]['key']} {results[('full', None)]['scale']}"
+        for config, result in results.items():
+            stats[config]['correct'] += f"{result['key']} {result['scale']}" == reference
+
+        print(f"🎵 {os.path.basename(path)}: " + ", ".join(
+            f"{mode}{'' if margin is None else f'@{margin}'}={r['key']} {r['scale']} ({r.get('path', '?')})"
+            for (mode, margin), r in results.items()))
+
+    if not n_files:
+        return
+
+    reference_name = 'labels' if labels else 'full'
+    print(f"\n📊 {n_files} files, accuracy vs {reference_name}")
+    print(f"{'config':<16}{'mean time (s)':>15}{'accuracy':>10}{'early exit':>12}")
+    for (mode, margin), s in stats.items():
+        name = mode if margin is None else f"{mode}@{margin}"
+        print(f"{name:<16}{s['time'] / n_files:>15.2f}{s['correct'] / n_files:>10.1%}"
+              f"{s['early'] / n_files:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
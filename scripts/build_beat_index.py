@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build beat index: phân tích trước toàn bộ thư viện beat
+
+Duyệt các thư mục beat, với mỗi file tính hash nội dung, fingerprint PCM, key
+/ scale (AdvancedKeyDetector, audio_type='beat'), tempo và lưới beat, chroma
+trung bình và F0 tham chiếu, rồi lưu vào beat index (src.core.beat_index).
+Online, run_workflow / process_karaoke_optimized / KaraokeScoringSystem dùng
+index này thay cho việc phân tích beat.
+
+Cách dùng:
+    python scripts/build_beat_index.py assets/beats
+    python scripts/build_beat_index.py beats1/ beats2/ --index cache/beat_index.npz --rebuild
+    python scripts/build_beat_index.py --list
+
+File đã có trong index và không đổi (cùng path, kích thước, mtime) được bỏ qua.
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.config import CACHE_CONFIG
+from src.core.beat_index import BeatIndex, analyze_beat
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a', '.ogg', '.aac')
+
+
+def find_audio_files(roots, extensions=AUDIO_EXTENSIONS):
+    """Audio files under the given directories (or the files themselves), sorted"""
+    files = []
+    for root in roots:
+        if os.path.isfile(root):
+            files.append(root)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            files += [os.path.join(dirpath, name) for name in filenames
+                      if name.lower().endswith(extensions)]
+    return sorted(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute beat analysis for the beat catalog")
+    parser.add_argument('paths', nargs='*', help="Beat directories or files")
+    parser.add_argument('--index', default=CACHE_CONFIG['beat_index_path'], help="Index file (.npz)")
+    parser.add_argument('--rebuild', action='store_true', help="Re-analyse beats that are already indexed")
+    parser.add_argument('--no-key', action='store_true', help="Skip key detection (features only)")
+    parser.add_argument('--save-every', type=int, default=20, help="Write the index every N new beats")
+    parser.add_argument('--list', action='store_true', help="Print the indexed beats and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    index = BeatIndex(args.index)
+
+    if args.list:
+        for entry in index:
+            key = f"{entry.key['key']} {entry.key['scale']}" if entry.key else '?'
+            print(f"{entry.digest[:12]}  {key:<9} {entry.tempo:6.1f} BPM  {entry.duration:7.1f}s  {entry.path}")
+        print(f"📇 {len(index)} beats in {args.index}")
+        return
+
+    if not args.paths:
+        parser.error("no beat directories given")
+
+    key_detector = None
+    if not args.no_key:
+        from src.ai.advanced_key_detector import AdvancedKeyDetector
+        key_detector = AdvancedKeyDetector()
+
+    files = find_audio_files(args.paths)
+    added = skipped = failed = 0
+    start = time.perf_counter()
+    for i, path in enumerate(files, 1):
+        if not args.rebuild and index.lookup(path) is not None:
+            skipped += 1
+            continue
+        try:
+            t0 = time.perf_counter()
+            entry = analyze_beat(path, key_detector)
+        except Exception as e:
+            failed += 1
+            print(f"❌ [{i}/{len(files)}] {path}: {e}")
+            continue
+        index.add(entry)
+        added += 1
+        key = f"{entry.key['key']} {entry.key['scale']}" if entry.key else '?'
+        print(f"✅ [{i}/{len(files)}] {os.path.basename(path)}: {key}, {entry.tempo:.1f} BPM "
+              f"({time.perf_counter() - t0:.1f}s)")
+        if added % args.save_every == 0:
+            index.save(args.index)
+
+    if added:
+        index.save(args.index)
+    print(f"\n📇 {len(index)} beats in {args.index}: {added} added, {skipped} unchanged, {failed} failed "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,14 @@ import onnxruntime as ort
 from typing import Tuple, Optional, Union
 import warnings
 import logging
+from src.core.audio_cache import load_audio
 warnings.filterwarnings("ignore")
 
 # Import Audio Separator Integration
 from src.ai.audio_separator_integration import AudioSeparatorIntegration
+from src.core.audio_buffer import AudioBuffer
+from src.core.feature_bank import get_feature_bank
+from src.core.file_hash import file_hash
 
 logger = logging.getLogger(__name__)
 
@@ -60,7 +64,7 @@ class AdvancedAudioProcessor:
     def load_audio(self, file_path: str, sample_rate: int = 44100) -> Tuple[np.ndarray, int]:
         """Tải file âm thanh"""
         try:
-            audio, sr = librosa.load(file_path, sr=sample_rate)
+            audio, sr = load_audio(file_path, sr=sample_rate)
             return audio, sr
         except Exception as e:
             raise Exception(f"Lỗi khi tải file âm thanh: {e}")
@@ -69,7 +73,7 @@ class AdvancedAudioProcessor:
         """Chuyển đổi file âm thanh thành stereo WAV"""
         try:
             # Tải âm thanh
-            audio, sr = librosa.load(input_path, sr=44100, mono=False)
+            audio, sr = load_audio(input_path, sr=44100, mono=False)
             
             # Đảm bảo là stereo
             if len(audio.shape) == 1:
@@ -98,13 +102,11 @@ class AdvancedAudioProcessor:
             # Chuyển đổi file thành định dạng phù hợp
             converted_path = self.convert_to_stereo_and_wav(audio_path)
             
-            # Tạo hash cho file
-            import hashlib
-            with open(converted_path, 'rb') as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
+            # Tạo hash cho file (lấy mẫu, không đọc lại cả file)
+            song_hash = file_hash(converted_path, fast=True, length=32)
             
             # Tạo thư mục output
-            song_output_dir = os.path.join(self.output_dir, f"{file_hash}_mdx")
+            song_output_dir = os.path.join(self.output_dir, f"{song_hash}_mdx")
             os.makedirs(song_output_dir, exist_ok=True)
             
             # Sử dụng phương pháp đơn giản hóa từ Audio Separator
@@ -158,10 +160,10 @@ class AdvancedAudioProcessor:
         """Phương pháp tách giọng fallback"""
         try:
             # Tải âm thanh
-            audio, sr = librosa.load(audio_path, sr=44100)
+            audio, sr = load_audio(audio_path, sr=44100)
             
             # Sử dụng harmonic-percussive separation
-            harmonic, percussive = librosa.effects.hpss(audio)
+            harmonic, percussive = get_feature_bank(audio, sr).hpss()
             
             # Harmonic component thường chứa giọng hát
             vocals = harmonic
@@ -187,7 +189,7 @@ class AdvancedAudioProcessor:
             audio, sr = self.load_audio(audio_path)
             
             # Sử dụng harmonic-percussive separation
-            harmonic, percussive = librosa.effects.hpss(audio)
+            harmonic, percussive = get_feature_bank(audio, sr).hpss()
             
             # Harmonic component thường chứa giọng hát
             vocals = harmonic
@@ -244,28 +246,16 @@ class AdvancedAudioProcessor:
             logger.info("⚡ Fast Mode: Tách giọng với tốc độ cao...")
             
             # Load audio với sample rate thấp hơn để tăng tốc
-            audio, sr = librosa.load(audio_path, sr=16000, mono=False)  # Giảm từ 22050 xuống 16000
-            
-            # Chuyển đổi sang mono nếu cần
-            if len(audio.shape) > 1:
-                audio = librosa.to_mono(audio)
-            
-            # Sử dụng HPSS với tham số tối ưu cho tốc độ
-            harmonic, percussive = librosa.effects.hpss(audio, margin=(1, 1))  # Giảm margin để tăng tốc
-            
-            # Kết hợp harmonic và một phần percussive để giữ vocals
-            vocals_audio = harmonic + 0.3 * percussive  # Thêm một chút percussive để giữ vocals
+            buffer = AudioBuffer.from_file(audio_path, sr=16000, mono=False)  # Giảm từ 22050 xuống 16000
+            vocals = self._separate_array_fast(buffer)
             
             # Tạo output path
             if output_path is None:
                 base_name = os.path.splitext(os.path.basename(audio_path))[0]
                 output_path = os.path.join(self.output_dir, f"{base_name}_vocals_fast.wav")
             
-            # Save vocals với sample rate thấp hơn
-            sf.write(output_path, vocals_audio, sr)
-            
-            # Đảm bảo đường dẫn là absolute path
-            output_path = os.path.abspath(output_path)
+            # Save vocals với sample rate thấp hơn (đường dẫn absolute)
+            output_path = vocals.write(output_path)
             
             logger.info(f"⚡ Fast vocals saved at: {output_path}")
             return output_path
@@ -274,34 +264,33 @@ class AdvancedAudioProcessor:
             logger.error(f"❌ Error in fast vocal separation: {e}")
             return self._separate_vocals_fallback(audio_path, output_path)
     
+    def _separate_array_fast(self, buffer: AudioBuffer) -> AudioBuffer:
+        """Fast Mode trên mảng: HPSS ở 16kHz"""
+        buffer = buffer.to_mono().resample(16000)
+        
+        # HPSS xấp xỉ (median filter trên spectrogram đã decimate) để tăng tốc
+        harmonic, percussive = buffer.features.hpss(margin=(1, 1), approximate=True)
+        
+        # Kết hợp harmonic và một phần percussive để giữ vocals
+        vocals_audio = harmonic + 0.3 * percussive  # Thêm một chút percussive để giữ vocals
+        return AudioBuffer(vocals_audio, buffer.sr, offset=buffer.offset)
+    
     def _separate_vocals_fallback(self, audio_path: str, output_path: Union[str, None] = None) -> str:
         """Fallback method sử dụng librosa"""
         try:
             logger.info("🔄 Sử dụng fallback method (librosa)...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=22050, mono=False)
-            
-            # Chuyển đổi sang mono nếu cần
-            if len(audio.shape) > 1:
-                audio = librosa.to_mono(audio)
-            
-            # Harmonic-percussive separation
-            harmonic, percussive = librosa.effects.hpss(audio)
-            
-            # Sử dụng harmonic component làm vocals
-            vocals_audio = harmonic
+            buffer = AudioBuffer.from_file(audio_path, sr=22050, mono=False)
+            vocals = self._separate_array_fallback(buffer)
             
             # Tạo output path
             if output_path is None:
                 base_name = os.path.splitext(os.path.basename(audio_path))[0]
                 output_path = os.path.join(self.output_dir, f"{base_name}_vocals_fallback.wav")
             
-            # Save vocals
-            sf.write(output_path, vocals_audio, sr)
-            
-            # Đảm bảo đường dẫn là absolute path
-            output_path = os.path.abspath(output_path)
+            # Save vocals (đường dẫn absolute)
+            output_path = vocals.write(output_path)
             
             logger.info(f"✅ Fallback vocals saved at: {output_path}")
             return output_path
@@ -310,6 +299,50 @@ class AdvancedAudioProcessor:
             logger.error(f"❌ Error in fallback vocal separation: {e}")
             raise
     
+    def _separate_array_fallback(self, buffer: AudioBuffer) -> AudioBuffer:
+        """Fallback trên mảng: harmonic component của HPSS ở 22.05kHz"""
+        buffer = buffer.to_mono().resample(22050)
+        
+        # Harmonic-percussive separation, dùng harmonic component làm vocals
+        harmonic, percussive = buffer.features.hpss()
+        return AudioBuffer(harmonic, buffer.sr, offset=buffer.offset)
+    
+    def separate_vocals_array(self, buffer: AudioBuffer, output_path: Union[str, None] = None,
+                              writer=None) -> AudioBuffer:
+        """
+        Tách giọng hát trên AudioBuffer, không ghi/đọc file trung gian
+        
+        Args:
+            buffer: Audio đầu vào (mảng + sample rate)
+            output_path: Nếu có, ghi vocals ra file này (artifact cuối cùng)
+            writer: ArtifactWriter để ghi output_path ở background
+            
+        Returns:
+            AudioBuffer: Vocals đã tách
+        """
+        try:
+            if self.fast_mode:
+                logger.info("🚀 Sử dụng Fast Mode để tách giọng hát (array)...")
+                vocals = self._separate_array_fast(buffer)
+            elif not self.audio_separator.available:
+                logger.warning("⚠️ Audio Separator không khả dụng, sử dụng fallback method")
+                vocals = self._separate_array_fallback(buffer)
+            else:
+                logger.info("✅ Sử dụng AI Audio Separator model (array)...")
+                vocals = self.audio_separator.separate_vocals_array(buffer)
+        except Exception as e:
+            logger.error(f"❌ Error in AI vocal separation: {e}")
+            logger.info("🔄 Chuyển sang fallback method...")
+            vocals = self._separate_array_fallback(buffer)
+        
+        if output_path and writer is not None:
+            writer.write_audio(output_path, vocals.audio, vocals.sr)
+            logger.info(f"📝 Vocals queued for export: {output_path}")
+        elif output_path:
+            vocals.write(output_path)
+            logger.info(f"✅ Vocals saved at: {vocals.path}")
+        return vocals
+    
     def get_audio_features(self, audio_path: str) -> dict:
         """Trích xuất các đặc trưng âm thanh"""
         try:
@@ -2,13 +2,26 @@ import librosa
 import numpy as np
 import torch
 import torchaudio
-from typing import Dict, Tuple, List
+from typing import Callable, Dict, Tuple, List
 import warnings
 import logging
 import subprocess
 import os
 import tempfile
 import shutil
+import threading
+import time
+import concurrent.futures
+from src.core.audio_cache import load_audio, load_audio_range, get_audio_cache
+from src.core.pcm_cache import decode_with_pcm_cache
+from src.core.audio_io import resample_audio
+from src.core.feature_bank import beat_sync
+from src.core.feature_graph import get_feature_graph
+from src.core.torch_chroma import get_torch_chroma
+from src.core.config import KEY_CONFIG
+from src.core.key_scoring import PROFILE_SETS, get_key_scorer
+from src.core.key_cache import get_key_cache
+from src.core.dtype_policy import as_signal, filtfilt, with_phase_of
 
 warnings.filterwarnings("ignore")
 
@@ -19,23 +32,51 @@ from src.core.gpu_config import get_device, CUDA_AVAILABLE, USE_GPU_FOR_KEY_DETE
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _build_scale_masks() -> np.ndarray:
+    """24x12 membership matrix: rows 0-11 major scales on C..B, rows 12-23 natural minor"""
+    major = np.zeros(12)
+    major[[0, 2, 4, 5, 7, 9, 11]] = 1.0
+    minor = np.zeros(12)
+    minor[[0, 2, 3, 5, 7, 8, 10]] = 1.0
+    return np.stack([np.roll(major, root) for root in range(12)] +
+                    [np.roll(minor, root) for root in range(12)])
+
+
+_SCALE_MASKS = _build_scale_masks()
+
+# Thread pool dùng chung cho các method của hybrid detector (tạo khi cần)
+_hybrid_executor = None
+_hybrid_executor_lock = threading.Lock()
+
+
+def _get_hybrid_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _hybrid_executor
+    if _hybrid_executor is None:
+        with _hybrid_executor_lock:
+            if _hybrid_executor is None:
+                _hybrid_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=KEY_CONFIG['max_workers'], thread_name_prefix='key-method')
+    return _hybrid_executor
+
+
 class AdvancedKeyDetector:
     """Advanced Key Detection using Essentia and improved algorithms with GPU acceleration"""
     
-    def __init__(self):
+    def __init__(self, beat_sync: bool = None):
+        # Gộp chroma theo beat trước khi so key profile (mặc định theo KEY_CONFIG)
+        self.beat_sync = KEY_CONFIG['beat_sync'] if beat_sync is None else beat_sync
+        
         # Define key names
         self.key_names = [
             'C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'
         ]
         
-        # Krumhansl-Schmuckler key profiles
-        self.major_profile = np.array([
-            6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88
-        ])
+        # Bộ key profile dùng để chấm (Krumhansl / Temperley / Albrecht), chấm trong một phép matmul
+        self.key_scorer = get_key_scorer(KEY_CONFIG['profiles'])
         
-        self.minor_profile = np.array([
-            6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17
-        ])
+        # Krumhansl-Schmuckler key profiles
+        self.major_profile = np.array(PROFILE_SETS['krumhansl'][0])
+        self.minor_profile = np.array(PROFILE_SETS['krumhansl'][1])
         
         # GPU Configuration
         self.device = get_device()
@@ -55,10 +96,6 @@ class AdvancedKeyDetector:
     def _initialize_gpu_components(self):
         """Initialize GPU components for faster processing"""
         try:
-            # Convert key profiles to GPU tensors
-            self.major_profile_gpu = torch.tensor(self.major_profile, device=self.device, dtype=torch.float32)
-            self.minor_profile_gpu = torch.tensor(self.minor_profile, device=self.device, dtype=torch.float32)
-            
             # Initialize GPU memory pool
             torch.cuda.empty_cache()
             
@@ -96,21 +133,98 @@ class AdvancedKeyDetector:
         except Exception as e:
             logger.warning(f"⚠️ Docker Essentia check failed: {e}")
     
-    def detect_key(self, audio_path: str, audio_type: str = "general") -> Dict:
+    def detect_key(self, audio_path: str, audio_type: str = "general", mode: str = None) -> Dict:
         """Detect key of audio file with audio type optimization and GPU acceleration"""
+        return self.detect_key_cached(audio_path, audio_type, mode=mode)
+    
+    def detect_key_cached(self, audio_path: str, audio_type: str = "general", audio: np.ndarray = None,
+                          sr: int = None, start: float = None, end: float = None, mode: str = None) -> Dict:
+        """
+        Detect key of a file, or of its [start, end) seconds, through the key result cache
+        
+        Results are looked up by file content, audio_type, hybrid mode and
+        range (src.core.key_cache), so a beat shared by many recordings is
+        analysed once. audio / sr are the already decoded samples of that
+        range and are used on a miss instead of decoding the file again.
+        """
+        mode = mode or KEY_CONFIG['hybrid_mode']
+        cache = get_key_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key_for(audio_path, audio_type, self._cache_mode(mode), start, end)
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"⚡ Key cache hit ({audio_type}): {cached['key']} {cached['scale']} - {audio_path}")
+                return cached
+        
+        if audio is not None:
+            # Docker Essentia phân tích cả file nên chỉ truyền path khi không cắt đoạn
+            whole_file = start is None and end is None
+            result = self.detect_key_array(audio, sr, audio_type, audio_path=audio_path if whole_file else None,
+                                           mode=mode)
+        elif start is not None or end is not None:
+            try:
+                # Chỉ decode đoạn cần detect, không decode cả file rồi cắt
+                audio, sr = load_audio_range(audio_path, start or 0.0, end, sr=22050)
+                result = self.detect_key_array(audio, sr, audio_type, mode=mode)
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi phát hiện phím: {e}")
+                result = self._get_default_key()
+        else:
+            result = self._detect_key_file(audio_path, audio_type, mode)
+        
+        # Chỉ lưu kết quả đầy đủ: không lưu kết quả mặc định khi detect lỗi, hay kết quả
+        # voting thiếu method (lỗi / quá hạn, vd. Docker treo lúc tải cao)
+        if cache_key is not None and result.get('method') != 'Default':
+            if result.get('excluded_methods'):
+                logger.info(f"⚠️ Không cache key: thiếu {', '.join(result['excluded_methods'])}")
+            else:
+                cache.put(cache_key, result)
+        return result
+    
+    def _cache_mode(self, mode: str) -> str:
+        """Hybrid mode plus the capabilities that change the method set / weights, e.g. 'full+gpu+docker'"""
+        return mode + ('+gpu' if self.use_gpu else '') + ('+docker' if self.docker_available else '')
+    
+    def _detect_key_file(self, audio_path: str, audio_type: str, mode: str) -> Dict:
         try:
             logger.info(f"🎹 Bắt đầu phát hiện phím từ file: {audio_path}")
-            logger.info(f"📁 Audio type: {audio_type}")
-            logger.info(f"🚀 GPU acceleration: {'ENABLED' if self.use_gpu else 'DISABLED'}")
             
             # Load audio with GPU acceleration if available
             if self.use_gpu:
                 audio, sr = self._load_audio_gpu(audio_path)
             else:
                 logger.info("📥 Đang tải file âm thanh...")
-                audio, sr = librosa.load(audio_path, sr=22050)
+                audio, sr = load_audio(audio_path, sr=22050)
             
             logger.info(f"✅ Đã tải audio: {len(audio)} samples, {sr} Hz")
+            return self.detect_key_array(audio, sr, audio_type, audio_path=audio_path, mode=mode)
+            
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi phát hiện phím: {e}")
+            return self._get_default_key()
+    
+    def detect_key_array(self, audio: np.ndarray, sr: int, audio_type: str = "general", audio_path: str = None,
+                         mode: str = None) -> Dict:
+        """
+        Detect key from an in-memory signal (no file decode)
+        
+        audio_path is optional and only used by Docker Essentia, which needs a
+        file; when it is None that method is skipped. mode overrides
+        KEY_CONFIG['hybrid_mode'] ('full' or 'cascade').
+        """
+        try:
+            logger.info(f"📁 Audio type: {audio_type}")
+            logger.info(f"🚀 GPU acceleration: {'ENABLED' if self.use_gpu else 'DISABLED'}")
+            
+            if audio.ndim > 1:
+                audio = librosa.to_mono(audio)
+            if sr != 22050:
+                audio = resample_audio(audio, sr, 22050)
+                sr = 22050
+            # F0 được tính trên tín hiệu gốc (chưa preprocess) để dùng chung track với scoring
+            source_audio = audio
             
             # Preprocessing based on audio type
             if audio_type == "beat":
@@ -122,7 +236,7 @@ class AdvancedKeyDetector:
             
             # Use hybrid detector for better accuracy
             logger.info("🔬 Sử dụng Hybrid Key Detector...")
-            key_info = self._detect_with_hybrid(audio_path, audio, sr, audio_type)
+            key_info = self._detect_with_hybrid(audio_path, audio, sr, audio_type, f0_audio=source_audio, mode=mode)
             logger.info("✅ Hybrid key detection hoàn thành!")
             
             logger.info(f"🎵 Kết quả: {key_info['key']} {key_info['scale']} (confidence: {key_info['confidence']:.3f})")
@@ -133,8 +247,8 @@ class AdvancedKeyDetector:
             return self._get_default_key()
     
     def _load_audio_gpu(self, audio_path: str) -> Tuple[np.ndarray, int]:
-        """Load audio using GPU-accelerated torchaudio"""
-        try:
+        """Load audio using GPU-accelerated torchaudio (shared through the audio cache)"""
+        def _decode():
             # Load with torchaudio on GPU
             waveform, sample_rate = torchaudio.load(audio_path)
             
@@ -155,43 +269,21 @@ class AdvancedKeyDetector:
                 sample_rate = 22050
             
             # Convert back to numpy
-            audio_np = waveform.cpu().numpy().flatten()
+            return waveform.cpu().numpy().flatten(), sample_rate
+        
+        try:
+            # Cùng key với load_audio(sr=22050) nên CPU và GPU path dùng chung cache
+            # (cả cache trong RAM lẫn PCM cache trên đĩa)
+            audio_np, sample_rate = get_audio_cache().get_or_load(
+                audio_path, lambda: decode_with_pcm_cache(audio_path, _decode, sr=22050, mono=True),
+                sr=22050, mono=True)
             
             logger.info("✅ GPU audio loading completed")
             return audio_np, sample_rate
             
         except Exception as e:
             logger.warning(f"GPU audio loading failed: {e}, falling back to librosa")
-            return librosa.load(audio_path, sr=22050)
-    
-    def _preprocess_beat_audio(self, audio: np.ndarray, sr: int) -> np.ndarray:
-        """Preprocess beat audio for better key detection"""
-        try:
-            # Remove silence at beginning and end
-            audio_trimmed, _ = librosa.effects.trim(audio, top_db=15)  # More aggressive trimming
-            
-            # Normalize audio
-            audio_normalized = librosa.util.normalize(audio_trimmed)
-            
-            # Apply stronger high-pass filter to remove low-frequency noise
-            from scipy import signal
-            nyquist = sr // 2
-            high_pass_freq = 120  # Increased from 80Hz to 120Hz
-            b, a = signal.butter(6, high_pass_freq / nyquist, btype='high')  # Increased order
-            audio_filtered = signal.filtfilt(b, a, audio_normalized)
-            
-            # Additional preprocessing: focus on mid-range frequencies
-            # Apply band-pass filter to focus on musical frequencies
-            low_freq = 200   # Hz
-            high_freq = 4000  # Hz
-            b2, a2 = signal.butter(4, [low_freq / nyquist, high_freq / nyquist], btype='band')
-            audio_bandpass = signal.filtfilt(b2, a2, audio_filtered)
-            
-            return audio_bandpass
-            
-        except Exception as e:
-            logger.warning(f"Beat preprocessing failed: {e}")
-            return audio
+            return load_audio(audio_path, sr=22050)
     
     def _preprocess_vocals_audio(self, audio: np.ndarray, sr: int) -> np.ndarray:
         """Preprocess vocals audio for better key detection - lighter processing"""
@@ -203,7 +295,8 @@ class AdvancedKeyDetector:
             audio_normalized = librosa.util.normalize(audio_trimmed)
             
             # Apply harmonic-percussive separation to isolate harmonic content
-            audio_harmonic, audio_percussive = librosa.effects.hpss(audio_normalized, margin=4)
+            separated = get_feature_graph(audio_normalized, sr, margin=4).request('harmonic', 'percussive')
+            audio_harmonic, audio_percussive = separated['harmonic'], separated['percussive']
             
             # Use mainly harmonic component but keep some percussive for rhythm
             audio_processed = audio_harmonic + audio_percussive * 0.3
@@ -213,7 +306,7 @@ class AdvancedKeyDetector:
             nyquist = sr // 2
             low_pass_freq = 8000  # Higher frequency to preserve more harmonics
             b, a = signal.butter(4, low_pass_freq / nyquist, btype='low')  # Lower order filter
-            audio_filtered = signal.filtfilt(b, a, audio_processed)
+            audio_filtered = filtfilt(b, a, audio_processed)
             
             # Apply lighter spectral gating to reduce noise without losing key information
             audio_gated = self._apply_light_spectral_gating(audio_filtered, sr)
@@ -228,16 +321,15 @@ class AdvancedKeyDetector:
         """Apply spectral gating to reduce noise in vocals"""
         try:
             # Compute STFT
-            stft = librosa.stft(audio, hop_length=512)
+            stft = librosa.stft(as_signal(audio), hop_length=512)
             magnitude = np.abs(stft)
-            phase = np.angle(stft)
             
             # Apply spectral gating threshold
             threshold = np.percentile(magnitude, 85)  # Keep top 15% of energy
             magnitude_gated = np.where(magnitude > threshold, magnitude, magnitude * 0.1)
             
             # Reconstruct audio
-            stft_gated = magnitude_gated * np.exp(1j * phase)
+            stft_gated = with_phase_of(magnitude_gated, stft)  # complex64, không qua angle/exp
             audio_gated = librosa.istft(stft_gated, hop_length=512)
             
             return audio_gated
@@ -250,16 +342,15 @@ class AdvancedKeyDetector:
         """Apply lighter spectral gating to reduce noise without losing key information"""
         try:
             # Compute STFT
-            stft = librosa.stft(audio, hop_length=512)
+            stft = librosa.stft(as_signal(audio), hop_length=512)
             magnitude = np.abs(stft)
-            phase = np.angle(stft)
             
             # Apply lighter spectral gating threshold
             threshold = np.percentile(magnitude, 75)  # Keep top 25% of energy (less aggressive)
             magnitude_gated = np.where(magnitude > threshold, magnitude, magnitude * 0.3)
             
             # Reconstruct audio
-            stft_gated = magnitude_gated * np.exp(1j * phase)
+            stft_gated = with_phase_of(magnitude_gated, stft)  # complex64, không qua angle/exp
             audio_gated = librosa.istft(stft_gated, hop_length=512)
             
             return audio_gated
@@ -268,11 +359,18 @@ class AdvancedKeyDetector:
             logger.warning(f"Light spectral gating failed: {e}")
             return audio
     
-    def _detect_with_hybrid(self, audio_path: str, audio: np.ndarray, sr: int, audio_type: str = "unknown") -> Dict:
-        """Hybrid key detection combining multiple methods"""
+    def _detect_with_hybrid(self, audio_path: str, audio: np.ndarray, sr: int, audio_type: str = "unknown",
+                            f0_audio: np.ndarray = None, mode: str = None) -> Dict:
+        """
+        Hybrid key detection combining multiple methods
+        
+        mode ('full' / 'cascade', mặc định KEY_CONFIG['hybrid_mode']); đường đi
+        thực tế được trả về trong result['path']. result['excluded_methods'] liệt
+        kê các method bị lỗi / quá hạn (rỗng khi voting đủ), để kết quả thiếu
+        method không bị lưu vào key cache.
+        """
+        mode = mode or KEY_CONFIG['hybrid_mode']
         try:
-            results = []
-            
             # Adjust weights based on audio type
             if audio_type == "vocals":
                 # For vocals, prioritize traditional methods that work better
@@ -287,85 +385,80 @@ class AdvancedKeyDetector:
                 vocals_weight = 0.3
                 chroma_weight = 0.3
             
-            # Method 1: Docker Essentia AI (if available) - Skip for vocals
-            if self.docker_available and audio_type != "vocals":
-                try:
-                    essentia_result = self._detect_with_docker_essentia(audio_path)
-                    if essentia_result:
-                        results.append({
-                            'key': essentia_result['key'],
-                            'scale': essentia_result['scale'],
-                            'confidence': essentia_result['confidence'],
-                            'method': 'Docker Essentia AI',
-                            'weight': essentia_weight
-                        })
-                except Exception as e:
-                    logger.warning(f"Docker Essentia failed: {e}")
+            # (tên method, hàm, trọng số) - các method độc lập với nhau trên audio đã load
+            methods = []
+            
+            # Method 1: Docker Essentia AI (if available) - Skip for vocals and in-memory audio
+            if self.docker_available and audio_type != "vocals" and audio_path:
+                methods.append(('Docker Essentia AI',
+                                lambda: self._detect_with_docker_essentia(
+                                    audio_path, timeout=self._method_timeout('Docker Essentia AI'), fallback=False),
+                                essentia_weight))
             
             # Method 2: Traditional librosa + Krumhansl
-            try:
-                traditional_result = self._detect_with_improved_traditional(audio, sr)
-                if traditional_result:
-                        results.append({
-                            'key': traditional_result['key'],
-                            'scale': traditional_result['scale'],
-                            'confidence': traditional_result['confidence'],
-                            'method': 'Traditional Librosa',
-                            'weight': traditional_weight
-                        })
-            except Exception as e:
-                logger.warning(f"Traditional method failed: {e}")
+            methods.append(('Traditional Librosa', lambda: self._detect_with_improved_traditional(audio, sr),
+                            traditional_weight))
             
             # Method 3: Vocals-specific key detection
-            try:
-                vocals_result = self._detect_with_vocals_specific(audio, sr)
-                if vocals_result:
-                    results.append({
-                        'key': vocals_result['key'],
-                        'scale': vocals_result['scale'],
-                        'confidence': vocals_result['confidence'],
-                        'method': 'Vocals-Specific Analysis',
-                        'weight': vocals_weight
-                    })
-            except Exception as e:
-                logger.warning(f"Vocals-specific method failed: {e}")
+            methods.append(('Vocals-Specific Analysis',
+                            lambda: self._detect_with_vocals_specific(audio, sr, f0_audio=f0_audio),
+                            vocals_weight))
             
             # Method 4: GPU-accelerated or Enhanced chroma analysis
-            try:
-                if self.use_gpu:
-                    chroma_result = self._detect_with_gpu_chroma(audio, sr)
-                    method_name = 'GPU Chroma Analysis'
-                    weight = 0.5  # Higher weight for GPU method
-                else:
-                    chroma_result = self._detect_with_enhanced_chroma(audio, sr)
-                    method_name = 'Enhanced Chroma'
-                    weight = 0.4
-                
-                if chroma_result:
-                    results.append({
-                        'key': chroma_result['key'],
-                        'scale': chroma_result['scale'],
-                        'confidence': chroma_result['confidence'],
-                        'method': method_name,
-                        'weight': weight
-                    })
-            except Exception as e:
-                logger.warning(f"Chroma analysis failed: {e}")
+            if self.use_gpu:
+                methods.append(('GPU Chroma Analysis', lambda: self._detect_with_gpu_chroma(audio, sr),
+                                0.5))  # Higher weight for GPU method
+            else:
+                methods.append(('Enhanced Chroma', lambda: self._detect_with_enhanced_chroma(audio, sr), 0.4))
             
             # Method 5: Beat-specific harmonic analysis (if beat type)
             if audio_type == "beat":
-                try:
-                    beat_result = self._detect_with_beat_harmonic_analysis(audio, sr)
-                    if beat_result:
-                        results.append({
-                            'key': beat_result['key'],
-                            'scale': beat_result['scale'],
-                            'confidence': beat_result['confidence'],
-                            'method': 'Beat Harmonic Analysis',
-                            'weight': 0.5  # High weight for beat-specific method
-                        })
-                except Exception as e:
-                    logger.warning(f"Beat harmonic analysis failed: {e}")
+                methods.append(('Beat Harmonic Analysis', lambda: self._detect_with_beat_harmonic_analysis(audio, sr),
+                                0.5))  # High weight for beat-specific method
+            
+            # Cascade: template match chroma (rẻ nhất) trước, rõ ràng thì dừng luôn
+            outputs, path = {}, 'full'
+            if mode == 'cascade':
+                cheap_result, margin = self._template_match(audio, sr)
+                if margin >= KEY_CONFIG['cascade_margin']:
+                    logger.info(f"⚡ Cascade early exit: {cheap_result['key']} {cheap_result['scale']} "
+                                f"(margin {margin:.3f})")
+                    # Qua voting như đường full để confidence cùng thang điểm (mean + consensus bonus)
+                    voted = self._weighted_voting([{
+                        'key': cheap_result['key'],
+                        'scale': cheap_result['scale'],
+                        'confidence': cheap_result['confidence'],
+                        'method': 'Traditional Librosa',
+                        'weight': traditional_weight
+                    }])
+                    return {
+                        'key': voted['key'],
+                        'scale': voted['scale'],
+                        'confidence': voted['confidence'],
+                        'method': f"Hybrid ({voted['method']})",
+                        'path': 'cascade:template',
+                        'excluded_methods': []
+                    }
+                logger.info(f"🔀 Cascade: margin {margin:.3f} < {KEY_CONFIG['cascade_margin']}, running all methods")
+                outputs['Traditional Librosa'] = cheap_result
+                path = 'cascade:full'
+            
+            pending = [(name, fn) for name, fn, _ in methods if name not in outputs]
+            outputs.update(self._run_hybrid_methods(pending))
+            # Method raise hoặc quá hạn không có trong outputs (trả None = không có ý kiến)
+            excluded = [name for name, _ in pending if name not in outputs]
+            
+            results = []
+            for name, _, weight in methods:
+                output = outputs.get(name)
+                if output:
+                    results.append({
+                        'key': output['key'],
+                        'scale': output['scale'],
+                        'confidence': output['confidence'],
+                        'method': name,
+                        'weight': weight
+                    })
             
             # Voting mechanism with weights
             if results:
@@ -381,15 +474,23 @@ class AdvancedKeyDetector:
                     'key': best_result['key'],
                     'scale': best_result['scale'],
                     'confidence': best_result['confidence'],
-                    'method': f"Hybrid ({best_result['method']})"
+                    'method': f"Hybrid ({best_result['method']})",
+                    'path': path,
+                    'excluded_methods': excluded
                 }
             else:
                 logger.warning("⚠️ All methods failed, using fallback")
-                return self._detect_with_improved_traditional(audio, sr)
+                return self._hybrid_fallback(audio, sr, [name for name, _, _ in methods])
                 
         except Exception as e:
             logger.error(f"❌ Hybrid detection failed: {e}")
-            return self._detect_with_improved_traditional(audio, sr)
+            return self._hybrid_fallback(audio, sr, ['Hybrid'])
+    
+    def _hybrid_fallback(self, audio: np.ndarray, sr: int, excluded: List[str]) -> Dict:
+        """Traditional result used when the hybrid vote could not run, marked as degraded"""
+        result = dict(self._detect_with_improved_traditional(audio, sr) or self._get_default_key())
+        result['excluded_methods'] = excluded
+        return result
     
     def _detect_with_gpu_chroma(self, audio: np.ndarray, sr: int) -> Dict:
         """GPU-accelerated chroma-based key detection"""
@@ -399,18 +500,11 @@ class AdvancedKeyDetector:
             
             logger.info("🚀 Using GPU-accelerated chroma analysis...")
             
-            # Fix negative strides issue by making a copy
-            audio_copy = audio.copy() if not audio.flags['C_CONTIGUOUS'] else audio
-            
-            # Convert audio to GPU tensor
-            audio_tensor = torch.tensor(audio_copy, device=self.device, dtype=torch.float32)
-            
-            # GPU-accelerated STFT
-            stft = torch.stft(audio_tensor, n_fft=2048, hop_length=512, return_complex=True)
-            magnitude = torch.abs(stft)
+            # GPU-accelerated STFT power spectrogram (librosa conventions)
+            power = get_torch_chroma(n_fft=2048, hop_length=512, device=self.device).power(audio)
             
             # GPU-accelerated chroma computation
-            chroma = self._compute_chroma_gpu(magnitude, sr)
+            chroma = self._compute_chroma_gpu(power, sr)
             
             # GPU-accelerated correlation computation
             key_result = self._compute_key_correlations_gpu(chroma)
@@ -426,18 +520,15 @@ class AdvancedKeyDetector:
             logger.warning(f"GPU chroma detection failed: {e}, falling back to CPU")
             return self._detect_with_enhanced_chroma(audio, sr)
     
-    def _compute_chroma_gpu(self, magnitude: torch.Tensor, sr: int) -> torch.Tensor:
-        """Compute chroma features on GPU"""
+    def _compute_chroma_gpu(self, power: torch.Tensor, sr: int) -> torch.Tensor:
+        """Compute mean chroma (12,) from an STFT power spectrogram on GPU"""
         try:
-            # Ensure tensor is contiguous
-            if not magnitude.is_contiguous():
-                magnitude = magnitude.contiguous()
+            # Filterbank chroma (cache theo sr, n_fft) áp dụng bằng một matmul
+            engine = get_torch_chroma(n_fft=2 * (power.shape[-2] - 1), hop_length=512, device=power.device)
+            chroma = engine.chroma_from_power(power, sr)
             
-            # Convert magnitude to chroma using GPU operations
-            # This is a simplified version - full implementation would use proper chroma computation
-            chroma = torch.sum(magnitude, dim=1)  # Sum across frequency bins
-            
-            # Normalize
+            # Mean over frames, then normalize
+            chroma = torch.mean(chroma, dim=-1)
             chroma = chroma / torch.sum(chroma)
             
             return chroma
@@ -447,65 +538,11 @@ class AdvancedKeyDetector:
             return None
     
     def _compute_key_correlations_gpu(self, chroma: torch.Tensor) -> Dict:
-        """Compute key correlations on GPU"""
+        """Compute key correlations on GPU (24 keys in one matmul, one transfer back)"""
         try:
             if chroma is None:
                 return None
-            
-            # Ensure chroma is contiguous and has correct shape
-            if not chroma.is_contiguous():
-                chroma = chroma.contiguous()
-            
-            # Ensure chroma has 12 elements
-            if len(chroma) > 12:
-                chroma = chroma[:12]
-            elif len(chroma) < 12:
-                # Pad with zeros
-                padding = torch.zeros(12 - len(chroma), device=self.device)
-                chroma = torch.cat([chroma, padding])
-            
-            # Compute correlations with key profiles on GPU
-            major_correlations = []
-            minor_correlations = []
-            
-            for i in range(12):
-                # Rotate profiles
-                major_rotated = torch.roll(self.major_profile_gpu, i)
-                minor_rotated = torch.roll(self.minor_profile_gpu, i)
-                
-                # Normalize profiles
-                major_rotated = major_rotated / torch.sum(major_rotated)
-                minor_rotated = minor_rotated / torch.sum(minor_rotated)
-                
-                # Compute correlation on GPU
-                major_corr = torch.corrcoef(torch.stack([chroma, major_rotated]))[0, 1]
-                minor_corr = torch.corrcoef(torch.stack([chroma, minor_rotated]))[0, 1]
-                
-                major_correlations.append(major_corr.item())
-                minor_correlations.append(minor_corr.item())
-            
-            # Find best matches
-            major_max_idx = np.argmax(major_correlations)
-            minor_max_idx = np.argmax(minor_correlations)
-            
-            major_max_corr = major_correlations[major_max_idx]
-            minor_max_corr = minor_correlations[minor_max_idx]
-            
-            # Choose between major and minor
-            if major_max_corr > minor_max_corr:
-                key_name = self.key_names[major_max_idx]
-                scale = 'major'
-                confidence = major_max_corr
-            else:
-                key_name = self.key_names[minor_max_idx]
-                scale = 'minor'
-                confidence = minor_max_corr
-            
-            return {
-                'key': key_name,
-                'scale': scale,
-                'confidence': confidence
-            }
+            return self.key_scorer.estimate(chroma)
             
         except Exception as e:
             logger.warning(f"GPU correlation computation failed: {e}")
@@ -515,127 +552,20 @@ class AdvancedKeyDetector:
         """Enhanced chroma-based key detection"""
         try:
             # Extract chroma with different parameters
-            chroma1 = librosa.feature.chroma_stft(y=audio, sr=sr, hop_length=512)
-            chroma2 = librosa.feature.chroma_cqt(y=audio, sr=sr, hop_length=512)
-            chroma3 = librosa.feature.chroma_cens(y=audio, sr=sr, hop_length=512)
+            # chroma_cqt và chroma_cens dùng chung một CQT (kernel cache theo process)
+            features = get_feature_graph(audio, sr).request('chroma', 'chroma_cqt', 'chroma_cens')
+            chroma1 = features['chroma']
+            chroma2 = features['chroma_cqt']
+            chroma3 = features['chroma_cens']
             
             # Combine chroma features
-            chroma_combined = np.mean([chroma1, chroma2, chroma3], axis=0)
-            chroma_mean = np.mean(chroma_combined, axis=1)
-            
-            # Normalize
-            chroma_mean = chroma_mean / np.sum(chroma_mean)
-            
-            # Calculate correlations with key profiles
-            major_correlations = []
-            minor_correlations = []
-            
-            for i in range(12):
-                major_rotated = np.roll(self.major_profile, i)
-                minor_rotated = np.roll(self.minor_profile, i)
-                
-                major_rotated = major_rotated / np.sum(major_rotated)
-                minor_rotated = minor_rotated / np.sum(minor_rotated)
-                
-                major_corr = np.corrcoef(chroma_mean, major_rotated)[0, 1]
-                minor_corr = np.corrcoef(chroma_mean, minor_rotated)[0, 1]
-                
-                major_correlations.append(major_corr)
-                minor_correlations.append(minor_corr)
-            
-            # Find best matches
-            major_max_idx = np.argmax(major_correlations)
-            minor_max_idx = np.argmax(minor_correlations)
-            
-            major_max_corr = major_correlations[major_max_idx]
-            minor_max_corr = minor_correlations[minor_max_idx]
-            
-            # Choose between major and minor
-            if major_max_corr > minor_max_corr:
-                key_name = self.key_names[major_max_idx]
-                scale = 'major'
-                confidence = major_max_corr
-            else:
-                key_name = self.key_names[minor_max_idx]
-                scale = 'minor'
-                confidence = minor_max_corr
-            
-            return {
-                'key': key_name,
-                'scale': scale,
-                'confidence': confidence,
-                'method': 'Enhanced Chroma'
-            }
+            chroma_combined = self._beat_synchronous(np.mean([chroma1, chroma2, chroma3], axis=0), audio, sr)
+            return self._key_from_chroma(chroma_combined, 'Enhanced Chroma')
             
         except Exception as e:
             logger.error(f"Enhanced chroma detection failed: {e}")
             return None
     
-    def _detect_with_beat_harmonic_analysis(self, audio: np.ndarray, sr: int) -> Dict:
-        """Beat-specific harmonic analysis using HPSS"""
-        try:
-            # Separate harmonic and percussive components
-            harmonic, percussive = librosa.effects.hpss(audio, margin=8)
-            
-            # Focus on harmonic component for key detection
-            harmonic_audio = harmonic
-            
-            # Extract chroma features from harmonic component
-            chroma_harmonic = librosa.feature.chroma_stft(y=harmonic_audio, sr=sr, hop_length=512)
-            chroma_cqt_harmonic = librosa.feature.chroma_cqt(y=harmonic_audio, sr=sr, hop_length=512)
-            
-            # Combine harmonic chroma features
-            chroma_combined = np.mean([chroma_harmonic, chroma_cqt_harmonic], axis=0)
-            chroma_mean = np.mean(chroma_combined, axis=1)
-            
-            # Normalize
-            chroma_mean = chroma_mean / np.sum(chroma_mean)
-            
-            # Calculate correlations with key profiles
-            major_correlations = []
-            minor_correlations = []
-            
-            for i in range(12):
-                major_rotated = np.roll(self.major_profile, i)
-                minor_rotated = np.roll(self.minor_profile, i)
-                
-                major_rotated = major_rotated / np.sum(major_rotated)
-                minor_rotated = minor_rotated / np.sum(minor_rotated)
-                
-                major_corr = np.corrcoef(chroma_mean, major_rotated)[0, 1]
-                minor_corr = np.corrcoef(chroma_mean, minor_rotated)[0, 1]
-                
-                major_correlations.append(major_corr)
-                minor_correlations.append(minor_corr)
-            
-            # Find best matches
-            major_max_idx = np.argmax(major_correlations)
-            minor_max_idx = np.argmax(minor_correlations)
-            
-            major_max_corr = major_correlations[major_max_idx]
-            minor_max_corr = minor_correlations[minor_max_idx]
-            
-            # Choose between major and minor
-            if major_max_corr > minor_max_corr:
-                key_name = self.key_names[major_max_idx]
-                scale = 'major'
-                confidence = major_max_corr
-            else:
-                key_name = self.key_names[minor_max_idx]
-                scale = 'minor'
-                confidence = minor_max_corr
-            
-            return {
-                'key': key_name,
-                'scale': scale,
-                'confidence': confidence,
-                'method': 'Beat Harmonic Analysis'
-            }
-            
-        except Exception as e:
-            logger.error(f"Beat harmonic analysis failed: {e}")
-            return None
-    
     def _detect_with_music21(self, audio_path: str) -> Dict:
         """Key detection using Music21"""
         try:
@@ -661,6 +591,73 @@ class AdvancedKeyDetector:
             logger.warning(f"Music21 detection failed: {e}")
             return None
     
+    def _run_hybrid_methods(self, methods: List[Tuple[str, Callable]]) -> Dict[str, Dict]:
+        """
+        Run the hybrid methods and return {name: result} for those that finished.
+        
+        KEY_CONFIG['parallel'] chạy chúng trên thread pool dùng chung (numpy /
+        librosa / torch nhả GIL, FeatureBank được chia sẻ giữa các thread);
+        method nào chạy quá KEY_CONFIG['method_timeouts'] (tính từ lúc bắt đầu
+        chạy) thì bị bỏ khỏi voting.
+        """
+        outputs = {}
+        if not KEY_CONFIG['parallel'] or len(methods) < 2:
+            for name, fn in methods:
+                try:
+                    outputs[name] = fn()
+                except Exception as e:
+                    logger.warning(f"{name} failed: {e}")
+            return outputs
+        
+        executor = _get_hybrid_executor()
+        # Thời hạn của mỗi method tính từ lúc nó bắt đầu chạy, không phải lúc submit:
+        # pool dùng chung cho nhiều detection đồng thời nên method có thể phải xếp hàng
+        started: Dict[str, float] = {}
+        
+        def run(name, fn):
+            started[name] = time.monotonic()
+            return fn()
+        
+        futures = {executor.submit(run, name, fn): name for name, fn in methods}
+        results = {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[f]] + self._method_timeout(futures[f])
+                         for f in pending if futures[f] in started]
+            # Method chưa bắt đầu: kiểm tra lại sau một khoảng ngắn
+            wait = min(deadlines, default=now + 0.05) - now
+            if len(deadlines) < len(pending):
+                wait = min(wait, 0.05)
+            done, pending = concurrent.futures.wait(pending, timeout=max(0.0, wait),
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.warning(f"{name} failed: {e}")
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if name in started and now - started[name] >= self._method_timeout(name):
+                    # Thread không dừng được; kết quả đến sau bị bỏ qua
+                    pending.discard(future)
+                    logger.warning(f"⏱️ {name} timed out after {self._method_timeout(name):.0f}s, "
+                                   f"excluded from voting")
+        
+        # Giữ thứ tự method ban đầu cho voting
+        for name, _ in methods:
+            if name in results:
+                outputs[name] = results[name]
+        return outputs
+    
+    @staticmethod
+    def _method_timeout(name: str) -> float:
+        """Seconds a hybrid method may run (KEY_CONFIG['method_timeouts'])"""
+        timeouts = KEY_CONFIG['method_timeouts']
+        return timeouts.get(name, timeouts['default'])
+    
     def _weighted_voting(self, results: List[Dict]) -> Dict:
         """Weighted voting mechanism with consensus priority"""
         try:
@@ -755,8 +752,19 @@ class AdvancedKeyDetector:
             logger.warning("⚠️ Chuyển sang phương pháp fallback...")
             return self._detect_with_improved_traditional(audio, sr)
     
-    def _detect_with_docker_essentia(self, audio_path: str) -> Dict:
-        """Detect key using Docker Essentia with improved accuracy"""
+    def _detect_with_docker_essentia(self, audio_path: str, timeout: float = None, fallback: bool = True) -> Dict:
+        """
+        Detect key using Docker Essentia with improved accuracy
+        
+        timeout (giây) giới hạn tổng thời gian các lệnh docker; container treo
+        không giữ worker của hybrid pool mãi mãi. fallback=False raise khi lỗi
+        thay vì trả kết quả traditional, để hybrid biết method này thất bại.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        def remaining():
+            return None if deadline is None else max(0.1, deadline - time.monotonic())
+        
         try:
             logger.info("🐳 Đang sử dụng Docker Essentia KeyExtractor với độ chính xác cao...")
             
@@ -764,14 +772,14 @@ class AdvancedKeyDetector:
             temp_ascii_name = "temp_input.mp3"
             docker_path = f"/app/{temp_ascii_name}"
             copy_cmd = f'docker cp "{audio_path}" essentia-karaoke:{docker_path}'
-            subprocess.run(copy_cmd, shell=True, check=True)
+            subprocess.run(copy_cmd, shell=True, check=True, timeout=remaining())
             
             # Run multiple key detections with different parameters for voting
             results = []
             
             # Method 1: Standard key detection
             cmd1 = f"docker exec essentia-karaoke python3 -c \"import essentia.standard as es; audio = es.MonoLoader(filename='{docker_path}')(); key, scale, strength = es.KeyExtractor()(audio); print(f'{{key}} {{scale}} {{strength}}')\""
-            result1 = subprocess.run(cmd1, shell=True, capture_output=True, text=True)
+            result1 = subprocess.run(cmd1, shell=True, capture_output=True, text=True, timeout=remaining())
             
             if result1.returncode == 0:
                 parts1 = result1.stdout.strip().split()
@@ -785,7 +793,7 @@ class AdvancedKeyDetector:
             
             # Method 2: High resolution key detection
             cmd2 = f"docker exec essentia-karaoke python3 -c \"import essentia.standard as es; audio = es.MonoLoader(filename='{docker_path}', sampleRate=44100)(); key, scale, strength = es.KeyExtractor()(audio); print(f'{{key}} {{scale}} {{strength}}')\""
-            result2 = subprocess.run(cmd2, shell=True, capture_output=True, text=True)
+            result2 = subprocess.run(cmd2, shell=True, capture_output=True, text=True, timeout=remaining())
             
             if result2.returncode == 0:
                 parts2 = result2.stdout.strip().split()
@@ -799,7 +807,7 @@ class AdvancedKeyDetector:
             
             # Method 3: Multiple segments voting
             cmd3 = f"docker exec essentia-karaoke python3 -c \"import essentia.standard as es; import numpy as np; audio = es.MonoLoader(filename='{docker_path}')(); segments = [audio[i:i+len(audio)//3] for i in range(0, len(audio), len(audio)//3)]; keys = []; for seg in segments: key, scale, strength = es.KeyExtractor()(seg); keys.append((key, scale, strength)); from collections import Counter; most_common = Counter(keys).most_common(1)[0][0]; print(f'{{most_common[0]}} {{most_common[1]}} {{most_common[2]}}')\""
-            result3 = subprocess.run(cmd3, shell=True, capture_output=True, text=True)
+            result3 = subprocess.run(cmd3, shell=True, capture_output=True, text=True, timeout=remaining())
             
             if result3.returncode == 0:
                 parts3 = result3.stdout.strip().split()
@@ -824,77 +832,91 @@ class AdvancedKeyDetector:
                 }
             
             logger.error("❌ Docker Essentia detection failed")
+            if not fallback:
+                raise RuntimeError("Docker Essentia returned no result")
             return self._detect_with_improved_traditional(
-                librosa.load(audio_path, sr=22050)[0], 22050
+                load_audio(audio_path, sr=22050)[0], 22050
             )
             
+        except subprocess.TimeoutExpired as e:
+            logger.error(f"⏱️ Docker Essentia quá hạn {timeout:.0f}s: {e.cmd[:60]}...")
+            if not fallback:
+                raise
+            logger.warning("⚠️ Chuyển sang phương pháp fallback...")
+            return self._detect_with_improved_traditional(
+                load_audio(audio_path, sr=22050)[0], 22050
+            )
         except Exception as e:
             logger.error(f"❌ Docker Essentia detection failed: {e}")
+            if not fallback:
+                raise
             logger.warning("⚠️ Chuyển sang phương pháp fallback...")
             return self._detect_with_improved_traditional(
-                librosa.load(audio_path, sr=22050)[0], 22050
+                load_audio(audio_path, sr=22050)[0], 22050
             )
     
     def _detect_with_improved_traditional(self, audio: np.ndarray, sr: int) -> Dict:
         """Improved traditional key detection"""
+        return self._template_match(audio, sr)[0]
+    
+    def _template_match(self, audio: np.ndarray, sr: int) -> Tuple[Dict, float]:
+        """Mean-chroma template match and the score gap between the two best keys"""
         try:
-            # Extract chroma features
-            chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
-            
-            # Compute mean chroma
-            chroma_mean = np.mean(chroma, axis=1)
-            
-            # Normalize chroma
-            chroma_mean = chroma_mean / np.sum(chroma_mean)
-            
-            # Calculate correlations with key profiles
-            major_correlations = []
-            minor_correlations = []
-            
-            for i in range(12):
-                # Rotate profiles
-                major_rotated = np.roll(self.major_profile, i)
-                minor_rotated = np.roll(self.minor_profile, i)
-                
-                # Normalize profiles
-                major_rotated = major_rotated / np.sum(major_rotated)
-                minor_rotated = minor_rotated / np.sum(minor_rotated)
-                
-                # Calculate correlation
-                major_corr = np.corrcoef(chroma_mean, major_rotated)[0, 1]
-                minor_corr = np.corrcoef(chroma_mean, minor_rotated)[0, 1]
-                
-                major_correlations.append(major_corr)
-                minor_correlations.append(minor_corr)
-            
-            # Find best matches
-            major_max_idx = np.argmax(major_correlations)
-            minor_max_idx = np.argmax(minor_correlations)
-            
-            major_max_corr = major_correlations[major_max_idx]
-            minor_max_corr = minor_correlations[minor_max_idx]
-            
-            # Choose the better match
-            if major_max_corr > minor_max_corr:
-                key_name = self.key_names[major_max_idx]
-                mode = 'major'
-                confidence = major_max_corr
-            else:
-                key_name = self.key_names[minor_max_idx]
-                mode = 'minor'
-                confidence = minor_max_corr
-            
-            return {
-                'key': key_name,
-                'scale': mode,
-                'confidence': confidence,
-                'method': 'Improved Traditional'
-            }
+            # Extract chroma features (cùng STFT với enhanced chroma / harmonic analysis)
+            chroma = self._beat_synchronous(get_feature_graph(audio, sr)['chroma'], audio, sr)
+            chroma_mean = np.mean(chroma, axis=1, dtype=np.float64)
+            return (self.key_scorer.estimate(chroma_mean, 'Improved Traditional'),
+                    float(self.key_scorer.margins(chroma_mean)[0]))
             
         except Exception as e:
             print(f"Traditional detection failed: {e}")
+            return self._get_default_key(), 0.0
+    
+    def detect_key_from_features(self, features) -> Dict:
+        """
+        Detect key from precomputed features (ClipFeatures of a batch, or a
+        (12, frames) chroma array) without touching the audio again
+        """
+        try:
+            chroma = getattr(features, 'chroma', features)
+            return self._key_from_chroma(chroma, 'Batch Chroma')
+        except Exception as e:
+            logger.warning(f"Key detection from features failed: {e}")
             return self._get_default_key()
     
+    def detect_keys_from_features(self, features_list: List) -> List[Dict]:
+        """Batch version of detect_key_from_features: all clips scored in one matmul"""
+        try:
+            means = np.stack([np.mean(getattr(f, 'chroma', f), axis=1, dtype=np.float64) for f in features_list])
+            return self.key_scorer.estimate_batch(means, 'Batch Chroma')
+        except Exception as e:
+            logger.warning(f"Batch key detection from features failed: {e}")
+            return [self.detect_key_from_features(f) for f in features_list]
+    
+    def _beat_synchronous(self, chroma: np.ndarray, audio: np.ndarray, sr: int, hop_length: int = 512) -> np.ndarray:
+        """
+        (12, beats) chroma averaged between the beats of audio when beat_sync is
+        on, else chroma unchanged. The beat grid is the 'beats' node of the
+        feature graph of audio, so scoring on the same array reuses it.
+        """
+        if not self.beat_sync:
+            return chroma
+        try:
+            graph = get_feature_graph(audio, sr)
+            _, frames = graph['beats']
+            # Lưới beat ở hop của graph, đổi sang lưới frame của chroma
+            return beat_sync(chroma, frames * graph.params['hop_length'] // hop_length)
+        except Exception as e:
+            logger.warning(f"Beat-synchronous chroma failed: {e}, using frame chroma")
+            return chroma
+    
+    def _key_from_chroma(self, chroma: np.ndarray, method: str) -> Dict:
+        """Key-profile correlation on the mean of a (12, frames) chroma"""
+        # Compute mean chroma (tỉ lệ không ảnh hưởng hệ số tương quan)
+        chroma_mean = np.mean(chroma, axis=1, dtype=np.float64)
+        return self.key_scorer.estimate(chroma_mean, method)
+
+    
     def _get_default_key(self) -> Dict:
         """Return default key when detection fails"""
         return {
@@ -957,13 +979,13 @@ class AdvancedKeyDetector:
                 return True
         return False
     
-    def _detect_with_vocals_specific(self, audio: np.ndarray, sr: int) -> Dict:
+    def _detect_with_vocals_specific(self, audio: np.ndarray, sr: int, f0_audio: np.ndarray = None) -> Dict:
         """Vocals-specific key detection using multiple approaches"""
         try:
             results = []
             
             # Method 1: Fundamental frequency analysis
-            f0_result = self._analyze_vocals_fundamental_frequencies(audio, sr)
+            f0_result = self._analyze_vocals_fundamental_frequencies(audio if f0_audio is None else f0_audio, sr)
             if f0_result:
                 results.append(f0_result)
             
@@ -1004,8 +1026,8 @@ class AdvancedKeyDetector:
     def _analyze_vocals_fundamental_frequencies(self, audio: np.ndarray, sr: int) -> Dict:
         """Analyze vocals using fundamental frequency analysis"""
         try:
-            # Extract fundamental frequencies using YIN algorithm
-            f0 = librosa.yin(audio, fmin=80, fmax=1000, sr=sr)
+            # Extract fundamental frequencies using YIN algorithm (shared F0 track)
+            f0 = get_feature_graph(audio, sr)['f0']
             
             # Remove NaN values and outliers
             f0_clean = f0[~np.isnan(f0)]
@@ -1015,23 +1037,11 @@ class AdvancedKeyDetector:
             if len(f0_clean) == 0:
                 return None
             
-            # Convert fundamental frequencies to MIDI notes
-            midi_notes = librosa.hz_to_midi(f0_clean)
-            
-            # Round to nearest semitone
-            midi_notes_rounded = np.round(midi_notes)
+            # Duration-weighted pitch-class histogram (mỗi frame F0 = một hop)
+            histogram = self._pitch_class_histogram(librosa.hz_to_midi(f0_clean))
             
-            # Count note occurrences
-            note_counts = np.bincount(midi_notes_rounded.astype(int))
-            
-            # Find most common notes
-            most_common_notes = np.argsort(note_counts)[-5:][::-1]  # Top 5 notes
-            
-            # Convert MIDI notes to note names
-            note_names = [librosa.midi_to_note(note) for note in most_common_notes]
-            
-            # Analyze key based on most common notes
-            key_result = self._analyze_key_from_notes(note_names)
+            # Analyze key based on the histogram
+            key_result = self._analyze_key_from_pitch_classes(histogram)
             
             if key_result:
                 return {
@@ -1051,8 +1061,7 @@ class AdvancedKeyDetector:
         """Analyze vocals using harmonic analysis"""
         try:
             # Extract harmonics using STFT
-            stft = librosa.stft(audio, hop_length=512)
-            magnitude = np.abs(stft)
+            magnitude = get_feature_graph(audio, sr, n_fft=2048, hop_length=512)['magnitude']
             
             # Focus on lower frequencies where vocals are strongest
             freq_bins = librosa.fft_frequencies(sr=sr, n_fft=2048)
@@ -1067,13 +1076,12 @@ class AdvancedKeyDetector:
             if len(peaks) == 0:
                 return None
             
-            # Convert peak frequencies to notes
+            # Convert peak frequencies to pitch classes
             peak_freqs = freq_bins[vocal_range][peaks]
-            midi_notes = librosa.hz_to_midi(peak_freqs)
-            note_names = [librosa.midi_to_note(int(note)) for note in midi_notes]
+            histogram = self._pitch_class_histogram(librosa.hz_to_midi(peak_freqs))
             
             # Analyze key
-            key_result = self._analyze_key_from_notes(note_names)
+            key_result = self._analyze_key_from_pitch_classes(histogram)
             
             if key_result:
                 return {
@@ -1093,7 +1101,8 @@ class AdvancedKeyDetector:
         """Analyze vocals using chroma with vocals-specific parameters"""
         try:
             # Use smaller hop length for better time resolution
-            chroma = librosa.feature.chroma_stft(y=audio, sr=sr, hop_length=256, n_fft=1024)
+            chroma = get_feature_graph(audio, sr, n_fft=1024, hop_length=256)['chroma']
+            chroma = self._beat_synchronous(chroma, audio, sr, hop_length=256)
             
             # Focus on stronger chroma values
             chroma_mean = np.mean(chroma, axis=1)
@@ -1102,13 +1111,8 @@ class AdvancedKeyDetector:
             if not np.any(chroma_strong):
                 return None
             
-            # Get strong chroma indices
-            strong_indices = np.where(chroma_strong)[0]
-            chroma_notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-            strong_notes = [chroma_notes[i] for i in strong_indices]
-            
-            # Analyze key
-            key_result = self._analyze_key_from_notes(strong_notes)
+            # Analyze key (each strong chroma bin counts once)
+            key_result = self._analyze_key_from_pitch_classes(chroma_strong.astype(np.float64))
             
             if key_result:
                 return {
@@ -1124,78 +1128,34 @@ class AdvancedKeyDetector:
             logger.warning(f"Vocals chroma analysis failed: {e}")
             return None
     
-    def _analyze_key_from_notes(self, note_names: list) -> Dict:
-        """Analyze key from list of note names - improved for minor keys"""
+    @staticmethod
+    def _pitch_class_histogram(midi_notes: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+        """12-bin histogram of MIDI values rounded to the nearest semitone (C = 0)"""
+        pitch_classes = np.mod(np.rint(midi_notes).astype(np.int64), 12)
+        return np.bincount(pitch_classes, weights=weights, minlength=12).astype(np.float64)
+    
+    def _analyze_key_from_pitch_classes(self, histogram: np.ndarray) -> Dict:
+        """
+        Score a pitch-class histogram against all 24 major / natural minor
+        scales in one matmul; confidence is the in-scale share of the weight
+        """
         try:
-            # Define key signatures for both major and minor
-            major_keys = {
-                'C': ['C', 'D', 'E', 'F', 'G', 'A', 'B'],
-                'G': ['G', 'A', 'B', 'C', 'D', 'E', 'F#'],
-                'D': ['D', 'E', 'F#', 'G', 'A', 'B', 'C#'],
-                'A': ['A', 'B', 'C#', 'D', 'E', 'F#', 'G#'],
-                'E': ['E', 'F#', 'G#', 'A', 'B', 'C#', 'D#'],
-                'B': ['B', 'C#', 'D#', 'E', 'F#', 'G#', 'A#'],
-                'F#': ['F#', 'G#', 'A#', 'B', 'C#', 'D#', 'E#'],
-                'C#': ['C#', 'D#', 'E#', 'F#', 'G#', 'A#', 'B#'],
-                'F': ['F', 'G', 'A', 'Bb', 'C', 'D', 'E'],
-                'Bb': ['Bb', 'C', 'D', 'Eb', 'F', 'G', 'A'],
-                'Eb': ['Eb', 'F', 'G', 'Ab', 'Bb', 'C', 'D'],
-                'Ab': ['Ab', 'Bb', 'C', 'Db', 'Eb', 'F', 'G'],
-                'Db': ['Db', 'Eb', 'F', 'Gb', 'Ab', 'Bb', 'C']
-            }
+            total = float(np.sum(histogram))
+            if total <= 0:
+                return None
             
-            minor_keys = {
-                'A': ['A', 'B', 'C', 'D', 'E', 'F', 'G'],
-                'E': ['E', 'F#', 'G', 'A', 'B', 'C', 'D'],
-                'B': ['B', 'C#', 'D', 'E', 'F#', 'G', 'A'],
-                'F#': ['F#', 'G#', 'A', 'B', 'C#', 'D', 'E'],
-                'C#': ['C#', 'D#', 'E', 'F#', 'G#', 'A', 'B'],
-                'G#': ['G#', 'A#', 'B', 'C#', 'D#', 'E', 'F#'],
-                'D#': ['D#', 'E#', 'F#', 'G#', 'A#', 'B', 'C#'],
-                'A#': ['A#', 'B#', 'C#', 'D#', 'E#', 'F#', 'G#'],
-                'D': ['D', 'E', 'F', 'G', 'A', 'Bb', 'C'],
-                'G': ['G', 'A', 'Bb', 'C', 'D', 'Eb', 'F'],
-                'C': ['C', 'D', 'Eb', 'F', 'G', 'Ab', 'Bb'],
-                'F': ['F', 'G', 'Ab', 'Bb', 'C', 'Db', 'Eb'],
-                'Bb': ['Bb', 'C', 'Db', 'Eb', 'F', 'Gb', 'Ab']
-            }
+            scores = _SCALE_MASKS @ histogram
+            best_major = int(np.argmax(scores[:12]))
+            best_minor = int(np.argmax(scores[12:]))
             
-            # Count matches for major keys
-            major_scores = {}
-            for key, notes in major_keys.items():
-                score = 0
-                for note in note_names:
-                    if note in notes:
-                        score += 1
-                major_scores[key] = score
-            
-            # Count matches for minor keys
-            minor_scores = {}
-            for key, notes in minor_keys.items():
-                score = 0
-                for note in note_names:
-                    if note in notes:
-                        score += 1
-                minor_scores[key] = score
-            
-            # Find best matching keys
-            best_major_key = max(major_scores, key=major_scores.get)
-            best_minor_key = max(minor_scores, key=minor_scores.get)
-            best_major_score = major_scores[best_major_key]
-            best_minor_score = minor_scores[best_minor_key]
-            
-            # Choose between major and minor
-            if best_minor_score > best_major_score:
-                best_key = best_minor_key
-                best_scale = 'minor'
-                best_score = best_minor_score
+            # Choose between major and minor (ties go to major)
+            if scores[12 + best_minor] > scores[best_major]:
+                best_key, best_scale, best_score = self.key_names[best_minor], 'minor', scores[12 + best_minor]
             else:
-                best_key = best_major_key
-                best_scale = 'major'
-                best_score = best_major_score
+                best_key, best_scale, best_score = self.key_names[best_major], 'major', scores[best_major]
             
             # Calculate confidence
-            confidence = min(best_score / len(note_names), 1.0)
+            confidence = min(float(best_score) / total, 1.0)
             
             if confidence > 0.2:  # Lower threshold to catch minor keys
                 return {
@@ -1207,7 +1167,7 @@ class AdvancedKeyDetector:
             return None
             
         except Exception as e:
-            logger.warning(f"Key analysis from notes failed: {e}")
+            logger.warning(f"Key analysis from pitch classes failed: {e}")
             return None
     
     def _detect_with_beat_harmonic_analysis(self, audio: np.ndarray, sr: int) -> Dict:
@@ -1219,63 +1179,17 @@ class AdvancedKeyDetector:
             audio_processed = self._preprocess_beat_audio(audio, sr)
             
             # Extract chroma features with beat-optimized parameters
-            chroma = librosa.feature.chroma_stft(
-                y=audio_processed, 
-                sr=sr,
-                hop_length=1024,  # Larger hop for beat analysis
-                n_fft=4096        # Larger FFT for better frequency resolution
-            )
-            
-            # Compute mean chroma
-            chroma_mean = np.mean(chroma, axis=1)
+            chroma = get_feature_graph(
+                audio_processed, sr,
+                n_fft=4096,       # Larger FFT for better frequency resolution
+                hop_length=1024   # Larger hop for beat analysis
+            )['chroma']
+            chroma = self._beat_synchronous(chroma, audio_processed, sr, hop_length=1024)
             
-            # Normalize chroma
-            chroma_mean = chroma_mean / np.sum(chroma_mean)
+            result = self._key_from_chroma(chroma, 'Beat Harmonic Analysis')
+            logger.info(f"✅ Beat harmonic analysis: {result['key']} {result['scale']} (conf: {result['confidence']:.3f})")
             
-            # Calculate correlations with key profiles
-            major_correlations = []
-            minor_correlations = []
-            
-            for i in range(12):
-                # Rotate profiles
-                major_rotated = np.roll(self.major_profile, i)
-                minor_rotated = np.roll(self.minor_profile, i)
-                
-                # Normalize profiles
-                major_rotated = major_rotated / np.sum(major_rotated)
-                minor_rotated = minor_rotated / np.sum(minor_rotated)
-                
-                # Compute correlation
-                major_corr = np.corrcoef(chroma_mean, major_rotated)[0, 1]
-                minor_corr = np.corrcoef(chroma_mean, minor_rotated)[0, 1]
-                
-                major_correlations.append(major_corr)
-                minor_correlations.append(minor_corr)
-            
-            # Find best matches
-            major_max_idx = np.argmax(major_correlations)
-            minor_max_idx = np.argmax(minor_correlations)
-            
-            major_max_corr = major_correlations[major_max_idx]
-            minor_max_corr = minor_correlations[minor_max_idx]
-            
-            # Choose between major and minor
-            if major_max_corr > minor_max_corr:
-                key_name = self.key_names[major_max_idx]
-                scale = 'major'
-                confidence = major_max_corr
-            else:
-                key_name = self.key_names[minor_max_idx]
-                scale = 'minor'
-                confidence = minor_max_corr
-            
-            logger.info(f"✅ Beat harmonic analysis: {key_name} {scale} (conf: {confidence:.3f})")
-            
-            return {
-                'key': key_name,
-                'scale': scale,
-                'confidence': confidence
-            }
+            return result
             
         except Exception as e:
             logger.warning(f"Beat harmonic analysis failed: {e}")
@@ -1291,7 +1205,8 @@ class AdvancedKeyDetector:
             audio_normalized = librosa.util.normalize(audio_trimmed)
             
             # Apply harmonic-percussive separation to focus on harmonic content
-            audio_harmonic, audio_percussive = librosa.effects.hpss(audio_normalized, margin=8)
+            separated = get_feature_graph(audio_normalized, sr, margin=8).request('harmonic', 'percussive')
+            audio_harmonic, audio_percussive = separated['harmonic'], separated['percussive']
             
             # Use mainly harmonic component for key detection
             audio_processed = audio_harmonic + audio_percussive * 0.1
@@ -1301,7 +1216,7 @@ class AdvancedKeyDetector:
             nyquist = sr // 2
             high_pass_freq = 80  # Remove very low frequencies
             b, a = signal.butter(4, high_pass_freq / nyquist, btype='high')
-            audio_filtered = signal.filtfilt(b, a, audio_processed)
+            audio_filtered = filtfilt(b, a, audio_processed)
             
             return audio_filtered
             
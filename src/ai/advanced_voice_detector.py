@@ -15,6 +15,7 @@ from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+from src.core.audio_cache import load_audio
 
 logger = logging.getLogger(__name__)
 
@@ -103,7 +104,7 @@ class AdvancedVoiceDetector:
             logger.info("🎤 Using pyannote.audio for voice detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
+            audio, sr = load_audio(audio_path, sr=self.sr)
             
             # Convert to mono if stereo
             if len(audio.shape) > 1:
@@ -139,7 +140,7 @@ class AdvancedVoiceDetector:
             logger.info("🎤 Using Silero VAD for voice detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=16000)  # Silero expects 16kHz
+            audio, sr = load_audio(audio_path, sr=16000)  # Silero expects 16kHz
             
             # Convert to tensor
             audio_tensor = torch.from_numpy(audio).float()
@@ -174,7 +175,7 @@ class AdvancedVoiceDetector:
             logger.info("🎤 Using WebRTC VAD for voice detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=16000)  # WebRTC expects 16kHz
+            audio, sr = load_audio(audio_path, sr=16000)  # WebRTC expects 16kHz
             
             # Convert to 16-bit PCM
             audio_16bit = (audio * 32767).astype(np.int16)
@@ -341,7 +342,7 @@ class AdvancedVoiceDetector:
             segments = self.detect_voice_activity_advanced(audio_path)
             
             # Get audio info
-            audio, sr = librosa.load(audio_path, sr=self.sr)
+            audio, sr = load_audio(audio_path, sr=self.sr)
             duration = len(audio) / sr
             
             # Calculate statistics
@@ -16,6 +16,10 @@ from typing import Tuple, Optional
 
 # Add Audio_separator_ui to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'Audio_separator_ui'))
+from src.core.audio_cache import load_audio
+from src.core.file_hash import file_hash
+from src.core.feature_bank import get_feature_bank
+from src.core.dtype_policy import with_phase_of
 
 class AIAudioSeparator:
     """AI Audio Separator using MDX models"""
@@ -59,11 +63,9 @@ class AIAudioSeparator:
             converted_path = self._convert_to_stereo_wav(audio_path)
             
             # Create output directory
-            import hashlib
-            with open(converted_path, 'rb') as f:
-                file_hash = hashlib.md5(f.read()).hexdigest()
+            song_hash = file_hash(converted_path, fast=True, length=32)
             
-            song_output_dir = os.path.join(self.output_dir, f"{file_hash}_mdx")
+            song_output_dir = os.path.join(self.output_dir, f"{song_hash}_mdx")
             os.makedirs(song_output_dir, exist_ok=True)
             
             # Use AI model for separation
@@ -91,16 +93,16 @@ class AIAudioSeparator:
             print("Using enhanced fallback method (no AI model available)...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=44100)
+            audio, sr = load_audio(audio_path, sr=44100)
             
             # Enhanced separation using multiple techniques
             # 1. Harmonic-percussive separation
-            harmonic, percussive = librosa.effects.hpss(audio)
+            features = get_feature_bank(audio, sr)
+            harmonic, percussive = features.hpss()
             
-            # 2. Spectral gating to reduce instrumental content
-            stft = librosa.stft(audio)
-            magnitude = np.abs(stft)
-            phase = np.angle(stft)
+            # 2. Spectral gating to reduce instrumental content (cùng STFT với HPSS)
+            stft = features.stft()
+            magnitude = features.magnitude()
             
             # Apply spectral gating (reduce frequencies where vocals are less prominent)
             # Vocals are typically in the 80-8000 Hz range
@@ -122,7 +124,7 @@ class AIAudioSeparator:
             enhanced_magnitude = magnitude * vocal_mask_2d
             
             # Reconstruct audio
-            enhanced_stft = enhanced_magnitude * np.exp(1j * phase)
+            enhanced_stft = with_phase_of(enhanced_magnitude, stft)
             enhanced_audio = librosa.istft(enhanced_stft)
             
             # Ensure same length before combining
@@ -150,16 +152,14 @@ class AIAudioSeparator:
     def _get_model_hash(self, model_path: str) -> str:
         """Get model hash"""
         try:
-            import hashlib
-            with open(model_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            return file_hash(model_path)
         except:
             return "unknown"
     
     def _convert_to_stereo_wav(self, input_path: str) -> str:
         """Convert audio to stereo WAV"""
         try:
-            audio, sr = librosa.load(input_path, sr=44100, mono=False)
+            audio, sr = load_audio(input_path, sr=44100, mono=False)
             
             # Ensure stereo
             if len(audio.shape) == 1:
@@ -186,10 +186,10 @@ class AIAudioSeparator:
             print("Using fallback method (librosa)...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=44100)
+            audio, sr = load_audio(audio_path, sr=44100)
             
             # Harmonic-percussive separation
-            harmonic, percussive = librosa.effects.hpss(audio)
+            harmonic, percussive = get_feature_bank(audio, sr).hpss()
             
             # Use harmonic component as vocals
             vocals = harmonic
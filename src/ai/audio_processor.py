@@ -7,6 +7,7 @@ from transformers import AutoProcessor, AutoModel
 import os
 import logging
 from typing import Tuple, Optional
+from src.core.audio_cache import load_audio
 
 # Thiết lập logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -51,7 +52,7 @@ class AudioProcessor:
     def load_audio(self, file_path: str, sample_rate: int = 44100) -> Tuple[np.ndarray, int]:
         """Tải file âm thanh"""
         try:
-            audio, sr = librosa.load(file_path, sr=sample_rate)
+            audio, sr = load_audio(file_path, sr=sample_rate)
             return audio, sr
         except Exception as e:
             raise Exception(f"Lỗi khi tải file âm thanh: {e}")
@@ -16,6 +16,8 @@ import torch
 import onnxruntime as ort
 from pathlib import Path
 
+from src.core.file_hash import file_hash
+
 # Thêm Audio_separator_ui vào Python path
 audio_separator_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Audio_separator_ui')
 sys.path.insert(0, audio_separator_path)
@@ -68,13 +70,15 @@ class AudioSeparatorIntegration:
             logger.error(f"Loi khoi tao Audio Separator: {e}")
             self.available = False
     
-    def separate_vocals_ai(self, input_file, output_format="wav"):
+    def separate_vocals_ai(self, input_file, output_format="wav", writer=None):
         """
         Tách giọng hát sử dụng AI Audio Separator
         
         Args:
             input_file (str): Đường dẫn file âm thanh đầu vào
             output_format (str): Định dạng file đầu ra (wav, mp3)
+            writer (ArtifactWriter): Nếu có, convert format chạy ở background;
+                file trả về chỉ tồn tại sau writer.wait()
             
         Returns:
             str: Đường dẫn file vocals đã tách
@@ -103,44 +107,13 @@ class AudioSeparatorIntegration:
                 # Khôi phục working directory
                 os.chdir(original_cwd)
             
-            # Chuyển đổi đường dẫn thành absolute path
-            if not os.path.isabs(final_vocals_path):
-                final_vocals_path = os.path.abspath(final_vocals_path)
-            
-            # Đảm bảo đường dẫn đúng
-            if not os.path.exists(final_vocals_path):
-                # Thử đường dẫn trong Audio_separator_ui
-                alt_path = os.path.join(audio_separator_dir, final_vocals_path)
-                if os.path.exists(alt_path):
-                    final_vocals_path = alt_path
-                else:
-                    # Thử đường dẫn tương đối từ clean_song_output
-                    rel_path = os.path.join("clean_song_output", final_vocals_path)
-                    alt_path = os.path.join(audio_separator_dir, rel_path)
-                    if os.path.exists(alt_path):
-                        final_vocals_path = alt_path
-                    else:
-                        # Thử đường dẫn với clean_song_output prefix
-                        clean_song_path = os.path.join(audio_separator_dir, "clean_song_output")
-                        alt_path = os.path.join(clean_song_path, os.path.basename(final_vocals_path))
-                        if os.path.exists(alt_path):
-                            final_vocals_path = alt_path
-                        else:
-                            # Tìm file vocals trong clean_song_output
-                            clean_song_path = os.path.join(audio_separator_dir, "clean_song_output")
-                            if os.path.exists(clean_song_path):
-                                for root, dirs, files in os.walk(clean_song_path):
-                                    for file in files:
-                                        if "Vocals_DeReverb" in file and file.endswith('.wav'):
-                                            full_path = os.path.join(root, file)
-                                            final_vocals_path = full_path
-                                            logger.info(f"Found vocals file: {final_vocals_path}")
-                                            break
-                                    if final_vocals_path and os.path.exists(final_vocals_path):
-                                        break
+            final_vocals_path = self._resolve_output_path(final_vocals_path, audio_separator_dir)
             
             # Chuyển đổi sang MP3 và xóa file WAV gốc
-            if output_format.lower() != "wav":
+            if output_format.lower() != "wav" and writer is not None:
+                # Convert + xóa WAV ở background, trả về đường dẫn đích ngay
+                final_vocals_path = self._convert_format(final_vocals_path, output_format, writer=writer)
+            elif output_format.lower() != "wav":
                 mp3_path = self._convert_format(final_vocals_path, output_format)
                 # Xóa file WAV gốc sau khi convert thành công
                 if mp3_path != final_vocals_path and os.path.exists(mp3_path):
@@ -159,6 +132,100 @@ class AudioSeparatorIntegration:
             logger.error(f"Loi trong AI vocal separation: {e}")
             raise
     
+    def separate_vocals_array(self, buffer):
+        """
+        Tách giọng hát từ AudioBuffer trong bộ nhớ
+        
+        MDX chỉ nhận file nên input được ghi đúng một lần (stereo WAV 44.1kHz)
+        vào thư mục của bài; vocals WAV được đọc lại trực tiếp, không
+        convert MP3 và không copy.
+        
+        Args:
+            buffer (AudioBuffer): Audio đầu vào
+            
+        Returns:
+            AudioBuffer: Vocals đã tách (path trỏ tới file WAV của MDX)
+        """
+        if not self.available:
+            raise Exception("Audio Separator không khả dụng")
+        
+        from src.core.audio_buffer import AudioBuffer
+        
+        try:
+            logger.info("Bat dau tach giong hat (array) bang AI Audio Separator...")
+            
+            stereo = buffer.resample(44100).audio
+            if stereo.ndim == 1:
+                stereo = np.stack([stereo, stereo])
+            elif stereo.shape[0] == 1:
+                stereo = np.repeat(stereo, 2, axis=0)
+            
+            # Song ID từ nội dung mảng (không cần đọc lại file)
+            song_id = hashlib.blake2b(np.ascontiguousarray(stereo).tobytes()).hexdigest()[:18]
+            
+            audio_separator_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Audio_separator_ui')
+            song_output_dir = os.path.join(audio_separator_dir, "clean_song_output", f"{song_id}_mdx")
+            os.makedirs(song_output_dir, exist_ok=True)
+            input_path = os.path.join(song_output_dir, "input.wav")
+            sf.write(input_path, stereo.T, 44100)
+            
+            original_cwd = os.getcwd()
+            os.chdir(audio_separator_dir)
+            try:
+                final_vocals_path = self._separate_vocals_only(input_path, song_id, audio_separator_dir)
+            finally:
+                os.chdir(original_cwd)
+            
+            final_vocals_path = self._resolve_output_path(final_vocals_path, audio_separator_dir)
+            vocals = AudioBuffer.from_file(final_vocals_path, sr=None, mono=True)
+            
+            logger.info(f"AI Vocal separation (array) hoan thanh: {final_vocals_path}")
+            return vocals
+            
+        except Exception as e:
+            logger.error(f"Loi trong AI vocal separation (array): {e}")
+            raise
+    
+    def _resolve_output_path(self, final_vocals_path, audio_separator_dir):
+        """Tìm đường dẫn thực của file vocals do run_mdx trả về"""
+        # Chuyển đổi đường dẫn thành absolute path
+        if not os.path.isabs(final_vocals_path):
+            final_vocals_path = os.path.abspath(final_vocals_path)
+        
+        # Đảm bảo đường dẫn đúng
+        if not os.path.exists(final_vocals_path):
+            # Thử đường dẫn trong Audio_separator_ui
+            alt_path = os.path.join(audio_separator_dir, final_vocals_path)
+            if os.path.exists(alt_path):
+                final_vocals_path = alt_path
+            else:
+                # Thử đường dẫn tương đối từ clean_song_output
+                rel_path = os.path.join("clean_song_output", final_vocals_path)
+                alt_path = os.path.join(audio_separator_dir, rel_path)
+                if os.path.exists(alt_path):
+                    final_vocals_path = alt_path
+                else:
+                    # Thử đường dẫn với clean_song_output prefix
+                    clean_song_path = os.path.join(audio_separator_dir, "clean_song_output")
+                    alt_path = os.path.join(clean_song_path, os.path.basename(final_vocals_path))
+                    if os.path.exists(alt_path):
+                        final_vocals_path = alt_path
+                    else:
+                        # Tìm file vocals trong clean_song_output
+                        clean_song_path = os.path.join(audio_separator_dir, "clean_song_output")
+                        if os.path.exists(clean_song_path):
+                            for root, dirs, files in os.walk(clean_song_path):
+                                for file in files:
+                                    if "Vocals_DeReverb" in file and file.endswith('.wav'):
+                                        full_path = os.path.join(root, file)
+                                        final_vocals_path = full_path
+                                        logger.info(f"Found vocals file: {final_vocals_path}")
+                                        break
+                                if final_vocals_path and os.path.exists(final_vocals_path):
+                                    break
+        
+        return final_vocals_path
+    
     def _separate_vocals_only(self, stereo_file, song_id, audio_separator_dir):
         """
         Tách vocals chỉ tạo ra file vocals cần thiết, không tạo các file thừa
@@ -181,9 +248,14 @@ class AudioSeparatorIntegration:
             # Chuẩn hóa tên input về ASCII để tránh lỗi tên file Unicode
             ascii_input_path = os.path.join(song_output_dir, "input.wav")
             try:
-                if os.path.exists(ascii_input_path):
+                if os.path.abspath(stereo_file) == os.path.abspath(ascii_input_path):
+                    # Input đã được ghi thẳng vào đây (separate_vocals_array), không cần copy
+                    pass
+                elif os.path.exists(ascii_input_path):
                     os.remove(ascii_input_path)
-                shutil.copyfile(stereo_file, ascii_input_path)
+                    shutil.copyfile(stereo_file, ascii_input_path)
+                else:
+                    shutil.copyfile(stereo_file, ascii_input_path)
                 source_path_for_mdx = ascii_input_path
             except Exception:
                 # Nếu copy thất bại, fallback dùng đường dẫn gốc
@@ -292,15 +364,16 @@ class AudioSeparatorIntegration:
             raise
     
     def _get_file_hash(self, file_path):
-        """Tạo hash cho file"""
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.blake2b()
-            while chunk := f.read(8192):
-                file_hash.update(chunk)
-        return file_hash.hexdigest()[:18]
+        """Tạo hash cho file (lấy mẫu, được cache theo danh tính file)"""
+        return file_hash(file_path, fast=True, length=18)
     
-    def _convert_format(self, input_path, target_format):
-        """Chuyển đổi format file"""
+    def _convert_format(self, input_path, target_format, writer=None):
+        """Chuyển đổi format file (writer: chạy ở background, xóa file gốc khi xong)"""
+        if writer is not None:
+            output_path = f"{os.path.splitext(input_path)[0]}_converted.{target_format.lower()}"
+            writer.submit(output_path, self._convert_and_replace, input_path, output_path, target_format)
+            return output_path
+        
         try:
             # Load audio
             audio, sr = sf.read(input_path)
@@ -319,6 +392,14 @@ class AudioSeparatorIntegration:
             logger.error(f"Loi convert format: {e}")
             return input_path
     
+    @staticmethod
+    def _convert_and_replace(input_path, output_path, target_format):
+        """Job cho ArtifactWriter: convert rồi xóa file WAV gốc (lỗi được writer ghi nhận)"""
+        audio, sr = sf.read(input_path)
+        sf.write(output_path, audio, sr, format=target_format.upper())
+        os.remove(input_path)
+        logger.info(f"Converted to {target_format}: {output_path}")
+    
     def get_status(self):
         """Trả về trạng thái của Audio Separator"""
         if not self.available:
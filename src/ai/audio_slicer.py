@@ -11,6 +11,8 @@ from typing import Tuple, Optional
 import logging
 from pathlib import Path
 import os
+from src.core.audio_cache import load_audio_range
+from src.core.audio_io import probe
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +42,8 @@ class AudioSlicer:
         try:
             logger.info(f"✂️ Cắt audio: {start_time:.2f}s - {start_time + duration:.2f}s")
             
-            # Load audio
-            audio, sr = librosa.load(input_path, sr=self.sr, offset=start_time, duration=duration)
+            # Chỉ decode đoạn cần cắt (seek trong file, không decode cả bài)
+            audio, sr = load_audio_range(input_path, start_time, start_time + duration, sr=self.sr)
             
             # Ensure output directory exists
             output_dir = Path(output_path).parent
@@ -120,15 +122,14 @@ class AudioSlicer:
             dict: Thông tin audio
         """
         try:
-            # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
-            duration = len(audio) / sr
+            # Chỉ đọc header, không decode
+            info = probe(audio_path)
             
             return {
-                "duration": duration,
-                "sample_rate": sr,
-                "samples": len(audio),
-                "channels": 1 if audio.ndim == 1 else audio.shape[0]
+                "duration": info['duration'],
+                "sample_rate": info['sample_rate'],
+                "samples": info['frames'],
+                "channels": info['channels']
             }
             
         except Exception as e:
@@ -149,7 +150,7 @@ class AudioSlicer:
         """
         try:
             # Load segment
-            audio, sr = librosa.load(audio_path, sr=self.sr, offset=start_time, duration=duration)
+            audio, sr = load_audio_range(audio_path, start_time, start_time + duration, sr=self.sr)
             
             logger.info(f"🎵 Preview segment: {start_time:.2f}s - {start_time + duration:.2f}s")
             logger.info(f"   Duration: {duration:.2f}s")
@@ -14,6 +14,8 @@ from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+from src.core.audio_cache import load_audio
+from src.core.wav_reader import open_wav, frame_rms_zcr
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +32,24 @@ class CorrectVoiceDetector:
         try:
             logger.info("🎯 Correct Voice Detection...")
             
-            # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
-            
-            # Convert to mono if stereo
-            if len(audio.shape) > 1:
-                audio = librosa.to_mono(audio)
+            wav = open_wav(audio_path)
+            if wav is not None:
+                # WAV: memory-map và tính RMS theo block, không decode cả file
+                sr = self.sr
+                rms, _ = frame_rms_zcr(wav, sr, self.frame_length, self.hop_length)
+                total_duration = wav.duration
+            else:
+                # Load audio
+                audio, sr = load_audio(audio_path, sr=self.sr)
+                
+                # Convert to mono if stereo
+                if len(audio.shape) > 1:
+                    audio = librosa.to_mono(audio)
+                rms, _ = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
+                total_duration = len(audio) / sr
             
             # Phân tích để tìm vị trí giọng hát thực sự
-            voice_start = self._find_correct_voice_start(audio, sr)
+            voice_start = self._find_correct_voice_start(rms, sr)
             
             if voice_start is None:
                 logger.warning("⚠️ Không tìm thấy vị trí giọng hát")
@@ -47,7 +58,7 @@ class CorrectVoiceDetector:
             # Tạo segment từ vị trí tìm được
             segments = [{
                 'start': voice_start,
-                'end': len(audio) / sr,  # Đến cuối file
+                'end': total_duration,  # Đến cuối file
                 'confidence': 1.0,
                 'method': 'correct_detection'
             }]
@@ -61,15 +72,12 @@ class CorrectVoiceDetector:
             logger.error(f"❌ Correct voice detection failed: {e}")
             return []
     
-    def _find_correct_voice_start(self, audio: np.ndarray, sr: int) -> Optional[float]:
-        """Tìm vị trí bắt đầu giọng hát thực sự"""
+    def _find_correct_voice_start(self, rms: np.ndarray, sr: int) -> Optional[float]:
+        """Tìm vị trí bắt đầu giọng hát thực sự từ RMS theo frame"""
         try:
             # Phân tích từng giây
             hop_length = self.hop_length
             
-            # Tính RMS energy
-            rms = librosa.feature.rms(y=audio, frame_length=self.frame_length, hop_length=hop_length)[0]
-            
             # Chuyển frames thành thời gian
             times = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=hop_length)
             
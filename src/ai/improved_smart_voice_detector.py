@@ -14,6 +14,7 @@ from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+from src.core.audio_cache import load_audio
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +32,7 @@ class ImprovedSmartVoiceDetector:
             logger.info("🧠 Improved Smart Voice Detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
+            audio, sr = load_audio(audio_path, sr=self.sr)
             
             # Convert to mono if stereo
             if len(audio.shape) > 1:
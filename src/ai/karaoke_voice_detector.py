@@ -14,6 +14,9 @@ from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+from src.core.audio_cache import load_audio
+from src.core.wav_reader import frame_rms_zcr
+from src.core.feature_graph import get_feature_graph
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +34,7 @@ class KaraokeVoiceDetector:
             logger.info("🎤 Karaoke Voice Detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
+            audio, sr = load_audio(audio_path, sr=self.sr)
             
             # Convert to mono if stereo
             if len(audio.shape) > 1:
@@ -62,7 +65,7 @@ class KaraokeVoiceDetector:
         """Phát hiện voice dựa trên energy pattern"""
         try:
             # RMS energy với window nhỏ hơn để phát hiện chi tiết
-            rms = librosa.feature.rms(y=audio, frame_length=1024, hop_length=256)[0]
+            rms, _ = frame_rms_zcr(audio, sr, frame_length=1024, hop_length=256)
             
             # Tính toán dynamic threshold
             rms_smooth = librosa.util.normalize(rms)
@@ -83,10 +86,11 @@ class KaraokeVoiceDetector:
     def _detect_spectral_pattern(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Phát hiện voice dựa trên spectral pattern"""
         try:
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)[0]
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr)[0]
+            # Spectral features (một STFT cho cả ba đặc trưng)
+            features = get_feature_graph(audio, sr).request('centroid', 'rolloff', 'bandwidth')
+            spectral_centroids = features['centroid']
+            spectral_rolloff = features['rolloff']
+            spectral_bandwidth = features['bandwidth']
             
             # Voice frequency range (80-4000 Hz)
             voice_low = 80
@@ -115,12 +119,11 @@ class KaraokeVoiceDetector:
     def _detect_harmonic_pattern(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Phát hiện voice dựa trên harmonic pattern (đặc trưng của giọng hát)"""
         try:
-            # Harmonic-percussive separation
-            y_harmonic, y_percussive = librosa.effects.hpss(audio)
-            
-            # Phân tích harmonic content
-            harmonic_centroids = librosa.feature.spectral_centroid(y=y_harmonic, sr=sr)[0]
-            harmonic_rolloff = librosa.feature.spectral_rolloff(y=y_harmonic, sr=sr)[0]
+            # Harmonic-percussive separation (dùng chung với các detector khác trên cùng mảng)
+            # rồi phân tích harmonic content
+            features = get_feature_graph(audio, sr).request('harmonic.centroid', 'harmonic.rolloff')
+            harmonic_centroids = features['harmonic.centroid']
+            harmonic_rolloff = features['harmonic.rolloff']
             
             # Voice có harmonic content cao
             harmonic_threshold = np.percentile(harmonic_centroids, 20)
@@ -5,6 +5,7 @@ import torch
 from transformers import AutoProcessor, AutoModel
 import warnings
 import logging
+from src.core.audio_cache import load_audio
 
 warnings.filterwarnings("ignore")
 
@@ -63,7 +64,7 @@ class KeyDetector:
             
             # Tải âm thanh
             logger.info("📥 Đang tải file âm thanh...")
-            audio, sr = librosa.load(audio_path, sr=22050)
+            audio, sr = load_audio(audio_path, sr=22050)
             logger.info(f"✅ Đã tải audio: {len(audio)} samples, {sr} Hz")
             
             if self.model is not None:
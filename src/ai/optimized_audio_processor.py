@@ -7,6 +7,7 @@ Optimized Audio Processor - Workflow tối ưu hóa để giảm thời gian x
 import os
 import sys
 import logging
+import concurrent.futures
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 import numpy as np
@@ -23,6 +24,12 @@ from ai.correct_voice_detector import CorrectVoiceDetector
 from ai.advanced_audio_processor import AdvancedAudioProcessor
 from ai.advanced_key_detector import AdvancedKeyDetector
 from core.scoring_system import KaraokeScoringSystem
+from src.core.audio_cache import load_audio, load_audio_range
+from src.core.audio_buffer import AudioBuffer
+from src.core.shared_audio import SharedAudioBuffer, resolve_audio_buffer
+from src.core.artifact_writer import ArtifactWriter
+from src.core.batch_features import extract_batch_features
+from src.core.beat_index import lookup_beat
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +58,9 @@ class OptimizedAudioProcessor:
     def process_karaoke_optimized(self, 
                                 karaoke_file: str, 
                                 beat_file: str,
-                                output_dir: str = None) -> Dict:
+                                output_dir: str = None,
+                                save_artifacts: bool = True,
+                                beat_buffer=None) -> Dict:
         """
         Xử lý karaoke với workflow tối ưu hóa
         
@@ -59,11 +68,18 @@ class OptimizedAudioProcessor:
             karaoke_file: Đường dẫn file karaoke
             beat_file: Đường dẫn file beat nhạc
             output_dir: Thư mục output (tùy chọn)
+            save_artifacts: Ghi slice/vocals ra output_dir (các bước trong pipeline dùng mảng trong bộ nhớ)
+            beat_buffer: Beat đã decode (AudioBuffer hoặc handle shared memory từ process cha);
+                nếu có thì không decode lại beat_file
             
         Returns:
             Dict: Kết quả xử lý hoàn chỉnh
         """
+        # Slice / vocals được ghi ở background trong lúc pipeline tiếp tục
+        writer = ArtifactWriter()
         try:
+            beat_buffer = resolve_audio_buffer(beat_buffer)
+            
             logger.info("🎤 Bắt đầu xử lý karaoke với workflow tối ưu hóa...")
             
             # Tạo output directory nếu chưa có (ưu tiên clean_song_output)
@@ -76,96 +92,111 @@ class OptimizedAudioProcessor:
             voice_segments = self.correct_vad.detect_voice_activity(karaoke_file)
             
             if not voice_segments:
-                return {
+                return self._finish_artifacts(writer, {
                     "success": False,
                     "error": "Không phát hiện được giọng hát trong file karaoke",
                     "step": "voice_detection"
-                }
+                })
             
             # Tìm đoạn voice đầu tiên phù hợp
             first_voice = self._find_optimal_voice_segment(voice_segments)
             if not first_voice:
-                return {
+                return self._finish_artifacts(writer, {
                     "success": False,
                     "error": "Không tìm thấy đoạn voice phù hợp",
                     "step": "voice_selection"
-                }
+                })
             
             logger.info(f"🎯 Tìm thấy đoạn voice: {first_voice['start']:.2f}s - {first_voice['end']:.2f}s")
 
             # Bước 2: Cắt 30s từ 15s đến 45s của file karaoke
             logger.info("✂️ Bước 2: Cắt 30s (15s–45s) từ file karaoke...")
-            import librosa, soundfile as sf
             base_stem = os.path.splitext(os.path.basename(karaoke_file))[0]
             start_t = 15.0
             duration = 30.0
             end_t = start_t + duration
-            audio, sr = librosa.load(karaoke_file, sr=None, mono=True)
-            start_sample = int(start_t * sr)
-            end_sample = int(end_t * sr)
-            if start_sample >= len(audio):
-                return {
+            # Chỉ decode đoạn 15s–45s thay vì cả bài
+            slice_audio, sr = load_audio_range(karaoke_file, start_t, end_t, sr=None, mono=True)
+            if len(slice_audio) == 0:
+                return self._finish_artifacts(writer, {
                     "success": False,
                     "error": "Karaoke ngắn hơn 15s",
                     "step": "audio_slicing"
-                }
-            slice_audio = audio[start_sample:min(end_sample, len(audio))]
-            sliced_path = os.path.join(output_dir, f"{base_stem}_slice_{int(start_t)}s_{int(end_t)}s.wav")
-            sf.write(sliced_path, slice_audio, sr)
+                })
+            slice_buffer = AudioBuffer(slice_audio, sr, offset=start_t)
+            sliced_path = None
+            if save_artifacts:
+                sliced_path = os.path.join(output_dir, f"{base_stem}_slice_{int(start_t)}s_{int(end_t)}s.wav")
+                writer.write_audio(sliced_path, slice_audio, sr)
 
             # Bước 3: Cắt beat từ 15s đến 45s (cùng khoảng với karaoke) để đảm bảo key chính xác
             logger.info("✂️ Bước 3: Cắt beat từ 15s–45s (cùng khoảng với karaoke)...")
-            beat_audio, beat_sr = librosa.load(beat_file, sr=None, mono=True)
             beat_start_t = start_t  # Cùng thời điểm với karaoke (15s)
             beat_end_t = end_t      # Cùng thời điểm với karaoke (45s)
-            beat_start_sample = int(beat_start_t * beat_sr)
-            beat_end_sample = int(beat_end_t * beat_sr)
-            if beat_start_sample >= len(beat_audio):
-                return {
+            # Beat trong beat index: key, lưới beat, chroma, F0 đã tính offline
+            beat_analysis = lookup_beat(beat_file)
+            if beat_analysis is not None and not save_artifacts:
+                # Đoạn beat chỉ dùng làm artifact: không cần decode, chỉ kiểm tra độ dài
+                beat_slice = None
+                beat_too_short = beat_analysis.duration <= beat_start_t
+            else:
+                if beat_buffer is not None:
+                    beat_sr = beat_buffer.sr
+                    beat_slice = beat_buffer.audio[int(beat_start_t * beat_sr):int(beat_end_t * beat_sr)]
+                else:
+                    beat_slice, beat_sr = load_audio_range(beat_file, beat_start_t, beat_end_t, sr=None, mono=True)
+                beat_too_short = len(beat_slice) == 0
+            if beat_too_short:
+                return self._finish_artifacts(writer, {
                     "success": False,
                     "error": "Beat ngắn hơn 15s",
                     "step": "beat_slicing"
-                }
-            beat_slice = beat_audio[beat_start_sample:min(beat_end_sample, len(beat_audio))]
-            beat_sliced_path = os.path.join(output_dir, f"{base_stem}_beat_slice_{int(beat_start_t)}s_{int(beat_end_t)}s.wav")
-            sf.write(beat_sliced_path, beat_slice, beat_sr)
+                })
+            if save_artifacts:
+                beat_sliced_path = os.path.join(output_dir, f"{base_stem}_beat_slice_{int(beat_start_t)}s_{int(beat_end_t)}s.wav")
+                writer.write_audio(beat_sliced_path, beat_slice, beat_sr)
 
             # Bước 4: AI Audio Separator - Tách giọng từ file đã cắt 30s
             logger.info("🎤 Bước 4: Tách giọng hát từ đoạn 30s đã cắt...")
-            vocals_file = self.audio_processor.separate_vocals(sliced_path)
+            vocals_export = None
+            if save_artifacts:
+                vocals_export = os.path.join(output_dir, f"{base_stem}_slice_vocals.wav")
+            vocals = self.audio_processor.separate_vocals_array(slice_buffer, output_path=vocals_export, writer=writer)
             
-            if not vocals_file or not os.path.exists(vocals_file):
-                return {
+            if vocals is None or len(vocals.audio) == 0:
+                return self._finish_artifacts(writer, {
                     "success": False,
                     "error": "Lỗi tách giọng hát",
                     "step": "vocal_separation"
-                }
-            
-            # Copy/export vocals 30s về output_dir với tên dễ nhận biết
-            vocals_ext = os.path.splitext(vocals_file)[1]
-            vocals_export = os.path.join(output_dir, f"{base_stem}_slice_vocals{vocals_ext}")
-            try:
-                import shutil
-                if vocals_file != vocals_export:
-                    shutil.copy2(vocals_file, vocals_export)
-            except Exception:
-                vocals_export = vocals_file
+                })
 
-            logger.info(f"✅ Đã tách giọng hát (20s): {vocals_export}")
+            logger.info(f"✅ Đã tách giọng hát (30s): {vocals_export or 'in-memory'}")
             
             # Bước 3: Key Detection - Detect key từ file beat gốc (không cắt)
             logger.info("🎹 Bước 3: Phát hiện phím âm nhạc...")
             
-            # Key detection cho vocals (file 20s đã tách)
-            vocals_key = self.key_detector.detect_key(vocals_export, "vocals")
+            # Key detection cho vocals (mảng đã tách, không decode lại); cùng mảng 22.05kHz
+            # với scoring để F0 / chroma của vocals chỉ tính một lần
+            vocals_22k = vocals.to_mono().resample(22050)
+            vocals_key = self.key_detector.detect_key_array(vocals_22k.audio, vocals_22k.sr, "vocals",
+                                                            audio_path=vocals.path)
             
             # Thử nhiều phương pháp detect key cho beat (file gốc)
             beat_key = None
             beat_methods = ['beat', 'instrumental', 'vocals']  # Thử các audio_type khác nhau
+            if beat_analysis is not None and beat_analysis.key is not None:
+                beat_key = dict(beat_analysis.key)
+                beat_methods = []
+                logger.info(f"📇 Beat key từ beat index: {beat_key['key']}")
             
             for method in beat_methods:
                 try:
-                    temp_beat_key = self.key_detector.detect_key(beat_file, method)
+                    # Cache theo nội dung file beat (key_cache): beat dùng lại không phải phân tích lại
+                    if beat_buffer is not None:
+                        temp_beat_key = self.key_detector.detect_key_cached(
+                            beat_file, method, audio=beat_buffer.audio, sr=beat_buffer.sr)
+                    else:
+                        temp_beat_key = self.key_detector.detect_key_cached(beat_file, method)
                     if temp_beat_key and 'key' in temp_beat_key:
                         beat_key = temp_beat_key
                         logger.info(f"✅ Beat key detected với method '{method}': {beat_key['key']}")
@@ -185,8 +216,15 @@ class OptimizedAudioProcessor:
             
             # Bước 5: Scoring - Tính điểm
             logger.info("📊 Bước 5: Tính điểm tổng thể...")
-            scoring_result = self.scoring_system.calculate_overall_score(
-                karaoke_file, beat_file, vocals_export
+            karaoke_audio, _ = load_audio(karaoke_file, sr=22050)
+            if beat_analysis is not None:
+                beat_audio = None
+            elif beat_buffer is not None:
+                beat_audio = beat_buffer.to_mono().resample(22050).audio
+            else:
+                beat_audio, _ = load_audio(beat_file, sr=22050)
+            scoring_result = self.scoring_system.calculate_overall_score_arrays(
+                karaoke_audio, beat_audio, vocals_22k.audio, sr=22050, beat_analysis=beat_analysis
             )
             
             logger.info(f"🏆 Overall score: {scoring_result['overall_score']}/100")
@@ -223,17 +261,29 @@ class OptimizedAudioProcessor:
             }
             
             logger.info("🎉 Hoàn thành xử lý karaoke với workflow tối ưu hóa!")
-            return result
+            return self._finish_artifacts(writer, result)
             
         except Exception as e:
             logger.error(f"❌ Lỗi trong quá trình xử lý: {e}")
             import traceback
             traceback.print_exc()
-            return {
+            return self._finish_artifacts(writer, {
                 "success": False,
                 "error": str(e),
                 "step": "unknown"
-            }
+            })
+    
+    def _finish_artifacts(self, writer: ArtifactWriter, result: Dict) -> Dict:
+        """Chờ ghi artifact xong, đưa lỗi ghi file (nếu có) vào result"""
+        artifact_errors = writer.wait()
+        writer.close()
+        if artifact_errors:
+            result["artifact_errors"] = artifact_errors
+            processed = result.get("processed_files", {})
+            for field, path in list(processed.items()):
+                if path in artifact_errors:
+                    processed[field] = None
+        return result
     
     def _find_optimal_voice_segment(self, voice_segments: list) -> Optional[Dict]:
         """Tìm đoạn voice tối ưu để cắt"""
@@ -266,8 +316,8 @@ class OptimizedAudioProcessor:
 🎉 XỬ LÝ THÀNH CÔNG!
 
 📁 Files đã xử lý:
-   • Karaoke slice: {os.path.basename(result['processed_files']['sliced_karaoke'])}
-   • Vocals file: {os.path.basename(result['processed_files']['vocals_file'])}
+   • Karaoke slice: {os.path.basename(result['processed_files']['sliced_karaoke'] or 'in-memory')}
+   • Vocals file: {os.path.basename(result['processed_files']['vocals_file'] or 'in-memory')}
 
 🎤 Voice Detection:
    • Tìm thấy {len(result['voice_detection']['voice_segments'])} đoạn voice
@@ -290,26 +340,32 @@ class OptimizedAudioProcessor:
     
     def batch_process_optimized(self, 
                                file_pairs: list, 
-                               output_dir: str = None) -> list:
+                               output_dir: str = None,
+                               workers: int = 1) -> list:
         """
         Xử lý batch nhiều cặp file với workflow tối ưu hóa
         
         Args:
             file_pairs: List of tuples [(karaoke_file, beat_file), ...]
             output_dir: Thư mục output
+            workers: Số process song song (>1: dùng process pool, beat được
+                decode một lần và chia sẻ qua shared memory)
             
         Returns:
             list: Danh sách kết quả xử lý
         """
-        results = []
-        
         logger.info(f"🎤 Bắt đầu batch processing {len(file_pairs)} file pairs...")
         
-        for i, (karaoke_file, beat_file) in enumerate(file_pairs, 1):
-            logger.info(f"📁 Processing pair {i}/{len(file_pairs)}: {Path(karaoke_file).name}")
-            
-            result = self.process_karaoke_optimized(karaoke_file, beat_file, output_dir)
-            results.append(result)
+        if workers > 1:
+            results = self._batch_process_parallel(file_pairs, output_dir, workers)
+        else:
+            results = [
+                self.process_karaoke_optimized(karaoke_file, beat_file, output_dir)
+                for karaoke_file, beat_file in file_pairs
+            ]
+        
+        for i, ((karaoke_file, beat_file), result) in enumerate(zip(file_pairs, results), 1):
+            logger.info(f"📁 Pair {i}/{len(file_pairs)}: {Path(karaoke_file).name}")
             
             if result["success"]:
                 logger.info(f"✅ Pair {i} processed successfully")
@@ -321,3 +377,79 @@ class OptimizedAudioProcessor:
         logger.info(f"📊 Batch processing completed: {successful}/{len(file_pairs)} pairs successful")
         
         return results
+    
+    def batch_detect_keys(self, audio_files: list, start_t: float = 15.0, duration: float = 30.0,
+                          batch_size: int = 32) -> list:
+        """
+        Phát hiện key cho nhiều slice cùng lúc (chấm lại cả đêm thi)
+        
+        Các slice [start_t, start_t + duration) được decode ở self.sr rồi trích
+        chroma theo batch (một STFT batched) thay vì chạy từng file một.
+        
+        Returns:
+            list: Key dict cho mỗi file (None nếu file lỗi hoặc ngắn hơn start_t)
+        """
+        clips, indices = [], []
+        for i, audio_file in enumerate(audio_files):
+            try:
+                audio, _ = load_audio_range(audio_file, start_t, start_t + duration, sr=self.sr, mono=True)
+            except Exception as e:
+                logger.warning(f"⚠️ Không đọc được {audio_file}: {e}")
+                continue
+            if len(audio) > 0:
+                clips.append(audio)
+                indices.append(i)
+        
+        results = [None] * len(audio_files)
+        if not clips:
+            return results
+        
+        features = extract_batch_features(clips, self.sr, batch_size=batch_size)
+        for i, key_info in zip(indices, self.key_detector.detect_keys_from_features(features.clips())):
+            results[i] = key_info
+        
+        logger.info(f"🎹 Batch key detection: {len(clips)}/{len(audio_files)} files")
+        return results
+    
+    def _batch_process_parallel(self, file_pairs: list, output_dir: str, workers: int) -> list:
+        """Chạy các cặp file trên process pool, beat dùng chung qua shared memory"""
+        shared_beats = {}
+        try:
+            # Mỗi beat chỉ decode một lần ở process cha
+            for _, beat_file in file_pairs:
+                if beat_file not in shared_beats:
+                    beat_audio, beat_sr = load_audio(beat_file, sr=self.sr)
+                    shared_beats[beat_file] = SharedAudioBuffer.from_array(beat_audio, sr=beat_sr)
+            
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                                        initargs=(self.sr,)) as executor:
+                futures = [
+                    executor.submit(_process_pair_in_worker, karaoke_file, beat_file, output_dir,
+                                    shared_beats[beat_file].handle())
+                    for karaoke_file, beat_file in file_pairs
+                ]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append({"success": False, "error": str(e), "step": "worker"})
+                return results
+        finally:
+            for shared in shared_beats.values():
+                shared.close()
+
+
+# Processor riêng cho mỗi worker process (khởi tạo một lần trong initializer)
+_worker_processor = None
+
+
+def _init_batch_worker(sr: int):
+    global _worker_processor
+    _worker_processor = OptimizedAudioProcessor(sr)
+
+
+def _process_pair_in_worker(karaoke_file: str, beat_file: str, output_dir: str, beat_handle: Dict) -> Dict:
+    """Worker: attach beat từ shared memory theo tên rồi xử lý một cặp file"""
+    return _worker_processor.process_karaoke_optimized(karaoke_file, beat_file, output_dir,
+                                                       beat_buffer=beat_handle)
@@ -11,6 +11,8 @@ import torch
 import onnxruntime as ort
 from typing import Tuple, Union
 import warnings
+from src.core.audio_cache import load_audio
+from src.core.file_hash import file_hash
 warnings.filterwarnings("ignore")
 
 # Thêm đường dẫn đến Audio_separator_ui
@@ -66,7 +68,7 @@ class RealAudioProcessor:
     def load_audio(self, audio_path: str, target_sr: int = 44100) -> Tuple[np.ndarray, int]:
         """Load audio file"""
         try:
-            audio, sr = librosa.load(audio_path, sr=target_sr, mono=False)
+            audio, sr = load_audio(audio_path, sr=target_sr, mono=False)
             return audio, sr
         except Exception as e:
             print(f"Error loading audio: {e}")
@@ -78,9 +80,7 @@ class RealAudioProcessor:
             return self.MDX.get_hash(file_path)
         except:
             # Fallback hash calculation
-            import hashlib
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            return file_hash(file_path)
     
     def separate_vocals_real(self, audio_path: str, output_path: Union[str, None] = None) -> str:
         """Real vocal separation using Audio Separator AI models"""
@@ -182,12 +182,12 @@ class RealAudioProcessor:
             mdx_sess = self.MDX(model_path, model, processor=processor_num)
             
             # Load and process audio
-            wave, sr = librosa.load(audio_path, mono=False, sr=44100)
+            wave, sr = load_audio(audio_path, mono=False, sr=44100)
             
             # Normalize input
             peak = max(np.max(wave), abs(np.min(wave)))
             if peak > 0:
-                wave /= peak
+                wave = wave / peak
             
             # Process with denoising
             print("🔄 Processing audio with AI model...")
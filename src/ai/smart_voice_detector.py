@@ -14,6 +14,9 @@ from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+from src.core.audio_cache import load_audio
+from src.core.wav_reader import frame_rms_zcr
+from src.core.feature_graph import get_feature_graph
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +34,7 @@ class SmartVoiceDetector:
             logger.info("🧠 Smart Voice Detection...")
             
             # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
+            audio, sr = load_audio(audio_path, sr=self.sr)
             
             # Convert to mono if stereo
             if len(audio.shape) > 1:
@@ -72,10 +75,10 @@ class SmartVoiceDetector:
             baseline_audio = audio[:baseline_length]
             
             # Tính toán features của baseline
-            baseline_rms = librosa.feature.rms(y=baseline_audio)[0]
-            baseline_centroids = librosa.feature.spectral_centroid(y=baseline_audio, sr=sr)[0]
-            baseline_rolloff = librosa.feature.spectral_rolloff(y=baseline_audio, sr=sr)[0]
-            baseline_zcr = librosa.feature.zero_crossing_rate(baseline_audio)[0]
+            baseline_rms, baseline_zcr = frame_rms_zcr(baseline_audio, sr, self.frame_length, self.hop_length)
+            baseline = get_feature_graph(baseline_audio, sr).request('centroid', 'rolloff')
+            baseline_centroids = baseline['centroid']
+            baseline_rolloff = baseline['rolloff']
             
             baseline_features = {
                 'rms_mean': np.mean(baseline_rms),
@@ -103,8 +106,8 @@ class SmartVoiceDetector:
     def _detect_energy_with_baseline(self, audio: np.ndarray, sr: int, baseline_features: Dict) -> List[Dict]:
         """Phát hiện voice dựa trên energy với baseline"""
         try:
-            # RMS energy
-            rms = librosa.feature.rms(y=audio)[0]
+            # RMS energy (tính theo block)
+            rms, _ = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
             
             # Threshold dựa trên baseline + margin
             baseline_rms = baseline_features.get('rms_mean', np.mean(rms))
@@ -127,9 +130,10 @@ class SmartVoiceDetector:
     def _detect_spectral_with_baseline(self, audio: np.ndarray, sr: int, baseline_features: Dict) -> List[Dict]:
         """Phát hiện voice dựa trên spectral với baseline"""
         try:
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)[0]
+            # Spectral features (STFT dùng chung với voice characteristics)
+            features = get_feature_graph(audio, sr).request('centroid', 'rolloff')
+            spectral_centroids = features['centroid']
+            spectral_rolloff = features['rolloff']
             
             # Thresholds dựa trên baseline
             baseline_centroid = baseline_features.get('centroid_mean', np.mean(spectral_centroids))
@@ -157,12 +161,11 @@ class SmartVoiceDetector:
     def _detect_harmonic_pattern(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Phát hiện voice dựa trên harmonic pattern"""
         try:
-            # Harmonic-percussive separation
-            y_harmonic, y_percussive = librosa.effects.hpss(audio)
-            
-            # Phân tích harmonic content
-            harmonic_centroids = librosa.feature.spectral_centroid(y=y_harmonic, sr=sr)[0]
-            harmonic_rolloff = librosa.feature.spectral_rolloff(y=y_harmonic, sr=sr)[0]
+            # Harmonic-percussive separation (dùng chung với các detector khác trên cùng mảng)
+            # rồi phân tích harmonic content
+            features = get_feature_graph(audio, sr).request('harmonic.centroid', 'harmonic.rolloff')
+            harmonic_centroids = features['harmonic.centroid']
+            harmonic_rolloff = features['harmonic.rolloff']
             
             # Thresholds cho harmonic content
             harmonic_threshold = np.percentile(harmonic_centroids, 30)
@@ -185,11 +188,13 @@ class SmartVoiceDetector:
     def _detect_voice_characteristics(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Phát hiện voice dựa trên voice characteristics"""
         try:
+            features = get_feature_graph(audio, sr).request('mfcc', 'bandwidth')
+            
             # MFCC features (đặc trưng của voice)
-            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+            mfccs = features['mfcc']
             
             # Spectral bandwidth
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr)[0]
+            spectral_bandwidth = features['bandwidth']
             
             # Voice characteristics thresholds
             mfcc_threshold = np.percentile(mfccs[0], 25)  # First MFCC coefficient
@@ -10,6 +10,9 @@ import soundfile as sf
 from typing import Tuple, List, Dict
 import logging
 from pathlib import Path
+from src.core.audio_cache import load_audio
+from src.core.wav_reader import open_wav, frame_rms_zcr
+from src.core.feature_graph import get_feature_graph
 
 logger = logging.getLogger(__name__)
 
@@ -35,19 +38,30 @@ class VoiceActivityDetector:
         try:
             logger.info(f"🎤 Phát hiện voice activity trong file: {audio_path}")
             
-            # Load audio
-            audio, sr = librosa.load(audio_path, sr=self.sr)
-            logger.info(f"✅ Đã load audio: {len(audio)} samples, {sr} Hz")
-            
-            if method == "spectral":
-                segments = self._detect_spectral_voice(audio, sr)
-            elif method == "energy":
-                segments = self._detect_energy_voice(audio, sr)
-            elif method == "zero_crossing":
-                segments = self._detect_zero_crossing_voice(audio, sr)
+            wav = open_wav(audio_path) if method in ("energy", "zero_crossing") else None
+            if wav is not None:
+                # Chỉ cần RMS/ZCR: đọc WAV qua memory-map theo block, không decode cả file
+                sr = self.sr
+                rms, zcr = frame_rms_zcr(wav, sr, self.frame_length, self.hop_length)
+                logger.info(f"✅ Memory-mapped WAV: {wav.frames} samples, {wav.sample_rate} Hz")
+                if method == "energy":
+                    segments = self._detect_energy_voice(None, sr, rms=rms)
+                else:
+                    segments = self._detect_zero_crossing_voice(None, sr, zcr=zcr)
             else:
-                # Combine all methods
-                segments = self._detect_combined_voice(audio, sr)
+                # Load audio
+                audio, sr = load_audio(audio_path, sr=self.sr)
+                logger.info(f"✅ Đã load audio: {len(audio)} samples, {sr} Hz")
+                
+                if method == "spectral":
+                    segments = self._detect_spectral_voice(audio, sr)
+                elif method == "energy":
+                    segments = self._detect_energy_voice(audio, sr)
+                elif method == "zero_crossing":
+                    segments = self._detect_zero_crossing_voice(audio, sr)
+                else:
+                    # Combine all methods
+                    segments = self._detect_combined_voice(audio, sr)
             
             logger.info(f"🎯 Phát hiện {len(segments)} đoạn có giọng hát")
             return segments
@@ -59,10 +73,11 @@ class VoiceActivityDetector:
     def _detect_spectral_voice(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Phát hiện voice dựa trên spectral features - cải thiện"""
         try:
-            # Extract spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr, hop_length=self.hop_length)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr, hop_length=self.hop_length)[0]
-            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13, hop_length=self.hop_length)
+            # Extract spectral features (cùng một STFT, dùng chung với multi-feature)
+            features = get_feature_graph(audio, sr, n_fft=self.frame_length,
+                                         hop_length=self.hop_length).request('centroid', 'rolloff')
+            spectral_centroids = features['centroid']
+            spectral_rolloff = features['rolloff']
             
             # Voice characteristics - điều chỉnh thresholds
             voice_threshold_centroid = np.percentile(spectral_centroids, 20)  # Thấp hơn để phát hiện voice nhẹ
@@ -86,14 +101,12 @@ class VoiceActivityDetector:
             logger.warning(f"Spectral voice detection failed: {e}")
             return []
     
-    def _detect_energy_voice(self, audio: np.ndarray, sr: int) -> List[Dict]:
+    def _detect_energy_voice(self, audio: np.ndarray, sr: int, rms: np.ndarray = None) -> List[Dict]:
         """Phát hiện voice dựa trên energy - cải thiện v2"""
         try:
-            # Calculate RMS energy
-            frame_length = self.frame_length
-            hop_length = self.hop_length
-            
-            rms = librosa.feature.rms(y=audio, frame_length=frame_length, hop_length=hop_length)[0]
+            # Calculate RMS energy (tính theo block nếu chưa có)
+            if rms is None:
+                rms, _ = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
             
             # Adaptive threshold - thấp hơn để phát hiện voice nhẹ
             energy_threshold = np.percentile(rms, 25)  # Thấp hơn nữa
@@ -117,11 +130,12 @@ class VoiceActivityDetector:
             logger.warning(f"Energy voice detection failed: {e}")
             return []
     
-    def _detect_zero_crossing_voice(self, audio: np.ndarray, sr: int) -> List[Dict]:
+    def _detect_zero_crossing_voice(self, audio: np.ndarray, sr: int, zcr: np.ndarray = None) -> List[Dict]:
         """Phát hiện voice dựa trên zero crossing rate"""
         try:
-            # Calculate zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(audio, frame_length=self.frame_length, hop_length=self.hop_length)[0]
+            # Calculate zero crossing rate (tính theo block nếu chưa có)
+            if zcr is None:
+                _, zcr = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
             
             # Voice has moderate zero crossing rate
             voice_threshold_low = np.percentile(zcr, 20)
@@ -142,13 +156,16 @@ class VoiceActivityDetector:
     def _detect_combined_voice(self, audio: np.ndarray, sr: int) -> List[Dict]:
         """Kết hợp nhiều phương pháp để phát hiện voice - cải thiện"""
         try:
+            # RMS/ZCR tính một lần, dùng chung cho các phương pháp
+            rms, zcr = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
+            
             # Get segments from all methods
             spectral_segments = self._detect_spectral_voice(audio, sr)
-            energy_segments = self._detect_energy_voice(audio, sr)
-            zcr_segments = self._detect_zero_crossing_voice(audio, sr)
+            energy_segments = self._detect_energy_voice(audio, sr, rms=rms)
+            zcr_segments = self._detect_zero_crossing_voice(audio, sr, zcr=zcr)
             
             # Thêm phương pháp multi-feature detection
-            multi_feature_segments = self._detect_multi_feature_voice(audio, sr)
+            multi_feature_segments = self._detect_multi_feature_voice(audio, sr, rms=rms, zcr=zcr)
             
             # Combine and merge overlapping segments
             all_segments = spectral_segments + energy_segments + zcr_segments + multi_feature_segments
@@ -160,17 +177,17 @@ class VoiceActivityDetector:
             logger.warning(f"Combined voice detection failed: {e}")
             return []
     
-    def _detect_multi_feature_voice(self, audio: np.ndarray, sr: int) -> List[Dict]:
+    def _detect_multi_feature_voice(self, audio: np.ndarray, sr: int, rms: np.ndarray = None,
+                                    zcr: np.ndarray = None) -> List[Dict]:
         """Phát hiện voice dựa trên multiple features - phương pháp mới"""
         try:
             # Extract multiple features
-            rms = librosa.feature.rms(y=audio, frame_length=self.frame_length, hop_length=self.hop_length)[0]
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr, hop_length=self.hop_length)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr, hop_length=self.hop_length)[0]
-            zcr = librosa.feature.zero_crossing_rate(audio, frame_length=self.frame_length, hop_length=self.hop_length)[0]
-            
-            # MFCC features
-            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13, hop_length=self.hop_length)
+            if rms is None or zcr is None:
+                rms, zcr = frame_rms_zcr(audio, sr, self.frame_length, self.hop_length)
+            features = get_feature_graph(audio, sr, n_fft=self.frame_length,
+                                         hop_length=self.hop_length).request('centroid', 'rolloff')
+            spectral_centroids = features['centroid']
+            spectral_rolloff = features['rolloff']
             
             # Adaptive thresholds
             rms_threshold = np.percentile(rms, 25)  # Thấp hơn
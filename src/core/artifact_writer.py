@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Artifact Writer - Ghi artifact (slice, vocals, convert MP3) ở background
+
+Việc ghi file không nằm trên critical path của workflow nữa: các job được
+đưa vào hàng đợi có giới hạn và chạy trên thread riêng trong khi pipeline
+tiếp tục tính toán. Cuối request gọi wait() để chờ ghi xong và lấy lỗi
+(nếu có) đưa vào result dict.
+"""
+
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ArtifactWriter:
+    """Bounded background queue for artifact persistence with flush/wait"""
+
+    def __init__(self, max_pending: int = 8, num_threads: int = 1):
+        # Hàng đợi đầy thì submit() sẽ chờ, tránh giữ quá nhiều mảng audio trong RAM
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._errors = {}
+        self._written = []
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"artifact-writer-{i}", daemon=True)
+            for i in range(num_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                name, func, args, kwargs = job
+                try:
+                    func(*args, **kwargs)
+                    with self._lock:
+                        self._written.append(name)
+                except Exception as e:
+                    logger.warning(f"⚠️ Ghi artifact thất bại ({name}): {e}")
+                    with self._lock:
+                        self._errors[name] = str(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, name: str, func: Callable, *args, **kwargs):
+        """Queue func(*args, **kwargs); name identifies the artifact in errors()"""
+        self._queue.put((name, func, args, kwargs))
+
+    def write_audio(self, path: str, audio: np.ndarray, sr: int, **kwargs) -> str:
+        """
+        Queue sf.write(path, audio, sr). The array must not be modified until
+        the writer is flushed. Returns path immediately.
+        """
+        self.submit(path, _write_audio, path, audio, sr, **kwargs)
+        return path
+
+    def flush(self):
+        """Block until every queued job has finished"""
+        self._queue.join()
+
+    def errors(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._errors)
+
+    def wait(self) -> Dict[str, str]:
+        """Flush and return {artifact: error message} for failed writes"""
+        self.flush()
+        return self.errors()
+
+    def close(self):
+        """Flush and stop the worker threads"""
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> 'ArtifactWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _write_audio(path: str, audio: np.ndarray, sr: int, **kwargs):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # soundfile cần (samples, channels)
+    data = audio if audio.ndim == 1 else audio.T
+    sf.write(path, data, sr, **kwargs)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Buffer - Mảng audio kèm sample rate truyền giữa các bước pipeline
+
+Thay cho việc ghi file tạm rồi đọc lại ở bước sau (slice -> tách giọng ->
+detect key). Chỉ ghi ra đĩa khi cần xuất artifact cuối cùng.
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from src.core.audio_cache import load_audio
+from src.core.audio_io import resample_audio
+from src.core.feature_bank import FeatureBank, get_feature_bank
+
+logger = logging.getLogger(__name__)
+
+
+class AudioBuffer:
+    """Decoded audio plus its sample rate and (optional) originating file"""
+
+    def __init__(self, audio: np.ndarray, sr: int, path: Optional[str] = None, offset: float = 0.0):
+        self.audio = audio
+        self.sr = int(sr)
+        # path chỉ được set khi audio khớp đúng nội dung file đó (dùng cho Docker Essentia, hash, ...)
+        self.path = path
+        self.offset = offset
+        # Các phiên bản đã resample của buffer này, theo sample rate
+        self._variants = {}
+
+    @classmethod
+    def from_file(cls, path: str, sr: Optional[int] = None, mono: bool = True,
+                  offset: float = 0.0, duration: Optional[float] = None) -> 'AudioBuffer':
+        """Decode a file (or a window of it) through the shared audio cache"""
+        audio, out_sr = load_audio(path, sr=sr, mono=mono, offset=offset, duration=duration)
+        whole_file = not offset and duration is None
+        return cls(audio, out_sr, path=path if whole_file else None, offset=offset)
+
+    @property
+    def duration(self) -> float:
+        return self.audio.shape[-1] / self.sr if self.sr else 0.0
+
+    @property
+    def is_mono(self) -> bool:
+        return self.audio.ndim == 1
+
+    @property
+    def features(self) -> FeatureBank:
+        """Shared spectral features of this buffer (one STFT per n_fft/hop)"""
+        return get_feature_bank(self.audio, self.sr)
+
+    def to_mono(self) -> 'AudioBuffer':
+        if self.is_mono:
+            return self
+        if 'mono' not in self._variants:
+            self._variants['mono'] = AudioBuffer(librosa.to_mono(self.audio), self.sr, offset=self.offset)
+        return self._variants['mono']
+
+    def resample(self, target_sr: int) -> 'AudioBuffer':
+        """Return a buffer at target_sr; each rate is derived once and memoized"""
+        if target_sr == self.sr:
+            return self
+        variant = self._variants.get(target_sr)
+        if variant is None:
+            audio = resample_audio(self.audio, self.sr, target_sr)
+            variant = AudioBuffer(audio, target_sr, offset=self.offset)
+            self._variants[target_sr] = variant
+        return variant
+
+    def write(self, output_path: str) -> str:
+        """Persist the buffer and remember the file it now matches"""
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        # soundfile cần (samples, channels)
+        data = self.audio if self.is_mono else self.audio.T
+        sf.write(output_path, data, self.sr)
+        self.path = os.path.abspath(output_path)
+        return self.path
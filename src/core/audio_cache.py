@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Cache - Cache audio đã decode dùng chung trong toàn process
+
+Mỗi sample rate (16000, 22050, 44100, ...) của một cấu hình (mono, offset,
+duration) được decode ở sample rate gốc rồi resample đúng một lần và cache
+lại. Bản decode gốc chỉ được giữ khi chính nó được yêu cầu (sr=None); khi
+sample rate gốc trùng sr, hai key dùng chung một mảng và chỉ tính bytes một
+lần.
+Key gồm (path, size, mtime, sr, mono, ...) nên file bị ghi đè sẽ tự động
+decode lại. Các entry cũ nhất bị loại bỏ (LRU) khi vượt quá giới hạn bytes.
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.core.config import CACHE_CONFIG
+from src.core.audio_io import read_range, resample_audio
+from src.core.pcm_cache import decode_with_pcm_cache, get_pcm_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """Size-bounded LRU cache of decoded audio arrays"""
+
+    def __init__(self, max_bytes: int = CACHE_CONFIG['audio_cache_max_bytes']):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Số entry trỏ tới cùng một mảng (alias): bytes chỉ tính một lần
+        self._refs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # Lock theo từng key để hai thread cùng load một file chỉ decode một lần
+        self._key_locks = {}
+
+    @staticmethod
+    def make_key(path: str, sr: Optional[int], mono: bool,
+                 offset: float = 0.0, duration: Optional[float] = None) -> Tuple:
+        """Build a cache key from file identity and decode parameters"""
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sr, bool(mono),
+                float(offset or 0.0), None if duration is None else float(duration))
+
+    def peek(self, key: Tuple) -> Optional[Tuple[np.ndarray, int]]:
+        """Return cached (audio, sr) without counting a hit or touching the LRU order"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key: Tuple) -> Optional[Tuple[np.ndarray, int]]:
+        """Return cached (audio, sr) and mark it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, audio: np.ndarray, sr: int) -> Tuple[np.ndarray, int]:
+        """Store decoded audio; the array is frozen so callers cannot mutate the shared copy"""
+        audio = np.ascontiguousarray(audio)
+        audio.flags.writeable = False
+        nbytes = audio.nbytes
+
+        with self._lock:
+            if key in self._entries:
+                self._release(self._entries.pop(key)[0])
+
+            # File lớn hơn cả cache: trả về nhưng không lưu
+            if nbytes > self.max_bytes:
+                return audio, sr
+
+            self._entries[key] = (audio, sr)
+            refs = self._refs.get(id(audio), 0)
+            self._refs[id(audio)] = refs + 1
+            if refs == 0:
+                self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (old_audio, _) = self._entries.popitem(last=False)
+                self._release(old_audio)
+
+        return audio, sr
+
+    def _release(self, audio: np.ndarray) -> None:
+        # Gọi khi đang giữ self._lock
+        refs = self._refs.pop(id(audio), 1) - 1
+        if refs > 0:
+            self._refs[id(audio)] = refs
+        else:
+            self.current_bytes -= audio.nbytes
+
+    def get_or_load(self, path: str, loader: Callable[[], Tuple[np.ndarray, int]],
+                    sr: Optional[int], mono: bool = True, offset: float = 0.0,
+                    duration: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """Return cached audio or run loader() once and cache its result"""
+        key = self.make_key(path, sr, mono, offset, duration)
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Thread khác có thể vừa decode xong trong lúc chờ lock
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+            with self._lock:
+                self.misses += 1
+            try:
+                audio, out_sr = loader()
+                return self.put(key, audio, out_sr)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self._refs.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        """Return cache usage statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Return the process-wide audio cache"""
+    global _audio_cache
+    if _audio_cache is None:
+        with _audio_cache_lock:
+            if _audio_cache is None:
+                _audio_cache = AudioCache()
+    return _audio_cache
+
+
+def load_audio(path: str, sr: Optional[int] = 22050, mono: bool = True,
+               offset: float = 0.0, duration: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    """
+    Drop-in replacement for librosa.load that goes through the shared cache.
+
+    offset/duration are decoded as a sample range (no full-file decode).
+    Each requested sr is decoded at the native rate and derived once
+    (polyphase), then memoized; the native decode itself is only kept when
+    sr=None is requested, and is shared (not copied) when it already has sr.
+    Whole-file mono loads at the canonical rate also go through the on-disk
+    PCM cache when it is enabled, and ranges are sliced from it on a hit.
+    The returned array is read-only; copy it before modifying in place.
+    """
+    cache = get_audio_cache()
+
+    def _decode_native():
+        return read_range(path, offset=offset, duration=duration, sr=None, mono=mono)
+
+    if sr is None:
+        return cache.get_or_load(path, _decode_native, sr=None, mono=mono,
+                                 offset=offset, duration=duration)
+
+    def _derive():
+        # Dùng bản gốc nếu đã có người load sr=None; nếu không thì decode mà không cache
+        # bản gốc, để cache chỉ giữ đúng sample rate được yêu cầu
+        native = cache.peek(cache.make_key(path, None, mono, offset, duration))
+        native, native_sr = native if native is not None else _decode_native()
+        if native_sr == sr:
+            # Cùng sample rate: trả về chính mảng gốc (alias, không copy / tính bytes hai lần)
+            return native, sr
+        return resample_audio(native, native_sr, sr), sr
+
+    def _decode():
+        if not offset and duration is None:
+            return decode_with_pcm_cache(path, _derive, sr=sr, mono=mono)
+
+        pcm_cache = get_pcm_cache()
+        if pcm_cache is not None and mono and sr is not None:
+            full = pcm_cache.lookup(path, sr)
+            if full is not None:
+                start = int(round(offset * sr))
+                end = None if duration is None else start + int(round(duration * sr))
+                return np.array(full[start:end], dtype=np.float32), sr
+        return _derive()
+
+    return cache.get_or_load(path, _decode, sr=sr, mono=mono,
+                             offset=offset, duration=duration)
+
+
+def load_audio_range(path: str, start_time: float, end_time: Optional[float] = None,
+                     sr: Optional[int] = None, mono: bool = True) -> Tuple[np.ndarray, int]:
+    """Decode only the [start_time, end_time) window of a file (end_time=None: to the end)"""
+    duration = None if end_time is None else max(0.0, end_time - start_time)
+    return load_audio(path, sr=sr, mono=mono, offset=start_time, duration=duration)
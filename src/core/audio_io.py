@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio IO - Decode đúng khoảng sample cần dùng thay vì decode cả bài
+
+WAV/FLAC/OGG được seek trực tiếp trong container, MP3 được seek chính xác
+theo frame qua libsndfile (mpg123). Các định dạng libsndfile không đọc được
+(m4a, ...) sẽ fallback về librosa.load với offset/duration.
+
+probe() đọc metadata (duration, sample rate, channels) từ header mà không
+decode, kết quả được cache theo danh tính file (path, size, mtime).
+"""
+
+import os
+import mmap
+import struct
+import logging
+import threading
+from math import gcd
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import librosa
+import soundfile as sf
+from scipy.signal import resample_poly
+
+logger = logging.getLogger(__name__)
+
+
+def resample_audio(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    Polyphase resampling along the last axis (22050 <-> 44100 <-> 16000 are
+    all small integer ratios, so this is much cheaper than FFT/sinc resampling).
+    """
+    if orig_sr == target_sr or audio.shape[-1] == 0:
+        return audio
+    g = gcd(int(orig_sr), int(target_sr))
+    out = resample_poly(audio, int(target_sr) // g, int(orig_sr) // g, axis=-1)
+    return np.ascontiguousarray(out, dtype=np.float32)
+
+
+def read_range(path: str, offset: float = 0.0, duration: Optional[float] = None,
+               sr: Optional[int] = None, mono: bool = True) -> Tuple[np.ndarray, int]:
+    """
+    Decode only [offset, offset + duration) seconds of an audio file.
+
+    Same semantics as librosa.load: returns float32 audio shaped (samples,)
+    when mono, (channels, samples) otherwise, resampled to sr unless sr is None.
+    """
+    try:
+        with sf.SoundFile(path) as f:
+            native_sr = f.samplerate
+            start_frame = int(round((offset or 0.0) * native_sr))
+            n_frames = -1 if duration is None else int(round(duration * native_sr))
+
+            if f.frames > 0 and start_frame >= f.frames:
+                data = np.zeros((0, f.channels), dtype=np.float32)
+            else:
+                if start_frame > 0:
+                    f.seek(start_frame)
+                data = f.read(frames=n_frames, dtype='float32', always_2d=True)
+    except Exception as e:
+        # libsndfile không hỗ trợ định dạng này (hoặc bản cũ không có MP3)
+        logger.debug(f"Range decode via soundfile failed ({e}), falling back to librosa")
+        return librosa.load(path, sr=sr, mono=mono, offset=offset, duration=duration)
+
+    audio = data.T
+    if mono or audio.shape[0] == 1:
+        audio = np.mean(audio, axis=0) if audio.shape[0] > 1 else audio[0]
+
+    if sr is not None and sr != native_sr:
+        audio = resample_audio(audio, native_sr, sr)
+        native_sr = sr
+
+    return np.ascontiguousarray(audio, dtype=np.float32), native_sr
+
+
+# Bảng tra header MP3: bitrate (kbps) theo (MPEG1?, layer), sample rate theo version
+_MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+_PROBE_CACHE_SIZE = 1024
+_probe_cache = OrderedDict()
+_probe_lock = threading.Lock()
+
+
+def _parse_mp3_header(header: int) -> Optional[Dict]:
+    """Decode a 32-bit MPEG audio frame header, None if it is not a valid header"""
+    if (header >> 21) & 0x7FF != 0x7FF:
+        return None
+    version = (header >> 19) & 0x3
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_idx = (header >> 12) & 0xF
+    sr_idx = (header >> 10) & 0x3
+    if version == 1 or layer == 4 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    bitrate = _MP3_BITRATES[(mpeg1, min(layer, 3) if mpeg1 else (1 if layer == 1 else 2))][bitrate_idx] * 1000
+    padding = (header >> 9) & 0x1
+    channels = 1 if ((header >> 6) & 0x3) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+
+    return {'mpeg1': mpeg1, 'layer': layer, 'sample_rate': sample_rate, 'channels': channels,
+            'samples': samples, 'length': length}
+
+
+def _scan_mp3(path: str) -> Dict:
+    """
+    Fast MP3 metadata scan without decoding.
+
+    Uses the Xing/Info or VBRI frame count when present, otherwise walks the
+    frame headers (jumping frame length each time) and sums their samples.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        pos = 0
+        # Bỏ qua ID3v2 tag
+        if data[:3] == b'ID3' and size >= 10:
+            tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+            pos = 10 + tag_size
+
+        # Tìm frame header hợp lệ đầu tiên
+        first = None
+        while pos + 4 <= size:
+            if data[pos] == 0xFF:
+                first = _parse_mp3_header(struct.unpack('>I', data[pos:pos + 4])[0])
+                if first and first['length'] > 0:
+                    break
+            pos += 1
+        if first is None:
+            raise ValueError("Không tìm thấy MPEG frame header")
+
+        sample_rate = first['sample_rate']
+        channels = first['channels']
+
+        # Xing/Info header nằm sau side info của frame đầu
+        side_info = (32 if channels == 2 else 17) if first['mpeg1'] else (17 if channels == 2 else 9)
+        xing = pos + 4 + side_info
+        n_frames = None
+        if data[xing:xing + 4] in (b'Xing', b'Info'):
+            flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+            if flags & 0x1:
+                n_frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+        elif data[pos + 36:pos + 40] == b'VBRI':
+            n_frames = struct.unpack('>I', data[pos + 50:pos + 54])[0]
+
+        if n_frames is not None:
+            total_samples = n_frames * first['samples']
+        else:
+            # Không có header VBR: nhảy qua từng frame, chỉ đọc 4 byte header
+            total_samples = 0
+            while pos + 4 <= size:
+                frame = _parse_mp3_header(struct.unpack('>I', data[pos:pos + 4])[0])
+                if frame is None or frame['length'] <= 0:
+                    break
+                total_samples += frame['samples']
+                pos += frame['length']
+
+    return {
+        'duration': total_samples / sample_rate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'frames': total_samples,
+        'format': 'MP3'
+    }
+
+
+def _probe_uncached(path: str) -> Dict:
+    try:
+        info = sf.info(path)
+        return {
+            'duration': float(info.duration),
+            'sample_rate': int(info.samplerate),
+            'channels': int(info.channels),
+            'frames': int(info.frames),
+            'format': info.format
+        }
+    except Exception as e:
+        if os.path.splitext(path)[1].lower() == '.mp3':
+            logger.debug(f"soundfile probe failed ({e}), scanning MP3 frames")
+            return _scan_mp3(path)
+
+    # Định dạng lạ (m4a, ...): để librosa/audioread tự xử lý
+    sample_rate = int(librosa.get_samplerate(path))
+    duration = float(librosa.get_duration(path=path))
+    return {
+        'duration': duration,
+        'sample_rate': sample_rate,
+        'channels': None,
+        'frames': int(round(duration * sample_rate)),
+        'format': os.path.splitext(path)[1].lstrip('.').upper()
+    }
+
+
+def probe(path: str) -> Dict:
+    """
+    Read duration / sample_rate / channels / frames / format from the file
+    header without decoding. Cached per file identity (path, size, mtime).
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    with _probe_lock:
+        info = _probe_cache.get(key)
+        if info is not None:
+            _probe_cache.move_to_end(key)
+            return dict(info)
+
+    info = _probe_uncached(path)
+
+    with _probe_lock:
+        _probe_cache[key] = info
+        while len(_probe_cache) > _PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return dict(info)
+
+
+def get_duration(path: str) -> float:
+    """Return file duration in seconds from the header (no decode)"""
+    return probe(path)['duration']
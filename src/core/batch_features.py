@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Features - Trích xuất chroma / MFCC / RMS cho nhiều clip cùng lúc
+
+Dùng khi chấm lại cả một đêm thi (hàng trăm slice 30s): các clip cùng sample
+rate được pad và xếp thành một batch, chạy một STFT batched rồi chroma, mel
+và DCT đều là matmul trên torch (đa luồng trên CPU, hoặc CUDA). Mỗi clip
+nhận lại đúng các frame của nó (mask theo độ dài), khớp kết quả librosa khi
+tính riêng từng clip.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import librosa
+import torch
+from scipy import fft as sp_fft
+
+from src.core.torch_chroma import get_torch_chroma
+
+logger = logging.getLogger(__name__)
+
+_mel_bases: Dict[Tuple, torch.Tensor] = {}
+_dct_bases: Dict[Tuple, torch.Tensor] = {}
+_bases_lock = threading.Lock()
+
+
+def _mel_basis(sr: int, n_fft: int, n_mels: int, device) -> torch.Tensor:
+    key = (sr, n_fft, n_mels, str(device))
+    with _bases_lock:
+        basis = _mel_bases.get(key)
+        if basis is None:
+            basis = torch.as_tensor(librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels),
+                                    dtype=torch.float32, device=device)
+            _mel_bases[key] = basis
+        return basis
+
+
+def _dct_basis(n_mels: int, n_mfcc: int, device) -> torch.Tensor:
+    """Rows of the orthonormal DCT-II, so basis @ S == dct(S, axis=-2, norm='ortho')[:n_mfcc]"""
+    key = (n_mels, n_mfcc, str(device))
+    with _bases_lock:
+        basis = _dct_bases.get(key)
+        if basis is None:
+            matrix = sp_fft.dct(np.eye(n_mels), type=2, norm='ortho', axis=0)[:n_mfcc]
+            basis = torch.as_tensor(matrix, dtype=torch.float32, device=device)
+            _dct_bases[key] = basis
+        return basis
+
+
+class ClipFeatures:
+    """Features of one clip (valid frames only, as NumPy arrays)"""
+
+    def __init__(self, chroma: np.ndarray, mfcc: np.ndarray, rms: np.ndarray, sr: int, hop_length: int):
+        self.chroma = chroma
+        self.mfcc = mfcc
+        self.rms = rms
+        self.sr = sr
+        self.hop_length = hop_length
+
+    @property
+    def n_frames(self) -> int:
+        return self.chroma.shape[-1]
+
+    def chroma_mean(self) -> np.ndarray:
+        """Mean chroma over frames, normalized to sum 1"""
+        chroma_mean = np.mean(self.chroma, axis=1)
+        total = np.sum(chroma_mean)
+        return chroma_mean / total if total > 0 else chroma_mean
+
+
+class BatchFeatures:
+    """Padded (batch, ..., frames) features plus a (batch, frames) validity mask"""
+
+    def __init__(self, chroma: np.ndarray, mfcc: np.ndarray, rms: np.ndarray, n_frames: np.ndarray,
+                 sr: int, hop_length: int):
+        self.chroma = chroma
+        self.mfcc = mfcc
+        self.rms = rms
+        self.n_frames = n_frames
+        self.sr = sr
+        self.hop_length = hop_length
+
+    @property
+    def mask(self) -> np.ndarray:
+        return np.arange(self.chroma.shape[-1])[None, :] < self.n_frames[:, None]
+
+    def __len__(self) -> int:
+        return len(self.n_frames)
+
+    def clip(self, index: int) -> ClipFeatures:
+        n = int(self.n_frames[index])
+        return ClipFeatures(self.chroma[index, :, :n], self.mfcc[index, :, :n], self.rms[index, :n],
+                            self.sr, self.hop_length)
+
+    def clips(self) -> List[ClipFeatures]:
+        return [self.clip(i) for i in range(len(self))]
+
+
+def _clip_array(clip, sr: int) -> np.ndarray:
+    # Chấp nhận AudioBuffer hoặc mảng mono
+    audio = getattr(clip, 'audio', clip)
+    clip_sr = getattr(clip, 'sr', sr)
+    if clip_sr != sr:
+        raise ValueError(f"All clips must share one sample rate ({clip_sr} != {sr})")
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim != 1:
+        raise ValueError("Batch feature extraction expects mono clips")
+    return audio
+
+
+def extract_batch_features(clips: Sequence, sr: int, n_fft: int = 2048, hop_length: int = 512,
+                           n_mfcc: int = 13, n_mels: int = 128, batch_size: int = 32,
+                           device=None) -> BatchFeatures:
+    """
+    Chroma (librosa chroma_stft), MFCC (librosa mfcc) and RMS (librosa rms,
+    frame_length=n_fft) for equal-rate mono clips in batches of batch_size.
+    """
+    arrays = [_clip_array(clip, sr) for clip in clips]
+    if not arrays:
+        raise ValueError("No clips given")
+
+    lengths = np.array([len(a) for a in arrays])
+    # center=True: 1 + len // hop frame hợp lệ; padding 0 phía sau giống hệt padding của librosa
+    n_frames = 1 + lengths // hop_length
+    max_len = int(lengths.max())
+    total_frames = 1 + max_len // hop_length
+
+    engine = get_torch_chroma(n_fft=n_fft, hop_length=hop_length, device=device)
+    mel_basis = _mel_basis(sr, n_fft, n_mels, engine.device)
+    dct_basis = _dct_basis(n_mels, n_mfcc, engine.device)
+
+    chroma = np.zeros((len(arrays), engine.n_chroma, total_frames), dtype=np.float32)
+    mfcc = np.zeros((len(arrays), n_mfcc, total_frames), dtype=np.float32)
+    rms = np.zeros((len(arrays), total_frames), dtype=np.float32)
+
+    with torch.inference_mode():
+        for start in range(0, len(arrays), batch_size):
+            stop = min(start + batch_size, len(arrays))
+            batch = np.zeros((stop - start, max_len), dtype=np.float32)
+            for row, audio in enumerate(arrays[start:stop]):
+                batch[row, :len(audio)] = audio
+            x = torch.as_tensor(batch, device=engine.device)
+            valid = torch.as_tensor(n_frames[start:stop], device=engine.device)
+            frame_mask = torch.arange(total_frames, device=engine.device)[None, :] < valid[:, None]
+
+            power = engine.power(x)
+
+            # Tuning ước lượng trên frame hợp lệ của từng clip (như chroma_stft từng file)
+            tunings = [engine.estimate_tuning(power[i, :, :int(n)], sr)
+                       for i, n in enumerate(n_frames[start:stop])]
+            chroma[start:stop] = engine.chroma_from_power(power, sr, tuning=tunings).cpu().numpy()
+
+            # MFCC: mel -> power_to_db (ref=1, amin=1e-10, top_db=80 theo từng clip) -> DCT
+            mel = torch.matmul(mel_basis, power)
+            log_mel = 10.0 * torch.log10(torch.clamp(mel, min=1e-10))
+            peak = torch.where(frame_mask[:, None, :], log_mel, torch.full_like(log_mel, -np.inf))
+            peak = peak.amax(dim=(-2, -1), keepdim=True)
+            log_mel = torch.maximum(log_mel, peak - 80.0)
+            mfcc[start:stop] = torch.matmul(dct_basis, log_mel).cpu().numpy()
+
+            # RMS trên cửa sổ thời gian (center, zero padding)
+            padded = torch.nn.functional.pad(x, (n_fft // 2, n_fft // 2))
+            frames = padded.unfold(-1, n_fft, hop_length)
+            rms[start:stop] = torch.sqrt(torch.mean(frames ** 2, dim=-1)).cpu().numpy()
+
+    features = BatchFeatures(chroma, mfcc, rms, n_frames, sr, hop_length)
+    # Frame padding không mang thông tin
+    features.chroma *= features.mask[:, None, :]
+    features.mfcc *= features.mask[:, None, :]
+    features.rms *= features.mask
+    logger.info(f"✅ Batch features: {len(arrays)} clips, {total_frames} frames max")
+    return features
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Beat Index - Phân tích beat tính sẵn offline cho catalog beat
+
+Thư viện beat biết trước, nên mọi thứ online cần từ một beat - key / scale,
+tempo và lưới beat, chroma trung bình, F0 tham chiếu, thời lượng - được
+scripts/build_beat_index.py tính một lần và lưu trong một file .npz nhỏ
+(metadata JSON + các mảng nối liền, không pickle). Online, run_workflow,
+process_karaoke_optimized và KaraokeScoringSystem tra index theo path (hoặc
+hash nội dung / fingerprint PCM) và bỏ qua toàn bộ phân tích beat khi có.
+
+Index ghi lại phiên bản cấu hình lúc build (key_cache_version); khi thuật
+toán / cấu hình đổi, index cũ bị bỏ qua cho tới khi build lại.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from src.core.audio_cache import load_audio
+from src.core.config import CACHE_CONFIG
+from src.core.feature_graph import get_feature_graph
+from src.core.file_hash import FileHasher, file_hash
+from src.core.key_cache import key_cache_version
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+
+
+def pcm_fingerprint(audio: np.ndarray) -> str:
+    """blake2b of the decoded float32 samples; matches the same audio in any container"""
+    data = np.ascontiguousarray(audio, dtype=np.float32)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+class BeatAnalysis:
+    """Precomputed analysis of one catalog beat (mono, at sr)"""
+
+    def __init__(self, digest: str, pcm_digest: str, path: str, sr: int, duration: float,
+                 key: Optional[Dict], tempo: float, beat_frames: np.ndarray, chroma_mean: np.ndarray,
+                 f0: np.ndarray, size: int = None, mtime_ns: int = None):
+        self.digest = digest
+        self.pcm_digest = pcm_digest
+        self.path = path
+        self.sr = sr
+        self.duration = duration
+        # Kết quả AdvancedKeyDetector (audio_type='beat'); None khi detect lỗi / thiếu method
+        self.key = key
+        self.tempo = tempo
+        self.beat_frames = beat_frames
+        self.chroma_mean = chroma_mean
+        self.f0 = f0
+        # Danh tính file lúc index, để tra theo path mà không phải hash lại
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def meta(self) -> Dict:
+        return {'digest': self.digest, 'pcm_digest': self.pcm_digest, 'path': self.path, 'sr': self.sr,
+                'duration': self.duration, 'key': self.key, 'tempo': self.tempo,
+                'size': self.size, 'mtime_ns': self.mtime_ns}
+
+
+def analyze_beat(path: str, key_detector=None, sr: int = 22050) -> BeatAnalysis:
+    """
+    Everything the online path derives from a beat, computed the way the
+    scoring system and key detector compute it (same graph features).
+    key_detector is an AdvancedKeyDetector; None leaves the key empty.
+    """
+    audio, sr = load_audio(path, sr=sr)
+    graph = get_feature_graph(audio, sr)
+    tempo, beat_frames = graph['beats']
+
+    key = None
+    if key_detector is not None:
+        key = key_detector.detect_key_cached(path, 'beat', audio=audio, sr=sr)
+        # Kết quả mặc định / voting thiếu method: để online detect lại thay vì lưu vĩnh viễn
+        if key.get('method') == 'Default' or key.get('excluded_methods'):
+            key = None
+
+    _, _, size, mtime_ns = FileHasher.identity(path)
+    return BeatAnalysis(
+        digest=file_hash(path),
+        pcm_digest=pcm_fingerprint(audio),
+        path=os.path.abspath(path),
+        sr=sr,
+        duration=len(audio) / sr,
+        key=key,
+        tempo=float(tempo),
+        beat_frames=np.asarray(beat_frames, dtype=np.int32),
+        chroma_mean=np.mean(graph['chroma'], axis=1).astype(np.float32),
+        f0=np.asarray(graph['f0'], dtype=np.float32),
+        size=size,
+        mtime_ns=mtime_ns,
+    )
+
+
+def _split(values: np.ndarray, offsets: np.ndarray):
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+class BeatIndex:
+    """Beat analyses by content digest, with lookup by path or PCM fingerprint"""
+
+    def __init__(self, path: Optional[str] = CACHE_CONFIG['beat_index_path']):
+        self.path = path
+        self.version = key_cache_version()
+        self._entries: Dict[str, BeatAnalysis] = {}
+        self._by_pcm: Dict[str, str] = {}
+        self._by_path: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[BeatAnalysis]:
+        return iter(list(self._entries.values()))
+
+    def add(self, entry: BeatAnalysis) -> None:
+        with self._lock:
+            old = self._entries.get(entry.digest)
+            if old is not None:
+                self._by_path.pop(old.path, None)
+            # File ở path này đã đổi nội dung: bỏ phân tích cũ
+            stale = self._entries.get(self._by_path.get(entry.path))
+            if stale is not None and stale.digest != entry.digest:
+                del self._entries[stale.digest]
+                self._by_pcm.pop(stale.pcm_digest, None)
+            self._entries[entry.digest] = entry
+            self._by_pcm[entry.pcm_digest] = entry.digest
+            self._by_path[entry.path] = entry.digest
+
+    def get(self, digest: str) -> Optional[BeatAnalysis]:
+        """Entry by file content digest or PCM fingerprint"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None and digest in self._by_pcm:
+                entry = self._entries.get(self._by_pcm[digest])
+            return entry
+
+    def lookup(self, path: str) -> Optional[BeatAnalysis]:
+        """Entry for a file: by indexed path when the file is unchanged, otherwise by content hash"""
+        if not self._entries:
+            return None
+        try:
+            _, _, size, mtime_ns = FileHasher.identity(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._by_path.get(os.path.abspath(path)))
+        if entry is not None and (entry.size, entry.mtime_ns) == (size, mtime_ns):
+            return entry
+        # File đã đổi chỗ / đổi tên: tra theo nội dung
+        return self.get(file_hash(path))
+
+    def lookup_audio(self, audio: np.ndarray) -> Optional[BeatAnalysis]:
+        """Entry for decoded samples (mono float, same sr as the index)"""
+        return self.get(pcm_fingerprint(audio)) if self._entries else None
+
+    def load(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        # Không đọc lại file hỏng ở mỗi lần tra
+        self._loaded_mtime = mtime
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('format') != INDEX_FORMAT or meta.get('version') != self.version:
+                    logger.warning(f"⚠️ Beat index {self.path} được build với cấu hình khác, bỏ qua "
+                                   f"(chạy lại scripts/build_beat_index.py)")
+                    entries = []
+                else:
+                    entries = meta['entries']
+                beat_frames = _split(data['beat_frames'], data['beat_offsets'])
+                f0 = _split(data['f0'], data['f0_offsets'])
+                chroma_mean = data['chroma_mean']
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được beat index {self.path}: {e}")
+            return
+
+        with self._lock:
+            self._entries.clear()
+            self._by_pcm.clear()
+            self._by_path.clear()
+        for i, item in enumerate(entries):
+            self.add(BeatAnalysis(beat_frames=beat_frames[i], chroma_mean=chroma_mean[i], f0=f0[i], **item))
+        logger.info(f"📇 Beat index: {len(self)} beat từ {self.path}")
+
+    def reload_if_changed(self) -> None:
+        """Pick up an index rebuilt by the offline job while this process runs"""
+        try:
+            mtime = os.path.getmtime(self.path) if self.path else None
+        except OSError:
+            return
+        if mtime is not None and mtime != self._loaded_mtime:
+            self.load()
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        entries = list(self)
+        meta = {'format': INDEX_FORMAT, 'version': self.version, 'entries': [e.meta() for e in entries]}
+
+        def concat(arrays, dtype):
+            offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(a) for a in arrays])
+            values = np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+            return values, offsets
+
+        beat_frames, beat_offsets = concat([e.beat_frames for e in entries], np.int32)
+        f0, f0_offsets = concat([e.f0 for e in entries], np.float32)
+        chroma_mean = np.stack([e.chroma_mean for e in entries]).astype(np.float32) if entries \
+            else np.zeros((0, 12), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Ghi file tạm rồi thay thế, để process đang đọc không thấy file dở
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.array(json.dumps(meta)), beat_frames=beat_frames,
+                            beat_offsets=beat_offsets, f0=f0, f0_offsets=f0_offsets, chroma_mean=chroma_mean)
+        os.replace(tmp_path, path)
+
+
+_beat_index = None
+_beat_index_lock = threading.Lock()
+
+
+def get_beat_index() -> BeatIndex:
+    """Return the process-wide beat index (empty when no index file was built)"""
+    global _beat_index
+    if _beat_index is None:
+        with _beat_index_lock:
+            if _beat_index is None:
+                _beat_index = BeatIndex()
+    else:
+        _beat_index.reload_if_changed()
+    return _beat_index
+
+
+def lookup_beat(path: str) -> Optional[BeatAnalysis]:
+    """Indexed analysis of a beat file, or None (no index, not indexed, or lookup error)"""
+    if not path or not CACHE_CONFIG['beat_index_path']:
+        return None
+    try:
+        entry = get_beat_index().lookup(path)
+    except Exception as e:
+        logger.warning(f"⚠️ Tra beat index thất bại: {e}")
+        return None
+    if entry is not None:
+        logger.info(f"📇 Beat index hit: {os.path.basename(path)} ({entry.digest[:12]})")
+    return entry
@@ -9,6 +9,66 @@ AUDIO_CONFIG = {
     'max_duration': 300,  # 5 phút tối đa
 }
 
+# Cấu hình Audio Cache (audio đã decode dùng chung trong process)
+CACHE_CONFIG = {
+    'audio_cache_max_bytes': 512 * 1024 * 1024,  # 512MB
+    # PCM cache trên đĩa (mono, sample_rate chuẩn), dùng lại giữa các lần chạy
+    'pcm_cache_enabled': False,
+    'pcm_cache_dir': './cache/pcm',
+    'pcm_cache_max_bytes': 4 * 1024 * 1024 * 1024,  # 4GB
+    'pcm_cache_dtype': 'float32',  # float32 hoặc float16
+    # Bảng hash nội dung file theo (device, inode, size, mtime); None = chỉ cache trong RAM
+    'hash_cache_path': './cache/file_hashes.sqlite',
+    # Dtype lưu chroma/mfcc/spectral_*/rms trong FeatureBank: float32 hoặc float16 (nửa bộ nhớ)
+    'feature_cache_dtype': 'float32',
+    # Tổng bytes đặc trưng (STFT, HPSS, F0...) của các FeatureBank dùng chung; vượt quá
+    # thì bank ít dùng gần đây nhất bị xóa đặc trưng (LRU)
+    'feature_bank_max_bytes': 256 * 1024 * 1024,  # 256MB
+    # Kết quả detect key theo (hash nội dung, audio_type, đoạn cắt, phiên bản cấu hình);
+    # None = chỉ cache trong RAM
+    'key_cache_enabled': True,
+    'key_cache_path': './cache/key_results.sqlite',
+    'key_cache_max_entries': 1024,  # LRU trong RAM
+    # Phân tích beat tính sẵn bởi scripts/build_beat_index.py; None = không dùng index
+    'beat_index_path': './cache/beat_index.npz',
+}
+
+# Cấu hình F0 (YIN) dùng chung cho scoring và key detection
+PITCH_CONFIG = {
+    'fmin': 50.0,
+    'fmax': 1000.0,  # F0 giọng hát hiếm khi vượt ~1kHz
+    'frame_length': 2048,
+    'mode': 'full',  # 'full' hoặc 'voiced' (chỉ chạy YIN trên frame có năng lượng)
+    'gate_db': 40.0,  # ngưỡng RMS của chế độ voiced, dB dưới frame lớn nhất
+    'decimate': 1,  # >1: chạy YIN ở sample rate / decimate
+}
+
+# Cấu hình key detection
+# Tăng khi thay đổi thuật toán detect key: kết quả cũ trong key cache bị bỏ
+KEY_ALGORITHM_VERSION = 2
+
+KEY_CONFIG = {
+    # Gộp chroma theo beat (np.add.reduceat) trước khi so với key profile
+    'beat_sync': False,
+    # Bộ key profile (key_scoring.PROFILE_SETS): 'krumhansl', 'temperley', 'albrecht';
+    # nhiều bộ thì hệ số tương quan được lấy trung bình
+    'profiles': ('krumhansl',),
+    # Chạy các method của hybrid detector song song trên thread pool
+    'parallel': True,
+    # Pool dùng chung cho cả process: beat và vocals được detect đồng thời
+    # (run_workflow / OptimizedAudioProcessor), mỗi detection tới 5 method
+    'max_workers': 10,
+    # Giây chờ mỗi method (tính từ lúc bắt đầu); quá hạn thì bỏ khỏi voting
+    'method_timeouts': {
+        'default': 60.0,
+        'Docker Essentia AI': 120.0,
+    },
+    # 'full': chạy mọi method; 'cascade': template match chroma trước, chỉ chạy các
+    # method đắt (Essentia, CQT/CENS, F0) khi key tốt nhất và nhì cách nhau < cascade_margin
+    'hybrid_mode': 'full',
+    'cascade_margin': 0.1,
+}
+
 # Cấu hình AI Models
 MODEL_CONFIG = {
     'audio_separator': {
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CQT Engine - Constant-Q transform với kernel được cache trong process
+
+librosa.cqt dựng lại toàn bộ filter kernel (wavelet + FFT + sparsify) ở mỗi
+lần gọi; chroma_cqt và chroma_cens mỗi cái lại gọi cqt một lần. Engine này
+dựng kernel của từng octave một lần cho mỗi (sr, hop, bins_per_octave,
+n_bins, fmin, tuning) rồi chỉ còn STFT + nhân ma trận thưa cho mỗi tín hiệu.
+
+Thuật toán theo cấu trúc multirate của librosa.vqt (octave trên cùng ở sr
+gốc, mỗi octave thấp hơn giảm sample rate một nửa bằng cùng bộ resample
+soxr_hq). Engine không làm early downsampling; với các tham số chroma mặc
+định ở 22.05kHz librosa cũng không làm nên kết quả giống librosa, còn khi
+librosa có early downsampling thì kết quả chỉ gần đúng.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import librosa
+
+logger = logging.getLogger(__name__)
+
+_TUNING_RESOLUTION = 0.01
+_SPARSITY = 0.01
+
+
+class CQTKernel:
+    """Per-octave sparse FFT filter bases for one CQT configuration"""
+
+    def __init__(self, sr: int, hop_length: int, fmin: float, n_bins: int, bins_per_octave: int):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.n_bins = n_bins
+        self.bins_per_octave = bins_per_octave
+        self.freqs = librosa.cqt_frequencies(n_bins=n_bins, fmin=fmin, bins_per_octave=bins_per_octave)
+
+        # Độ rộng băng tương đối cố định của CQT (gamma = 0)
+        r = 2.0 ** (1.0 / bins_per_octave)
+        alpha = (r ** 2 - 1) / (r ** 2 + 1)
+        self.alpha = np.full(n_bins, alpha)
+
+        n_octaves = int(np.ceil(float(n_bins) / bins_per_octave))
+        n_filters = min(bins_per_octave, n_bins)
+
+        # (fft_basis, n_fft, hop, sr) cho từng octave, từ octave cao xuống thấp
+        self.octaves: List[Tuple] = []
+        my_sr, my_hop = float(sr), hop_length
+        for i in range(n_octaves):
+            sl = slice(-n_filters, None) if i == 0 else slice(-n_filters * (i + 1), -n_filters * i)
+            basis, lengths = librosa.filters.wavelet(freqs=self.freqs[sl], sr=my_sr, window='hann',
+                                                     filter_scale=1, norm=1, pad_fft=True, gamma=0,
+                                                     alpha=self.alpha[sl])
+            n_fft = basis.shape[1]
+            basis *= lengths[:, np.newaxis] / float(n_fft)
+            fft_basis = np.fft.fft(basis, n=n_fft, axis=1)[:, :(n_fft // 2) + 1]
+            fft_basis = librosa.util.sparsify_rows(fft_basis, quantile=_SPARSITY, dtype=np.complex64)
+            # Bù cho việc giảm sample rate
+            fft_basis = fft_basis * np.sqrt(sr / my_sr)
+            self.octaves.append((fft_basis.tocsr(), n_fft, my_hop, my_sr))
+
+            if my_hop % 2 == 0:
+                my_hop //= 2
+                my_sr /= 2.0
+
+        lengths, _ = librosa.filters.wavelet_lengths(freqs=self.freqs, sr=sr, window='hann',
+                                                     filter_scale=1, gamma=0, alpha=self.alpha)
+        self.scale = (1.0 / np.sqrt(lengths)[:, np.newaxis]).astype(np.float32)
+
+    def transform(self, y: np.ndarray) -> np.ndarray:
+        """Complex CQT (n_bins, frames) of a mono signal at self.sr"""
+        y = np.asarray(y, dtype=np.float32)
+        responses = []
+        for index, (fft_basis, n_fft, hop, _) in enumerate(self.octaves):
+            D = librosa.stft(y, n_fft=n_fft, hop_length=hop, window='ones', pad_mode='constant')
+            responses.append(fft_basis.dot(D))
+            next_hop = self.octaves[index + 1][2] if index + 1 < len(self.octaves) else hop
+            if next_hop != hop:
+                # Giảm một nửa sample rate đúng như librosa.vqt (soxr_hq, scale=True giữ năng lượng);
+                # resample_poly lệch tới ~10% biên độ ở các bin thấp
+                y = librosa.resample(y, orig_sr=2, target_sr=1, res_type='soxr_hq', scale=True)
+
+        # Ghép các octave từ thấp lên cao, cắt theo số frame nhỏ nhất
+        max_col = min(r.shape[-1] for r in responses)
+        C = np.empty((self.n_bins, max_col), dtype=np.complex64)
+        end = self.n_bins
+        for response in responses:
+            n_oct = response.shape[0]
+            if end < n_oct:
+                C[:end] = response[-end:, :max_col]
+            else:
+                C[end - n_oct:end] = response[:, :max_col]
+            end -= n_oct
+        return C * self.scale
+
+
+_kernels: Dict[Tuple, CQTKernel] = {}
+_kernels_lock = threading.Lock()
+
+
+def get_cqt_kernel(sr: int, hop_length: int = 512, fmin: Optional[float] = None, n_bins: int = 84,
+                   bins_per_octave: int = 12, tuning: float = 0.0) -> CQTKernel:
+    """Process-wide kernel cache keyed by (sr, hop, bins_per_octave, n_bins, fmin, tuning)"""
+    if fmin is None:
+        fmin = librosa.note_to_hz('C1')
+    tuning = round(float(tuning) / _TUNING_RESOLUTION) * _TUNING_RESOLUTION
+    key = (int(sr), int(hop_length), int(bins_per_octave), int(n_bins), float(fmin), tuning)
+    kernel = _kernels.get(key)
+    if kernel is None:
+        with _kernels_lock:
+            kernel = _kernels.get(key)
+            if kernel is None:
+                tuned_fmin = fmin * 2.0 ** (tuning / bins_per_octave)
+                kernel = CQTKernel(int(sr), hop_length, tuned_fmin, n_bins, bins_per_octave)
+                _kernels[key] = kernel
+                logger.debug(f"CQT kernel built: {key}")
+    return kernel
+
+
+def cqt(y: np.ndarray, sr: int, hop_length: int = 512, fmin: Optional[float] = None, n_bins: int = 84,
+        bins_per_octave: int = 12, tuning: Optional[float] = 0.0) -> np.ndarray:
+    """librosa.cqt equivalent using cached kernels (same tuning=0.0 default; None estimates it from y)"""
+    if tuning is None:
+        tuning = librosa.estimate_tuning(y=y, sr=sr, bins_per_octave=bins_per_octave)
+    return get_cqt_kernel(sr, hop_length, fmin, n_bins, bins_per_octave, tuning).transform(y)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dtype Policy - Tín hiệu float32, phổ complex64 trong toàn bộ pipeline
+
+librosa.load trả về float32 nhưng scipy.signal.filtfilt và phép
+magnitude * np.exp(1j * phase) trên mảng float64 lặng lẽ nâng lên
+float64 / complex128, gấp đôi bộ nhớ và băng thông cho mọi bước sau.
+Các helper ở đây giữ tín hiệu ở SIGNAL_DTYPE và phổ ở COMPLEX_DTYPE.
+
+Đặc trưng cuối (chroma, mfcc, spectral_*, rms) trong FeatureBank có thể
+lưu ở float16 (CACHE_CONFIG['feature_cache_dtype']); STFT / magnitude /
+power luôn giữ float32 vì power spectrogram vượt quá dải của float16.
+"""
+
+import numpy as np
+from scipy import signal
+
+from src.core.config import CACHE_CONFIG
+
+SIGNAL_DTYPE = np.float32
+COMPLEX_DTYPE = np.complex64
+FEATURE_DTYPES = ('float32', 'float16')
+
+
+def as_signal(audio: np.ndarray) -> np.ndarray:
+    """Audio as SIGNAL_DTYPE (no copy when it already is)"""
+    return np.asarray(audio, dtype=SIGNAL_DTYPE)
+
+
+def filtfilt(b: np.ndarray, a: np.ndarray, audio: np.ndarray) -> np.ndarray:
+    """scipy.signal.filtfilt returning SIGNAL_DTYPE instead of float64"""
+    return signal.filtfilt(b, a, audio).astype(SIGNAL_DTYPE, copy=False)
+
+
+def with_phase_of(magnitude: np.ndarray, stft: np.ndarray) -> np.ndarray:
+    """
+    magnitude * exp(1j * angle(stft)) as COMPLEX_DTYPE, using the unit phasor
+    stft / |stft| (no angle/exp round trip; silent bins stay 0)
+    """
+    stft = np.asarray(stft, dtype=COMPLEX_DTYPE)
+    phasor = stft / np.maximum(np.abs(stft), np.finfo(SIGNAL_DTYPE).tiny)
+    return np.asarray(magnitude, dtype=SIGNAL_DTYPE) * phasor
+
+
+def feature_dtype(name: str = None) -> np.dtype:
+    """Storage dtype of cached features (default from CACHE_CONFIG)"""
+    name = name or CACHE_CONFIG.get('feature_cache_dtype', 'float32')
+    if name not in FEATURE_DTYPES:
+        raise ValueError(f"Unsupported feature dtype: {name}")
+    return np.dtype(name)
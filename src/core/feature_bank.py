@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Feature Bank - Đặc trưng phổ dùng chung cho một tín hiệu đã decode
+
+Mỗi (n_fft, hop_length) chỉ tính STFT một lần; chroma_stft, spectral
+centroid / rolloff / bandwidth, mfcc, rms và HPSS được suy ra từ spectrogram
+đó khi cần và được nhớ lại. CQT (kernel cache của cqt_engine) dùng chung cho
+chroma_cqt và chroma_cens; F0 (YIN) và lưới beat cũng được nhớ theo tham số.
+Các detector (VAD, key detector, scoring) gọi get_feature_bank(audio, sr) trên
+cùng mảng sẽ dùng chung một bank. Tổng bytes đặc trưng của các bank trong
+registry bị giới hạn bởi CACHE_CONFIG['feature_bank_max_bytes']: vượt quá thì
+bank ít dùng gần đây nhất bị clear() (tính lại khi cần).
+"""
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import librosa
+from scipy import ndimage
+
+from src.core.config import CACHE_CONFIG
+from src.core.pitch_tracker import track_f0
+from src.core.cqt_engine import cqt
+from src.core.dtype_policy import as_signal, feature_dtype as _feature_dtype
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureBank:
+    """Lazily memoized spectral features of one signal"""
+
+    def __init__(self, audio: np.ndarray, sr: int, weak: bool = False, feature_dtype: Optional[str] = None):
+        # weak=True: bank của registry không được giữ mảng sống (nếu không sẽ không bao giờ bị dọn)
+        self._audio = None if weak else audio
+        self._audio_ref = weakref.ref(audio) if weak else None
+        self.sr = int(sr)
+        # Dtype lưu các đặc trưng cuối (chroma, mfcc, spectral_*, rms); STFT luôn complex64
+        self.feature_dtype = _feature_dtype(feature_dtype)
+        self._cache = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.RLock()
+        # Bytes của các đặc trưng đang nhớ; bank của registry tính vào ngân sách chung
+        self.nbytes = 0
+        self._registered = False
+
+    @property
+    def audio(self) -> np.ndarray:
+        if self._audio is not None:
+            return self._audio
+        audio = self._audio_ref()
+        if audio is None:
+            raise ReferenceError("Audio array of this FeatureBank has been released")
+        return audio
+
+    def _memo(self, key: Tuple, compute: Callable, compact: bool = False):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Mỗi key một lock: các thread tính những đặc trưng khác nhau của cùng bank
+        # chạy song song, còn cùng một đặc trưng thì chỉ tính một lần. Phụ thuộc
+        # giữa các key là DAG nên không có deadlock.
+        with key_lock:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+            value = compute()
+            if compact:
+                value = value.astype(self.feature_dtype, copy=False)
+            with self._lock:
+                self._cache[key] = value
+                self.nbytes += _nbytes(value)
+                self._key_locks.pop(key, None)
+            if self._registered:
+                _enforce_bank_budget(self)
+            return value
+
+    def stft(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        """Complex STFT (librosa defaults: hann window, center=True)"""
+        return self._memo(('stft', n_fft, hop_length),
+                          lambda: librosa.stft(as_signal(self.audio), n_fft=n_fft, hop_length=hop_length))
+
+    def magnitude(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('magnitude', n_fft, hop_length),
+                          lambda: np.abs(self.stft(n_fft, hop_length)))
+
+    def power(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('power', n_fft, hop_length),
+                          lambda: self.magnitude(n_fft, hop_length) ** 2)
+
+    def chroma_stft(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        """Same as librosa.feature.chroma_stft(y=audio, sr=sr, n_fft, hop_length)"""
+        return self._memo(('chroma_stft', n_fft, hop_length),
+                          lambda: librosa.feature.chroma_stft(S=self.power(n_fft, hop_length), sr=self.sr,
+                                                              n_fft=n_fft, hop_length=hop_length), compact=True)
+
+    def tuning(self, bins_per_octave: int = 36) -> float:
+        """librosa.estimate_tuning(y=audio, sr=sr); always on the 2048 / 512 STFT, as librosa does"""
+        return self._memo(('tuning', bins_per_octave),
+                          lambda: float(librosa.estimate_tuning(S=self.magnitude(2048, 512), sr=self.sr,
+                                                                n_fft=2048, bins_per_octave=bins_per_octave)))
+
+    def cqt_magnitude(self, hop_length: int = 512, n_bins: int = 252, bins_per_octave: int = 36) -> np.ndarray:
+        """|CQT| from C1 with cached kernels; tuning estimated as librosa.cqt does (self.tuning)"""
+        def compute():
+            return np.abs(cqt(self.audio, self.sr, hop_length=hop_length, n_bins=n_bins,
+                              bins_per_octave=bins_per_octave, tuning=self.tuning(bins_per_octave)))
+
+        return self._memo(('cqt_magnitude', hop_length, n_bins, bins_per_octave), compute)
+
+    def chroma_cqt(self, hop_length: int = 512, n_octaves: int = 7, bins_per_octave: int = 36) -> np.ndarray:
+        """Same as librosa.feature.chroma_cqt(y=audio, sr=sr, hop_length=hop_length)"""
+        return self._memo(('chroma_cqt', hop_length, n_octaves, bins_per_octave),
+                          lambda: librosa.feature.chroma_cqt(
+                              C=self.cqt_magnitude(hop_length, n_octaves * bins_per_octave, bins_per_octave),
+                              sr=self.sr, hop_length=hop_length, bins_per_octave=bins_per_octave,
+                              n_octaves=n_octaves), compact=True)
+
+    def chroma_cens(self, hop_length: int = 512, n_octaves: int = 7, bins_per_octave: int = 36) -> np.ndarray:
+        """Same as librosa.feature.chroma_cens(y=audio, sr=sr, hop_length=hop_length), sharing the CQT"""
+        return self._memo(('chroma_cens', hop_length, n_octaves, bins_per_octave),
+                          lambda: librosa.feature.chroma_cens(
+                              C=self.cqt_magnitude(hop_length, n_octaves * bins_per_octave, bins_per_octave),
+                              sr=self.sr, hop_length=hop_length, bins_per_octave=bins_per_octave,
+                              n_octaves=n_octaves), compact=True)
+
+    def spectral_centroid(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('spectral_centroid', n_fft, hop_length),
+                          lambda: librosa.feature.spectral_centroid(S=self.magnitude(n_fft, hop_length),
+                                                                    sr=self.sr, n_fft=n_fft,
+                                                                    hop_length=hop_length)[0], compact=True)
+
+    def spectral_rolloff(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('spectral_rolloff', n_fft, hop_length),
+                          lambda: librosa.feature.spectral_rolloff(S=self.magnitude(n_fft, hop_length),
+                                                                   sr=self.sr, n_fft=n_fft,
+                                                                   hop_length=hop_length)[0], compact=True)
+
+    def spectral_bandwidth(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('spectral_bandwidth', n_fft, hop_length),
+                          lambda: librosa.feature.spectral_bandwidth(S=self.magnitude(n_fft, hop_length),
+                                                                     sr=self.sr, n_fft=n_fft,
+                                                                     hop_length=hop_length)[0], compact=True)
+
+    def melspectrogram(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        return self._memo(('melspectrogram', n_fft, hop_length),
+                          lambda: librosa.feature.melspectrogram(S=self.power(n_fft, hop_length), sr=self.sr,
+                                                                 n_fft=n_fft, hop_length=hop_length))
+
+    def mfcc(self, n_mfcc: int = 13, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        """Same as librosa.feature.mfcc(y=audio, sr=sr, n_mfcc, n_fft, hop_length)"""
+        return self._memo(('mfcc', n_mfcc, n_fft, hop_length),
+                          lambda: librosa.feature.mfcc(S=librosa.power_to_db(self.melspectrogram(n_fft, hop_length)),
+                                                       sr=self.sr, n_mfcc=n_mfcc), compact=True)
+
+    def rms(self, n_fft: int = 2048, hop_length: int = 512) -> np.ndarray:
+        """Frame RMS from the magnitude spectrogram (librosa.feature.rms(S=...))"""
+        return self._memo(('rms', n_fft, hop_length),
+                          lambda: librosa.feature.rms(S=self.magnitude(n_fft, hop_length),
+                                                      frame_length=n_fft, hop_length=hop_length)[0], compact=True)
+
+    def onset_envelope(self, hop_length: int = 512) -> np.ndarray:
+        """Onset strength as librosa.beat.beat_track computes it (median over mel bands)"""
+        return self._memo(('onset_envelope', hop_length),
+                          lambda: librosa.onset.onset_strength(
+                              S=librosa.power_to_db(self.melspectrogram(2048, hop_length)), sr=self.sr,
+                              hop_length=hop_length, aggregate=np.median))
+
+    def beats(self, hop_length: int = 512) -> Tuple[float, np.ndarray]:
+        """(tempo, beat frames) of librosa.beat.beat_track(y=audio, sr=sr), computed once"""
+        def compute():
+            tempo, frames = librosa.beat.beat_track(onset_envelope=self.onset_envelope(hop_length), sr=self.sr,
+                                                    hop_length=hop_length)
+            frames = np.asarray(frames, dtype=int)
+            frames.flags.writeable = False
+            return float(np.atleast_1d(tempo)[0]), frames
+
+        return self._memo(('beats', hop_length), compute)
+
+    def beat_sync(self, feature: np.ndarray, hop_length: int = 512, beat_hop: int = 512) -> np.ndarray:
+        """Mean of a (..., frames) feature between beats; feature frames are at hop_length"""
+        _, frames = self.beats(beat_hop)
+        # Lưới beat tính ở beat_hop, đổi sang lưới frame của feature
+        return beat_sync(feature, frames * beat_hop // hop_length)
+
+    def hpss_stft(self, margin=1.0, kernel_size=31, n_fft: int = 2048, hop_length: int = 512,
+                  approximate: bool = False, decimate: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Harmonic / percussive STFTs, as librosa.decompose.hpss on the shared STFT.
+
+        approximate=True median-filters a spectrogram averaged over `decimate`
+        frames (harmonic kernel shrunk by the same factor), then applies the
+        upsampled masks to the full-resolution STFT.
+        """
+        margin = _pair(margin)
+        kernel_size = _pair(kernel_size)
+        decimate = max(1, int(decimate)) if approximate else 1
+        key = ('hpss_stft', margin, kernel_size, n_fft, hop_length, decimate)
+
+        def compute():
+            stft = self.stft(n_fft, hop_length)
+            if decimate == 1:
+                return librosa.decompose.hpss(stft, kernel_size=kernel_size, margin=margin)
+            mask_harm, mask_perc = _decimated_hpss_masks(self.magnitude(n_fft, hop_length),
+                                                         kernel_size, margin, decimate)
+            return stft * mask_harm, stft * mask_perc
+
+        return self._memo(key, compute)
+
+    def hpss(self, margin=1.0, kernel_size=31, n_fft: int = 2048, hop_length: int = 512,
+             approximate: bool = False, decimate: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        """Same as librosa.effects.hpss(audio, margin=..., kernel_size=...) (exact mode)"""
+        margin = _pair(margin)
+        kernel_size = _pair(kernel_size)
+        decimate = max(1, int(decimate)) if approximate else 1
+        key = ('hpss', margin, kernel_size, n_fft, hop_length, decimate)
+
+        def compute():
+            stft_harm, stft_perc = self.hpss_stft(margin, kernel_size, n_fft, hop_length,
+                                                  approximate=decimate > 1, decimate=decimate)
+            length = self.audio.shape[-1]
+            harmonic = librosa.istft(stft_harm, hop_length=hop_length, n_fft=n_fft,
+                                     dtype=self.audio.dtype, length=length)
+            percussive = librosa.istft(stft_perc, hop_length=hop_length, n_fft=n_fft,
+                                       dtype=self.audio.dtype, length=length)
+            # Kết quả được dùng chung giữa các consumer: không cho sửa tại chỗ
+            harmonic.flags.writeable = False
+            percussive.flags.writeable = False
+            return harmonic, percussive
+
+        return self._memo(key, compute)
+
+    def f0(self, fmin: float, fmax: float, frame_length: int = 2048, hop_length: Optional[int] = None,
+           mode: str = 'full', gate_db: float = 40.0, decimate: int = 1) -> np.ndarray:
+        """YIN F0 track (see pitch_tracker.track_f0), computed once per parameter set"""
+        key = ('f0', float(fmin), float(fmax), frame_length, hop_length, mode, gate_db, decimate)
+
+        def compute():
+            f0 = track_f0(self.audio, self.sr, fmin, fmax, frame_length=frame_length, hop_length=hop_length,
+                          mode=mode, gate_db=gate_db, decimate=decimate)
+            f0.flags.writeable = False
+            return f0
+
+        return self._memo(key, compute)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.nbytes = 0
+
+
+def _nbytes(value) -> int:
+    """Bytes held by a memoized value (array or tuple of arrays / scalars)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def beat_sync(feature: np.ndarray, frames: np.ndarray) -> np.ndarray:
+    """
+    librosa.util.sync(feature, frames, aggregate=np.mean) with one np.add.reduceat:
+    segments [0, b0), [b0, b1), ..., [bn, end)
+    """
+    n = feature.shape[-1]
+    frames = np.asarray(frames, dtype=int)
+    bounds = np.unique(np.concatenate(([0], frames[(frames > 0) & (frames < n)])))
+    if n == 0:
+        return feature
+    counts = np.diff(np.append(bounds, n))
+    # float16 feature được cộng dồn ở float32
+    sums = np.add.reduceat(feature, bounds, axis=-1, dtype=np.result_type(feature.dtype, np.float32))
+    return sums / counts
+
+
+def _pair(value) -> Tuple:
+    if isinstance(value, (tuple, list)):
+        return tuple(value)
+    return (value, value)
+
+
+def _decimated_hpss_masks(magnitude: np.ndarray, kernel_size: Tuple, margin: Tuple,
+                          decimate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Soft HPSS masks computed on a time-decimated magnitude spectrogram"""
+    n_bins, n_frames = magnitude.shape[-2:]
+    pad = (-n_frames) % decimate
+    padded = np.pad(magnitude, [(0, 0)] * (magnitude.ndim - 1) + [(0, pad)], mode='edge')
+    pooled = padded.reshape(padded.shape[:-1] + (-1, decimate)).mean(axis=-1)
+
+    win_harm = max(1, kernel_size[0] // decimate) | 1
+    win_perc = kernel_size[1]
+    harm_shape = [1] * pooled.ndim
+    harm_shape[-1] = win_harm
+    perc_shape = [1] * pooled.ndim
+    perc_shape[-2] = win_perc
+
+    harm = ndimage.median_filter(pooled, size=harm_shape, mode='reflect')
+    perc = ndimage.median_filter(pooled, size=perc_shape, mode='reflect')
+
+    split_zeros = margin[0] == 1 and margin[1] == 1
+    mask_harm = librosa.util.softmask(harm, perc * margin[0], power=2.0, split_zeros=split_zeros)
+    mask_perc = librosa.util.softmask(perc, harm * margin[1], power=2.0, split_zeros=split_zeros)
+
+    mask_harm = np.repeat(mask_harm, decimate, axis=-1)[..., :n_frames]
+    mask_perc = np.repeat(mask_perc, decimate, axis=-1)[..., :n_frames]
+    return mask_harm, mask_perc
+
+
+# Bank theo danh tính mảng: các module khác nhau nhận cùng một mảng sẽ dùng chung.
+# Thứ tự là LRU (bank dùng gần nhất ở cuối) cho ngân sách bytes.
+_banks: "OrderedDict[int, Tuple[weakref.ref, FeatureBank]]" = OrderedDict()
+# RLock: callback weakref (_drop_bank) có thể chạy khi GC xảy ra lúc đang giữ lock
+_banks_lock = threading.RLock()
+
+
+def get_feature_bank(audio: np.ndarray, sr: int) -> FeatureBank:
+    """Return the FeatureBank attached to this array (created on first use)"""
+    key = id(audio)
+    with _banks_lock:
+        entry = _banks.get(key)
+        if entry is not None:
+            ref, bank = entry
+            if ref() is audio and bank.sr == int(sr):
+                _banks.move_to_end(key)
+                return bank
+
+        bank = FeatureBank(audio, sr, weak=True)
+        bank._registered = True
+        # Bank bị bỏ khi mảng bị giải phóng (id có thể được dùng lại)
+        ref = weakref.ref(audio, lambda _, key=key: _drop_bank(key))
+        _banks[key] = (ref, bank)
+        return bank
+
+
+def _drop_bank(key: int):
+    with _banks_lock:
+        entry = _banks.get(key)
+        if entry is not None and entry[0]() is None:
+            del _banks[key]
+
+
+def _enforce_bank_budget(current: FeatureBank):
+    """
+    Clear least recently used registry banks until their features fit
+    CACHE_CONFIG['feature_bank_max_bytes']. The bank that just stored a
+    feature is kept (its pipeline is still running).
+    """
+    max_bytes = CACHE_CONFIG['feature_bank_max_bytes']
+    with _banks_lock:
+        total = sum(bank.nbytes for _, bank in _banks.values())
+        if total <= max_bytes:
+            return
+        for _, bank in list(_banks.values()):
+            if total <= max_bytes:
+                break
+            if bank is current or not bank.nbytes:
+                continue
+            total -= bank.nbytes
+            bank.clear()
+    if total > max_bytes:
+        logger.debug(f"FeatureBank over budget: {total} > {max_bytes} bytes (current bank)")
+
+
+def feature_bank_stats() -> Dict:
+    """Registry usage: number of banks and bytes of memoized features"""
+    with _banks_lock:
+        return {
+            'banks': len(_banks),
+            'bytes': sum(bank.nbytes for _, bank in _banks.values()),
+            'max_bytes': CACHE_CONFIG['feature_bank_max_bytes'],
+        }
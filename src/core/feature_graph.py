@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Feature Graph - Đồ thị đặc trưng lazy, mỗi đặc trưng khai báo input của nó
+
+Consumer chỉ xin đúng những gì cần theo tên:
+
+    graph = get_feature_graph(audio, sr)
+    chroma, rms = graph.request('chroma', 'rms').values()
+    harmonic_centroid = graph['harmonic.centroid']
+
+Tên có dấu chấm ('harmonic.chroma') là đặc trưng của tín hiệu dẫn xuất
+(harmonic / percussive) với cùng tham số đồ thị. Mỗi node được tính ở lần
+truy cập đầu tiên, sau khi các input của nó đã được tính, và được nhớ trên
+FeatureBank của mảng (get_feature_bank) nên mọi consumer cùng mảng - kể cả
+các chỗ còn gọi FeatureBank trực tiếp - dùng chung từng bước trung gian.
+"""
+
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from src.core.config import AUDIO_CONFIG, PITCH_CONFIG
+from src.core.feature_bank import FeatureBank, get_feature_bank
+
+logger = logging.getLogger(__name__)
+
+# Tham số mặc định của một đồ thị; get_feature_graph(..., n_fft=1024) ghi đè
+DEFAULT_PARAMS = {
+    'n_fft': AUDIO_CONFIG['n_fft'],
+    'hop_length': AUDIO_CONFIG['hop_length'],
+    'n_mfcc': AUDIO_CONFIG['n_mfcc'],
+    # HPSS của node harmonic / percussive
+    'margin': 1.0,
+    'approximate': False,
+    'pitch': PITCH_CONFIG,
+}
+
+# Tín hiệu dẫn xuất có thể dùng làm tiền tố 'harmonic.xxx'
+DERIVED_SIGNALS = ('harmonic', 'percussive')
+
+
+class FeatureNode:
+    """One named feature: its inputs and how to compute it on a FeatureBank"""
+
+    def __init__(self, name: str, inputs: Tuple[str, ...], compute: Callable):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+
+
+FEATURES: Dict[str, FeatureNode] = {}
+
+
+def feature(name: str, *inputs: str):
+    """Register compute(bank, params) as node `name` depending on `inputs`"""
+    def register(compute: Callable) -> Callable:
+        FEATURES[name] = FeatureNode(name, inputs, compute)
+        return compute
+    return register
+
+
+@feature('stft')
+def _stft(bank: FeatureBank, p: Dict):
+    return bank.stft(p['n_fft'], p['hop_length'])
+
+
+@feature('magnitude', 'stft')
+def _magnitude(bank: FeatureBank, p: Dict):
+    return bank.magnitude(p['n_fft'], p['hop_length'])
+
+
+@feature('power', 'magnitude')
+def _power(bank: FeatureBank, p: Dict):
+    return bank.power(p['n_fft'], p['hop_length'])
+
+
+@feature('chroma', 'power')
+def _chroma(bank: FeatureBank, p: Dict):
+    return bank.chroma_stft(p['n_fft'], p['hop_length'])
+
+
+@feature('tuning')
+def _tuning(bank: FeatureBank, p: Dict):
+    # Như librosa: ước lượng trên STFT 2048 / 512 cố định, không theo n_fft / hop_length của graph
+    return bank.tuning()
+
+
+@feature('cqt', 'tuning')
+def _cqt(bank: FeatureBank, p: Dict):
+    return bank.cqt_magnitude(p['hop_length'])
+
+
+@feature('chroma_cqt', 'cqt')
+def _chroma_cqt(bank: FeatureBank, p: Dict):
+    return bank.chroma_cqt(p['hop_length'])
+
+
+@feature('chroma_cens', 'cqt')
+def _chroma_cens(bank: FeatureBank, p: Dict):
+    return bank.chroma_cens(p['hop_length'])
+
+
+@feature('centroid', 'magnitude')
+def _centroid(bank: FeatureBank, p: Dict):
+    return bank.spectral_centroid(p['n_fft'], p['hop_length'])
+
+
+@feature('rolloff', 'magnitude')
+def _rolloff(bank: FeatureBank, p: Dict):
+    return bank.spectral_rolloff(p['n_fft'], p['hop_length'])
+
+
+@feature('bandwidth', 'magnitude')
+def _bandwidth(bank: FeatureBank, p: Dict):
+    return bank.spectral_bandwidth(p['n_fft'], p['hop_length'])
+
+
+@feature('rms', 'magnitude')
+def _rms(bank: FeatureBank, p: Dict):
+    return bank.rms(p['n_fft'], p['hop_length'])
+
+
+@feature('mel', 'power')
+def _mel(bank: FeatureBank, p: Dict):
+    return bank.melspectrogram(p['n_fft'], p['hop_length'])
+
+
+@feature('mfcc', 'mel')
+def _mfcc(bank: FeatureBank, p: Dict):
+    return bank.mfcc(p['n_mfcc'], p['n_fft'], p['hop_length'])
+
+
+@feature('onset_envelope', 'mel')
+def _onset_envelope(bank: FeatureBank, p: Dict):
+    return bank.onset_envelope(p['hop_length'])
+
+
+@feature('beats', 'onset_envelope')
+def _beats(bank: FeatureBank, p: Dict):
+    return bank.beats(p['hop_length'])
+
+
+@feature('hpss_stft', 'stft', 'magnitude')
+def _hpss_stft(bank: FeatureBank, p: Dict):
+    return bank.hpss_stft(margin=p['margin'], n_fft=p['n_fft'], hop_length=p['hop_length'],
+                          approximate=p['approximate'])
+
+
+@feature('harmonic', 'hpss_stft')
+def _harmonic(bank: FeatureBank, p: Dict):
+    return bank.hpss(margin=p['margin'], n_fft=p['n_fft'], hop_length=p['hop_length'],
+                     approximate=p['approximate'])[0]
+
+
+@feature('percussive', 'hpss_stft')
+def _percussive(bank: FeatureBank, p: Dict):
+    return bank.hpss(margin=p['margin'], n_fft=p['n_fft'], hop_length=p['hop_length'],
+                     approximate=p['approximate'])[1]
+
+
+@feature('f0')
+def _f0(bank: FeatureBank, p: Dict):
+    return bank.f0(**p['pitch'])
+
+
+def plan(*names: str) -> List[str]:
+    """
+    Evaluation order for `names` (inputs first, each node once). Derived
+    features appear as 'harmonic.chroma' after the 'harmonic' node itself.
+    """
+    order: List[str] = []
+
+    def visit(name: str, path: Tuple[str, ...]):
+        if name in order:
+            return
+        if '.' in name:
+            signal, rest = name.split('.', 1)
+            if signal not in DERIVED_SIGNALS:
+                raise KeyError(f"Unknown derived signal: {signal}")
+            visit(signal, path)
+            order.extend(f"{signal}.{step}" for step in plan(rest) if f"{signal}.{step}" not in order)
+            return
+        if name in path:
+            raise ValueError(f"Cyclic feature dependency: {' -> '.join(path + (name,))}")
+        node = FEATURES.get(name)
+        if node is None:
+            raise KeyError(f"Unknown feature: {name}")
+        for dependency in node.inputs:
+            visit(dependency, path + (name,))
+        order.append(name)
+
+    for name in names:
+        visit(name, ())
+    return order
+
+
+class FeatureGraph:
+    """Lazy, memoized view of FEATURES over one signal with fixed parameters"""
+
+    def __init__(self, bank: FeatureBank, **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown feature graph parameters: {sorted(unknown)}")
+        self.bank = bank
+        self.params = dict(DEFAULT_PARAMS, **params)
+        self._values: Dict[str, object] = {}
+        self._derived: Dict[str, 'FeatureGraph'] = {}
+
+    @property
+    def sr(self) -> int:
+        return self.bank.sr
+
+    def plan(self, *names: str) -> List[str]:
+        """Nodes to evaluate for `names`, inputs before the nodes that use them"""
+        return plan(*names)
+
+    def derived(self, signal: str) -> 'FeatureGraph':
+        """Graph of a derived signal ('harmonic' / 'percussive') with the same parameters"""
+        if signal not in DERIVED_SIGNALS:
+            raise KeyError(f"Unknown derived signal: {signal}")
+        graph = self._derived.get(signal)
+        if graph is None:
+            graph = FeatureGraph(get_feature_bank(self.get(signal), self.sr), **self.params)
+            self._derived[signal] = graph
+        return graph
+
+    def get(self, name: str):
+        """Value of one feature, computing it (and its inputs) on first access"""
+        if name in self._values:
+            return self._values[name]
+        if '.' in name:
+            signal, rest = name.split('.', 1)
+            return self.derived(signal).get(rest)
+
+        for step in self.plan(name):
+            if step not in self._values:
+                self._values[step] = FEATURES[step].compute(self.bank, self.params)
+        return self._values[name]
+
+    __getitem__ = get
+
+    def request(self, *names: str) -> Dict[str, object]:
+        """{name: value} for exactly the requested features"""
+        return {name: self.get(name) for name in names}
+
+
+def get_feature_graph(audio, sr: int, **params) -> FeatureGraph:
+    """Feature graph over this array; values are shared through its FeatureBank"""
+    return FeatureGraph(get_feature_bank(audio, sr), **params)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+File Hash - Hash nội dung file dùng chung, có cache theo danh tính file
+
+Đọc file bằng mmap (hoặc buffer lớn) thay vì từng chunk 8KB / đọc cả file
+vào RAM. Chế độ "fast" chỉ lấy mẫu đầu, cuối và các block cách đều cộng với
+kích thước file - đủ để đặt tên thư mục output / key cache mà không phải
+đọc toàn bộ file.
+
+Digest được lưu theo (device, inode, size, mtime) trong RAM và trong một
+bảng SQLite nhỏ, nên file không đổi sẽ không bị đọc lại lần nào nữa, kể cả
+sau khi khởi động lại process.
+"""
+
+import os
+import mmap
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional, Tuple
+
+from src.core.config import CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_READ_BLOCK = 8 * 1024 * 1024
+# Fast fingerprint: đầu + cuối + các block cách đều
+_SAMPLE_EDGE = 1024 * 1024
+_SAMPLE_BLOCK = 64 * 1024
+_SAMPLE_COUNT = 16
+
+
+def _full_digest(path: str, size: int) -> str:
+    h = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        if size == 0:
+            return h.hexdigest()
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                view = memoryview(data)
+                try:
+                    for start in range(0, size, _READ_BLOCK):
+                        h.update(view[start:start + _READ_BLOCK])
+                finally:
+                    view.release()
+        except (OSError, ValueError):
+            # mmap không khả dụng (pipe, filesystem đặc biệt): đọc buffer lớn
+            f.seek(0)
+            for chunk in iter(lambda: f.read(_READ_BLOCK), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _sampled_digest(path: str, size: int) -> str:
+    # File nhỏ: đọc hết cũng rẻ như lấy mẫu
+    if size <= 2 * _SAMPLE_EDGE + _SAMPLE_COUNT * _SAMPLE_BLOCK:
+        return _full_digest(path, size)
+
+    h = hashlib.blake2b()
+    h.update(size.to_bytes(8, 'little'))
+    with open(path, 'rb') as f:
+        h.update(f.read(_SAMPLE_EDGE))
+        stride = (size - 2 * _SAMPLE_EDGE) // (_SAMPLE_COUNT + 1)
+        for i in range(1, _SAMPLE_COUNT + 1):
+            f.seek(_SAMPLE_EDGE + i * stride)
+            h.update(f.read(_SAMPLE_BLOCK))
+        f.seek(size - _SAMPLE_EDGE)
+        h.update(f.read(_SAMPLE_EDGE))
+    return h.hexdigest()
+
+
+class FileHasher:
+    """Content hashing memoized by file identity (in memory + SQLite table)"""
+
+    def __init__(self, db_path: Optional[str] = CACHE_CONFIG['hash_cache_path']):
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS file_hashes ("
+                    "dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, mode TEXT, digest TEXT, "
+                    "PRIMARY KEY (dev, ino, size, mtime_ns, mode))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Không mở được bảng hash cache ({e}), chỉ cache trong RAM")
+                self._db = None
+
+    @staticmethod
+    def identity(path: str) -> Tuple[int, int, int, int]:
+        """(device, inode, size, mtime_ns) of a file"""
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _lookup(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            digest = self._memory.get(key)
+            if digest is not None or self._db is None:
+                return digest
+            try:
+                row = self._db.execute(
+                    "SELECT digest FROM file_hashes WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND mode=?",
+                    key
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row:
+                self._memory[key] = row[0]
+                return row[0]
+            return None
+
+    def _store(self, key: Tuple, digest: str) -> None:
+        with self._lock:
+            self._memory[key] = digest
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?)", key + (digest,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"Hash cache write failed: {e}")
+
+    def hash_file(self, path: str, fast: bool = False) -> str:
+        """
+        Return the blake2b hex digest of a file.
+
+        fast=True hashes only the size, head, tail and evenly strided blocks;
+        use it for naming/caching, not for integrity checks.
+        """
+        identity = self.identity(path)
+        key = identity + ('fast' if fast else 'full',)
+
+        digest = self._lookup(key)
+        if digest is not None:
+            return digest
+
+        size = identity[2]
+        digest = _sampled_digest(path, size) if fast else _full_digest(path, size)
+        self._store(key, digest)
+        return digest
+
+
+_file_hasher = None
+_file_hasher_lock = threading.Lock()
+
+
+def get_file_hasher() -> FileHasher:
+    """Return the process-wide file hasher"""
+    global _file_hasher
+    if _file_hasher is None:
+        with _file_hasher_lock:
+            if _file_hasher is None:
+                _file_hasher = FileHasher()
+    return _file_hasher
+
+
+def file_hash(path: str, fast: bool = False, length: Optional[int] = None) -> str:
+    """Hash a file through the shared hasher; length truncates the hex digest"""
+    digest = get_file_hasher().hash_file(path, fast=fast)
+    return digest[:length] if length else digest
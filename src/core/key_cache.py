@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Key Cache - Kết quả detect key lưu theo nội dung file
+
+Một beat trong catalog được chấm với hàng nghìn bản thu, nên key của nó chỉ
+cần tính một lần. Kết quả được lưu theo (hash nội dung file, audio_type,
+hybrid mode + GPU / Docker của detector, đoạn cắt) trong một LRU nhỏ ở RAM
+và một bảng SQLite, kèm phiên bản cấu hình: KEY_ALGORITHM_VERSION cộng với
+hash của KEY_CONFIG / PITCH_CONFIG / AUDIO_CONFIG. Khi phiên bản đổi, kết
+quả cũ không còn khớp và bị xóa khỏi bảng ở lần mở tiếp theo.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.core.config import AUDIO_CONFIG, CACHE_CONFIG, KEY_ALGORITHM_VERSION, KEY_CONFIG, PITCH_CONFIG
+from src.core.file_hash import file_hash
+
+logger = logging.getLogger(__name__)
+
+# Khóa KEY_CONFIG chỉ ảnh hưởng cách chạy, không ảnh hưởng kết quả
+_EXECUTION_ONLY = ('parallel', 'max_workers')
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def key_cache_version() -> str:
+    """Algorithm version + hash of the configuration that shapes key results"""
+    key_config = {k: v for k, v in KEY_CONFIG.items() if k not in _EXECUTION_ONLY}
+    payload = json.dumps([key_config, PITCH_CONFIG, AUDIO_CONFIG], sort_keys=True, default=str)
+    return f"{KEY_ALGORITHM_VERSION}-{hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()}"
+
+
+def slice_key(start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """'full' for the whole file, otherwise 'start-end' in seconds ('12.000-' = to the end)"""
+    if start is None and end is None:
+        return 'full'
+    return f"{start or 0.0:.3f}-{'' if end is None else f'{end:.3f}'}"
+
+
+def _to_json(value):
+    # numpy scalar (float32, int64...) trong kết quả
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class KeyResultCache:
+    """Key detection results by file content (LRU in memory + SQLite table)"""
+
+    def __init__(self, db_path: Optional[str] = CACHE_CONFIG['key_cache_path'],
+                 max_entries: int = CACHE_CONFIG['key_cache_max_entries'],
+                 version: Optional[str] = None):
+        self.max_entries = max_entries
+        # version cố định (test); None = tính lại từ cấu hình hiện tại ở mỗi lần tra
+        self._version = version
+        self._memory: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS key_results ("
+                    "digest TEXT, audio_type TEXT, mode TEXT, slice TEXT, version TEXT, result TEXT, "
+                    "PRIMARY KEY (digest, audio_type, mode, slice))"
+                )
+                # Kết quả của phiên bản thuật toán / cấu hình khác không còn dùng được
+                removed = self._db.execute("DELETE FROM key_results WHERE version != ?",
+                                           (self.version,)).rowcount
+                self._db.commit()
+                if removed:
+                    logger.info(f"🧹 Key cache: xóa {removed} kết quả của phiên bản cũ")
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Không mở được bảng key cache ({e}), chỉ cache trong RAM")
+                self._db = None
+
+    @property
+    def version(self) -> str:
+        return self._version or key_cache_version()
+
+    def key_for(self, audio_path: str, audio_type: str, mode: str,
+                start: Optional[float] = None, end: Optional[float] = None) -> Optional[CacheKey]:
+        """
+        Cache key of a file (range), or None when the file cannot be hashed.
+        mode is the hybrid mode plus detector capabilities ('full+gpu+docker').
+        """
+        try:
+            digest = file_hash(audio_path)
+        except OSError as e:
+            logger.debug(f"Key cache: không hash được {audio_path}: {e}")
+            return None
+        return digest, audio_type, mode, slice_key(start, end)
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        version = self.version
+        with self._lock:
+            result = self._memory.get(key + (version,))
+            if result is not None:
+                self._memory.move_to_end(key + (version,))
+                return dict(result)
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT result FROM key_results WHERE digest=? AND audio_type=? AND mode=? AND slice=? "
+                    "AND version=?", key + (version,)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if not row:
+                return None
+            result = json.loads(row[0])
+            self._remember(key + (version,), result)
+            return dict(result)
+
+    def put(self, key: CacheKey, result: Dict) -> None:
+        version = self.version
+        result = json.loads(json.dumps(result, default=_to_json))
+        with self._lock:
+            self._remember(key + (version,), result)
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO key_results VALUES (?, ?, ?, ?, ?, ?)",
+                                 key + (version, json.dumps(result)))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"Key cache write failed: {e}")
+
+    def _remember(self, key: Tuple, result: Dict) -> None:
+        # Gọi khi đang giữ self._lock
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM key_results")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.debug(f"Key cache clear failed: {e}")
+
+
+_key_cache = None
+_key_cache_lock = threading.Lock()
+
+
+def get_key_cache() -> Optional[KeyResultCache]:
+    """Return the process-wide key result cache (None when disabled)"""
+    global _key_cache
+    if not CACHE_CONFIG['key_cache_enabled']:
+        return None
+    if _key_cache is None:
+        with _key_cache_lock:
+            if _key_cache is None:
+                _key_cache = KeyResultCache()
+    return _key_cache
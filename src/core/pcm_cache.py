@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PCM Cache - Cache PCM đã decode trên đĩa, dùng lại giữa các lần chạy
+
+Beat được dùng bởi rất nhiều người hát nên không cần decode + resample lại
+mỗi lần khởi động process. Audio mono ở sample rate chuẩn (22050 Hz) được
+lưu thành file .npy (float32 hoặc float16) đặt tên theo hash nội dung file
+gốc, đọc lại bằng memory-map. Khi thư mục vượt quá giới hạn dung lượng, các
+file ít được dùng gần đây nhất bị xoá.
+
+Mặc định tắt; bật qua CACHE_CONFIG['pcm_cache_enabled'].
+"""
+
+import os
+import glob
+import logging
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from src.core.config import AUDIO_CONFIG, CACHE_CONFIG
+from src.core.file_hash import file_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PCMCache:
+    """Content-addressed on-disk cache of decoded mono PCM stored as .npy"""
+
+    def __init__(self, cache_dir: str = CACHE_CONFIG['pcm_cache_dir'],
+                 max_bytes: int = CACHE_CONFIG['pcm_cache_max_bytes'],
+                 dtype: str = CACHE_CONFIG['pcm_cache_dtype']):
+        if dtype not in ('float32', 'float16'):
+            raise ValueError(f"Unsupported PCM cache dtype: {dtype}")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, path: str, sr: int) -> str:
+        """Location of the cached PCM for this file content and sample rate"""
+        # Hash đầy đủ, được nhớ theo danh tính file nên chỉ đọc file một lần
+        return os.path.join(self.cache_dir, f"{file_hash(path, length=40)}_{sr}_{self.dtype}.npy")
+
+    def lookup(self, path: str, sr: int) -> Optional[np.ndarray]:
+        """Return the memory-mapped PCM if cached, otherwise None"""
+        entry = self.entry_path(path, sr)
+        try:
+            audio = np.load(entry, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        # Đánh dấu vừa dùng để eviction giữ lại file này
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+
+        if audio.dtype != np.float32:
+            # float16 chỉ để tiết kiệm đĩa, pipeline làm việc với float32
+            audio = audio.astype(np.float32)
+        return audio
+
+    def store(self, path: str, sr: int, audio: np.ndarray) -> None:
+        """Write decoded PCM atomically, then evict old entries if over budget"""
+        entry = self.entry_path(path, sr)
+        tmp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(audio, dtype=self.dtype))
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            logger.warning(f"⚠️ Không ghi được PCM cache {entry}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def get_or_decode(self, path: str, decoder: Callable[[], Tuple[np.ndarray, int]],
+                      sr: int) -> Tuple[np.ndarray, int]:
+        """Return cached PCM or run decoder() (mono audio at sr) and persist it"""
+        audio = self.lookup(path, sr)
+        if audio is not None:
+            return audio, sr
+
+        with self._lock:
+            self.misses += 1
+        audio, out_sr = decoder()
+        if out_sr == sr and np.ndim(audio) == 1:
+            self.store(path, sr, audio)
+        return audio, out_sr
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the directory fits max_bytes"""
+        entries = []
+        for entry in glob.glob(os.path.join(self.cache_dir, '*.npy')):
+            try:
+                stat = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Remove every cached file"""
+        for entry in glob.glob(os.path.join(self.cache_dir, '*.npy')):
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+
+
+_pcm_cache = None
+_pcm_cache_lock = threading.Lock()
+
+
+def get_pcm_cache() -> Optional[PCMCache]:
+    """Return the process-wide PCM cache, or None when it is disabled"""
+    global _pcm_cache
+    if not CACHE_CONFIG['pcm_cache_enabled']:
+        return None
+    if _pcm_cache is None:
+        with _pcm_cache_lock:
+            if _pcm_cache is None:
+                _pcm_cache = PCMCache()
+    return _pcm_cache
+
+
+def decode_with_pcm_cache(path: str, decoder: Callable[[], Tuple[np.ndarray, int]],
+                          sr: Optional[int], mono: bool = True) -> Tuple[np.ndarray, int]:
+    """
+    Run decoder() through the disk cache when the request is a whole-file
+    mono decode at the canonical sample rate; otherwise just decode.
+    """
+    pcm_cache = get_pcm_cache()
+    if pcm_cache is None or not mono or sr != AUDIO_CONFIG['sample_rate']:
+        return decoder()
+    try:
+        return pcm_cache.get_or_decode(path, decoder, sr)
+    except OSError as e:
+        logger.warning(f"⚠️ PCM cache lỗi ({e}), decode trực tiếp")
+        return decoder()
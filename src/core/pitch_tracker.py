@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pitch Tracker - F0 (YIN) của một tín hiệu, tính một lần và dùng chung
+
+Chế độ:
+- full: librosa.yin trên toàn bộ tín hiệu
+- voiced: chỉ chạy YIN trên các frame có năng lượng (RMS gate); frame im
+  lặng trả về NaN. Các frame được giữ lại cho kết quả giống hệt chế độ full.
+- decimate > 1: chạy ở sample rate thấp hơn (sr / decimate) trên cùng lưới
+  thời gian, nhanh hơn nhưng kém chính xác hơn một chút.
+
+Track được memoize trên FeatureBank của mảng (get_feature_bank(audio, sr).f0)
+nên scoring và key detection nhận cùng một mảng sẽ dùng chung.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import librosa
+
+from src.core.audio_io import resample_audio
+from src.core.wav_reader import frame_rms_zcr
+
+logger = logging.getLogger(__name__)
+
+PITCH_MODES = ('full', 'voiced')
+
+
+def voiced_runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """[(start, stop), ...] frame ranges where mask is True"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def voiced_mask(audio: np.ndarray, sr: int, frame_length: int, hop_length: int,
+                gate_db: float = 40.0) -> np.ndarray:
+    """Frames whose RMS is within gate_db of the loudest frame (YIN frame grid)"""
+    rms, _ = frame_rms_zcr(audio, sr, frame_length, hop_length)
+    peak = float(np.max(rms)) if len(rms) else 0.0
+    if peak <= 0:
+        return np.zeros(len(rms), dtype=bool)
+    return rms > peak * 10.0 ** (-gate_db / 20.0)
+
+
+def track_f0(audio: np.ndarray, sr: int, fmin: float, fmax: float, frame_length: int = 2048,
+             hop_length: Optional[int] = None, mode: str = 'full', gate_db: float = 40.0,
+             decimate: int = 1) -> np.ndarray:
+    """
+    YIN F0 per frame on librosa.yin's grid (center=True, hop = frame_length // 4
+    by default). Unvoiced frames are NaN in 'voiced' mode.
+    """
+    if mode not in PITCH_MODES:
+        raise ValueError(f"Unknown pitch mode: {mode}")
+    if hop_length is None:
+        hop_length = frame_length // 4
+
+    if decimate > 1:
+        # Cùng lưới thời gian ở sample rate thấp hơn
+        audio = resample_audio(audio, sr, sr // decimate)
+        sr = sr // decimate
+        frame_length //= decimate
+        hop_length //= decimate
+        fmax = min(fmax, 0.45 * sr)
+
+    if mode == 'full':
+        return librosa.yin(audio, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length,
+                           hop_length=hop_length)
+
+    n_frames = 1 + len(audio) // hop_length
+    mask = voiced_mask(audio, sr, frame_length, hop_length, gate_db)[:n_frames]
+    f0 = np.full(n_frames, np.nan)
+
+    # Padding như center=True của librosa.yin; mỗi đoạn voiced chạy với center=False
+    padded = np.pad(audio, frame_length // 2, mode='constant')
+    for start, stop in voiced_runs(mask):
+        segment = padded[start * hop_length:(stop - 1) * hop_length + frame_length]
+        f0[start:stop] = librosa.yin(segment, fmin=fmin, fmax=fmax, sr=sr, frame_length=frame_length,
+                                     hop_length=hop_length, center=False)
+
+    logger.debug(f"Voiced-only F0: {int(mask.sum())}/{n_frames} frames")
+    return f0
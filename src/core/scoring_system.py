@@ -2,6 +2,9 @@ import librosa
 import numpy as np
 from typing import Dict, List, Tuple
 import math
+from src.core.audio_cache import load_audio
+from src.core.feature_graph import get_feature_graph
+from src.core.beat_index import lookup_beat
 
 class KaraokeScoringSystem:
     """Hệ thống chấm điểm karaoke với nhiều tiêu chí"""
@@ -19,24 +22,52 @@ class KaraokeScoringSystem:
         """Tính điểm tổng thể cho bài hát karaoke"""
         try:
             # Tải các file âm thanh
-            karaoke_audio, karaoke_sr = librosa.load(karaoke_path, sr=22050)
-            beat_audio, beat_sr = librosa.load(beat_path, sr=22050)
-            vocals_audio, vocals_sr = librosa.load(vocals_path, sr=22050)
+            karaoke_audio, karaoke_sr = load_audio(karaoke_path, sr=22050)
+            # Beat đã có trong beat index: không decode / phân tích lại
+            beat_analysis = lookup_beat(beat_path)
+            beat_audio = None
+            if beat_analysis is None:
+                beat_audio, beat_sr = load_audio(beat_path, sr=22050)
+            vocals_audio, vocals_sr = load_audio(vocals_path, sr=22050)
+        except Exception as e:
+            raise Exception(f"Lỗi khi tính điểm: {e}")
+        
+        return self.calculate_overall_score_arrays(karaoke_audio, beat_audio, vocals_audio, sr=22050,
+                                                   beat_analysis=beat_analysis)
+    
+    def calculate_overall_score_arrays(self, karaoke_audio: np.ndarray, beat_audio: np.ndarray,
+                                       vocals_audio: np.ndarray, sr: int = 22050,
+                                       vocals_features=None, beat_features=None,
+                                       beat_analysis=None) -> Dict[str, any]:
+        """
+        Tính điểm tổng thể từ các mảng audio đã decode (cùng sample rate sr)
+        
+        vocals_features / beat_features: ClipFeatures tính sẵn theo batch
+        (src.core.batch_features); khi có thì chroma không bị tính lại.
+        beat_analysis: BeatAnalysis từ beat index (src.core.beat_index); khi có
+        thì beat_audio có thể là None và beat không được phân tích lại.
+        """
+        try:
+            karaoke_sr = beat_sr = vocals_sr = sr
             
             # Tính các điểm số thành phần
             scores = {}
             
             # 1. Độ chính xác về phím (đã được tính từ KeyDetector)
-            scores['key_accuracy'] = self._calculate_key_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr)
+            scores['key_accuracy'] = self._calculate_key_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr,
+                                                                  vocals_features, beat_features, beat_analysis)
             
             # 2. Độ chính xác về cao độ
-            scores['pitch_accuracy'] = self._calculate_pitch_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr)
+            scores['pitch_accuracy'] = self._calculate_pitch_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr,
+                                                                      beat_analysis)
             
             # 3. Độ chính xác về nhịp điệu
-            scores['rhythm_accuracy'] = self._calculate_rhythm_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr)
+            scores['rhythm_accuracy'] = self._calculate_rhythm_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr,
+                                                                        beat_analysis)
             
             # 4. Độ chính xác về thời gian
-            scores['timing_accuracy'] = self._calculate_timing_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr)
+            scores['timing_accuracy'] = self._calculate_timing_accuracy(vocals_audio, vocals_sr, beat_audio, beat_sr,
+                                                                        beat_analysis)
             
             # 5. Chất lượng giọng hát
             scores['vocal_quality'] = self._calculate_vocal_quality(vocals_audio, vocals_sr)
@@ -55,16 +86,24 @@ class KaraokeScoringSystem:
         except Exception as e:
             raise Exception(f"Lỗi khi tính điểm: {e}")
     
-    def _calculate_key_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int) -> float:
+    def _calculate_key_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int,
+                                vocals_features=None, beat_features=None, beat_analysis=None) -> float:
         """Tính độ chính xác về phím âm nhạc"""
         try:
-            # Trích xuất chroma features
-            vocals_chroma = librosa.feature.chroma_stft(y=vocals, sr=vocals_sr)
-            beat_chroma = librosa.feature.chroma_stft(y=beat, sr=beat_sr)
+            # Trích xuất chroma features (hoặc dùng chroma đã tính theo batch)
+            if vocals_features is not None:
+                vocals_chroma = vocals_features.chroma
+            else:
+                vocals_chroma = get_feature_graph(vocals, vocals_sr)['chroma']
             
             # Tính correlation giữa chroma của giọng hát và beat
             vocals_mean = np.mean(vocals_chroma, axis=1)
-            beat_mean = np.mean(beat_chroma, axis=1)
+            if beat_analysis is not None:
+                beat_mean = beat_analysis.chroma_mean
+            elif beat_features is not None:
+                beat_mean = np.mean(beat_features.chroma, axis=1)
+            else:
+                beat_mean = np.mean(get_feature_graph(beat, beat_sr)['chroma'], axis=1)
             
             correlation = np.corrcoef(vocals_mean, beat_mean)[0, 1]
             
@@ -75,12 +114,16 @@ class KaraokeScoringSystem:
         except:
             return 50.0  # Điểm mặc định
     
-    def _calculate_pitch_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int) -> float:
+    def _calculate_pitch_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int,
+                                  beat_analysis=None) -> float:
         """Tính độ chính xác về cao độ"""
         try:
-            # Trích xuất pitch
-            vocals_pitch = librosa.yin(vocals, fmin=50, fmax=4000)
-            beat_pitch = librosa.yin(beat, fmin=50, fmax=4000)
+            # Trích xuất pitch (F0 track dùng chung với key detection trên cùng mảng)
+            vocals_pitch = get_feature_graph(vocals, vocals_sr)['f0']
+            if beat_analysis is not None:
+                beat_pitch = beat_analysis.f0
+            else:
+                beat_pitch = get_feature_graph(beat, beat_sr)['f0']
             
             # Loại bỏ các giá trị NaN
             vocals_pitch = vocals_pitch[~np.isnan(vocals_pitch)]
@@ -103,12 +146,16 @@ class KaraokeScoringSystem:
         except:
             return 50.0
     
-    def _calculate_rhythm_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int) -> float:
+    def _calculate_rhythm_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int,
+                                   beat_analysis=None) -> float:
         """Tính độ chính xác về nhịp điệu"""
         try:
-            # Trích xuất tempo và beat tracking
-            vocals_tempo, vocals_beats = librosa.beat.beat_track(y=vocals, sr=vocals_sr)
-            beat_tempo, beat_beats = librosa.beat.beat_track(y=beat, sr=beat_sr)
+            # Trích xuất tempo và beat tracking (lưới beat của feature graph, dùng chung với key detection)
+            vocals_tempo, vocals_beats = get_feature_graph(vocals, vocals_sr)['beats']
+            if beat_analysis is not None:
+                beat_tempo, beat_beats, beat_sr = beat_analysis.tempo, beat_analysis.beat_frames, beat_analysis.sr
+            else:
+                beat_tempo, beat_beats = get_feature_graph(beat, beat_sr)['beats']
             
             # Tính độ lệch tempo
             tempo_deviation = abs(vocals_tempo - beat_tempo) / beat_tempo
@@ -137,12 +184,13 @@ class KaraokeScoringSystem:
         except:
             return 50.0
     
-    def _calculate_timing_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int) -> float:
+    def _calculate_timing_accuracy(self, vocals: np.ndarray, vocals_sr: int, beat: np.ndarray, beat_sr: int,
+                                   beat_analysis=None) -> float:
         """Tính độ chính xác về thời gian"""
         try:
             # Tính độ dài của các file
             vocals_duration = len(vocals) / vocals_sr
-            beat_duration = len(beat) / beat_sr
+            beat_duration = beat_analysis.duration if beat_analysis is not None else len(beat) / beat_sr
             
             # Tính độ lệch thời gian
             duration_deviation = abs(vocals_duration - beat_duration) / beat_duration
@@ -160,7 +208,7 @@ class KaraokeScoringSystem:
             # Tính các đặc trưng âm thanh
             rms_energy = np.sqrt(np.mean(vocals**2))
             zero_crossing_rate = np.mean(librosa.feature.zero_crossing_rate(vocals)[0])
-            spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=vocals, sr=vocals_sr)[0])
+            spectral_centroid = np.mean(get_feature_graph(vocals, vocals_sr)['centroid'])
             
             # Tính điểm dựa trên các đặc trưng
             energy_score = min(100, rms_energy * 1000)  # Normalize energy
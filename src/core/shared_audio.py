@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared Audio - Mảng audio / STFT đặt trong multiprocessing.shared_memory
+
+Dùng khi chạy song song bằng process pool: process cha decode một lần, ghi
+vào shared memory, rồi chỉ gửi handle nhỏ (tên, shape, dtype, sr) cho các
+worker. Worker attach và nhận numpy view trên cùng vùng nhớ, không pickle
+và không copy mảng nhiều MB.
+"""
+
+import sys
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.core.audio_buffer import AudioBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class SharedAudioBuffer:
+    """NumPy array (audio or STFT) backed by a named shared memory block"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape, dtype, sr: Optional[int] = None,
+                 owner: bool = False, readonly: bool = False):
+        self._shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.sr = sr
+        # Chỉ process tạo ra block mới được unlink
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        if readonly:
+            self.array.flags.writeable = False
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, sr: Optional[int] = None) -> 'SharedAudioBuffer':
+        """Copy an array into a new shared memory block (the only copy made)"""
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        buffer = cls(shm, array.shape, array.dtype, sr=sr, owner=True)
+        buffer.array[...] = array
+        return buffer
+
+    @classmethod
+    def from_audio_buffer(cls, audio_buffer: AudioBuffer) -> 'SharedAudioBuffer':
+        return cls.from_array(audio_buffer.audio, sr=audio_buffer.sr)
+
+    @classmethod
+    def attach(cls, handle: Dict, readonly: bool = True) -> 'SharedAudioBuffer':
+        """Open a block created by another process from its handle (zero-copy view)"""
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=handle['name'], track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=handle['name'])
+            # Python < 3.13: resource tracker của worker sẽ unlink block khi worker thoát
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            except Exception:
+                pass
+        return cls(shm, handle['shape'], handle['dtype'], sr=handle.get('sr'), readonly=readonly)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def handle(self) -> Dict:
+        """Small picklable description to send to worker processes"""
+        return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype.str, 'sr': self.sr}
+
+    def as_audio_buffer(self, path: Optional[str] = None) -> AudioBuffer:
+        """Wrap the shared view in an AudioBuffer (no copy)"""
+        audio_buffer = AudioBuffer(self.array, self.sr, path=path)
+        # Giữ block sống cùng buffer để view không trỏ vào vùng nhớ đã đóng
+        audio_buffer._shared = self
+        return audio_buffer
+
+    def close(self):
+        """Detach from the block; the owner also frees it"""
+        self.array = None
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self._shm.close()
+        except BufferError as e:
+            # Còn view trỏ vào buffer: block được giải phóng khi process thoát
+            logger.warning(f"⚠️ Shared memory {self.name} vẫn đang được dùng: {e}")
+
+    def __enter__(self) -> 'SharedAudioBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def resolve_audio_buffer(source) -> Optional[AudioBuffer]:
+    """Accept an AudioBuffer or a shared memory handle and return an AudioBuffer"""
+    if source is None or isinstance(source, AudioBuffer):
+        return source
+    if isinstance(source, SharedAudioBuffer):
+        return source.as_audio_buffer()
+    if isinstance(source, dict) and 'name' in source:
+        return SharedAudioBuffer.attach(source).as_audio_buffer()
+    raise TypeError(f"Unsupported audio source: {type(source).__name__}")
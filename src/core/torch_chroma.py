@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Torch Chroma - chroma_stft bằng torch với filterbank được cache
+
+Filterbank chroma (librosa.filters.chroma) chỉ được dựng một lần cho mỗi
+(sr, n_fft, n_chroma, tuning) và mỗi device; chroma của cả batch là một
+phép matmul trên power spectrogram. Chạy được trên CPU (kernel đa luồng
+của torch) lẫn CUDA, kết quả khớp librosa.feature.chroma_stft.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import librosa
+import torch
+
+logger = logging.getLogger(__name__)
+
+# librosa.estimate_tuning trả về bội số của 0.01 bin
+_TUNING_RESOLUTION = 0.01
+
+_filterbanks: Dict[Tuple, torch.Tensor] = {}
+_windows: Dict[Tuple, torch.Tensor] = {}
+_cache_lock = threading.Lock()
+
+
+def chroma_filterbank(sr: int, n_fft: int, n_chroma: int = 12, tuning: float = 0.0,
+                      device=None, dtype=torch.float32) -> torch.Tensor:
+    """(n_chroma, 1 + n_fft // 2) chroma filter matrix, cached per parameters and device"""
+    tuning = round(float(tuning) / _TUNING_RESOLUTION) * _TUNING_RESOLUTION
+    device = torch.device(device or 'cpu')
+    key = (int(sr), int(n_fft), int(n_chroma), tuning, str(device), dtype)
+    with _cache_lock:
+        fb = _filterbanks.get(key)
+        if fb is None:
+            weights = librosa.filters.chroma(sr=sr, n_fft=n_fft, n_chroma=n_chroma, tuning=tuning)
+            fb = torch.as_tensor(weights, dtype=dtype, device=device)
+            _filterbanks[key] = fb
+        return fb
+
+
+def _hann_window(n_fft: int, device, dtype) -> torch.Tensor:
+    key = (n_fft, str(device), dtype)
+    with _cache_lock:
+        window = _windows.get(key)
+        if window is None:
+            # periodic=True khớp scipy.signal.get_window('hann', n_fft, fftbins=True) của librosa
+            window = torch.hann_window(n_fft, periodic=True, dtype=dtype, device=device)
+            _windows[key] = window
+        return window
+
+
+class TorchChroma:
+    """Batched STFT power spectrogram and chroma on a torch device"""
+
+    def __init__(self, n_fft: int = 2048, hop_length: int = 512, n_chroma: int = 12, device=None):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_chroma = n_chroma
+        self.device = torch.device(device or 'cpu')
+
+    def _as_tensor(self, audio: Union[np.ndarray, torch.Tensor]) -> torch.Tensor:
+        if isinstance(audio, torch.Tensor):
+            return audio.to(self.device, dtype=torch.float32)
+        # Mảng read-only / stride âm (từ cache) phải copy trước khi đưa vào torch
+        return torch.as_tensor(np.ascontiguousarray(audio, dtype=np.float32), device=self.device)
+
+    def power(self, audio: Union[np.ndarray, torch.Tensor]) -> torch.Tensor:
+        """|STFT|^2 of (samples,) or (batch, samples) audio, librosa conventions (center, zero pad)"""
+        x = self._as_tensor(audio)
+        spec = torch.stft(x, n_fft=self.n_fft, hop_length=self.hop_length,
+                          window=_hann_window(self.n_fft, self.device, x.dtype),
+                          center=True, pad_mode='constant', return_complex=True)
+        return spec.real ** 2 + spec.imag ** 2
+
+    def estimate_tuning(self, power: torch.Tensor, sr: int) -> float:
+        """Tuning deviation (fraction of a bin) as librosa.feature.chroma_stft estimates it"""
+        S = power.detach().cpu().numpy()
+        return float(librosa.estimate_tuning(S=S, sr=sr, bins_per_octave=self.n_chroma))
+
+    def chroma_from_power(self, power: torch.Tensor, sr: int,
+                          tuning: Union[None, float, Sequence[float]] = None) -> torch.Tensor:
+        """
+        Chroma (..., n_chroma, frames) from a power spectrogram (..., bins, frames).
+
+        tuning=None estimates it once for the whole input (per clip when
+        batched); a sequence gives one tuning per clip of a batch.
+        """
+        if power.dim() == 3 and (tuning is None or not np.isscalar(tuning)):
+            if tuning is None:
+                tuning = [self.estimate_tuning(p, sr) for p in power]
+            # Mỗi clip có tuning riêng: nhóm theo filterbank để vẫn là matmul theo batch
+            tunings = [round(float(t) / _TUNING_RESOLUTION) * _TUNING_RESOLUTION for t in tuning]
+            raw = torch.empty(power.shape[0], self.n_chroma, power.shape[-1],
+                              dtype=power.dtype, device=power.device)
+            for value in set(tunings):
+                idx = torch.tensor([i for i, t in enumerate(tunings) if t == value], device=power.device)
+                fb = chroma_filterbank(sr, self.n_fft, self.n_chroma, value, power.device, power.dtype)
+                raw[idx] = torch.matmul(fb, power[idx])
+        else:
+            if tuning is None:
+                tuning = self.estimate_tuning(power, sr)
+            fb = chroma_filterbank(sr, self.n_fft, self.n_chroma, tuning, power.device, power.dtype)
+            raw = torch.matmul(fb, power)
+
+        # librosa.util.normalize(norm=inf, axis=-2): frame gần như im lặng giữ nguyên
+        peak = raw.abs().amax(dim=-2, keepdim=True)
+        peak = torch.where(peak < torch.finfo(raw.dtype).tiny, torch.ones_like(peak), peak)
+        return raw / peak
+
+    def chroma(self, audio: Union[np.ndarray, torch.Tensor], sr: int,
+               tuning: Optional[float] = None) -> torch.Tensor:
+        """Same as librosa.feature.chroma_stft(y=audio, sr=sr, n_fft, hop_length), batched"""
+        return self.chroma_from_power(self.power(audio), sr, tuning=tuning)
+
+
+_engines: Dict[Tuple, TorchChroma] = {}
+_engines_lock = threading.Lock()
+
+
+def get_torch_chroma(n_fft: int = 2048, hop_length: int = 512, device=None) -> TorchChroma:
+    """Process-wide engine per (n_fft, hop_length, device)"""
+    key = (n_fft, hop_length, str(torch.device(device or 'cpu')))
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = TorchChroma(n_fft=n_fft, hop_length=hop_length, device=device)
+                _engines[key] = engine
+    return engine
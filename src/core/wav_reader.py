@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WAV Reader - Đọc PCM của file WAV qua memory-map, tính RMS/ZCR theo block
+
+Dùng cho VAD trên file dài (bản thu live hàng giờ): thay vì decode cả file
+thành mảng float, dữ liệu được map vào bộ nhớ và xử lý từng block nên peak
+memory không phụ thuộc độ dài file.
+"""
+
+import os
+import struct
+import logging
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# librosa.feature.zero_crossing_rate coi |x| <= threshold là 0
+_ZCR_THRESHOLD = 1e-10
+
+
+class MappedWav:
+    """Memory-mapped PCM data of a RIFF/WAVE file with zero-copy frame views"""
+
+    def __init__(self, path: str):
+        self.path = path
+        fmt, data_offset, data_size = self._parse_header(path)
+        format_tag, channels, sample_rate, block_align, bits = fmt
+
+        if format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+            dtype = np.dtype('<f4')
+        elif format_tag == _WAVE_FORMAT_PCM and bits in (8, 16, 32):
+            dtype = np.dtype({8: 'u1', 16: '<i2', 32: '<i4'}[bits])
+        elif format_tag == _WAVE_FORMAT_PCM and bits == 24:
+            dtype = np.dtype('u1')
+        else:
+            raise ValueError(f"Unsupported WAV encoding (format {format_tag:#x}, {bits} bits)")
+
+        # Header streaming có thể ghi data_size sai: giới hạn theo kích thước file thật
+        file_size = os.path.getsize(path)
+        data_size = min(data_size, file_size - data_offset)
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits = bits
+        self.frames = data_size // block_align
+
+        if bits == 24:
+            shape = (self.frames, channels, 3)
+        else:
+            shape = (self.frames, channels)
+        self._data = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=shape) \
+            if self.frames > 0 else np.zeros(shape, dtype=dtype)
+
+    @staticmethod
+    def _parse_header(path: str) -> Tuple[Tuple[int, int, int, int, int], int, int]:
+        with open(path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError("Not a RIFF/WAVE file")
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError("WAV file has no data chunk")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size)
+                    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+                    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                        format_tag = struct.unpack('<H', body[24:26])[0]
+                    fmt = (format_tag, channels, sample_rate, block_align, bits)
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError("WAV data chunk before fmt chunk")
+                    return fmt, f.tell(), chunk_size
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def frame_view(self, start: int, stop: int) -> np.ndarray:
+        """Raw samples [start, stop) as a view on the mapping (no copy)"""
+        return self._data[max(0, start):max(0, min(stop, self.frames))]
+
+    def read_block(self, start: int, stop: int) -> np.ndarray:
+        """Samples [start, stop) as mono float32 in [-1, 1] (copies only this block)"""
+        raw = self.frame_view(start, stop)
+        if self.bits == 24:
+            # 3 byte little-endian -> int32 (dịch lên 8 bit để giữ dấu)
+            raw = (raw[..., 0].astype(np.int32) << 8 | raw[..., 1].astype(np.int32) << 16
+                   | raw[..., 2].astype(np.int32) << 24)
+            block = raw.astype(np.float32) / 2147483648.0
+        elif raw.dtype == np.uint8:
+            block = (raw.astype(np.float32) - 128.0) / 128.0
+        elif raw.dtype == np.int16:
+            block = raw.astype(np.float32) / 32768.0
+        elif raw.dtype == np.int32:
+            block = raw.astype(np.float32) / 2147483648.0
+        else:
+            block = np.asarray(raw, dtype=np.float32)
+        return block.mean(axis=1) if self.channels > 1 else block[:, 0]
+
+    def iter_blocks(self, block_frames: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (start, mono float32 block) over the whole file"""
+        for start in range(0, self.frames, block_frames):
+            yield start, self.read_block(start, start + block_frames)
+
+
+def open_wav(path: str) -> Optional[MappedWav]:
+    """Map a WAV file, or None when it is not a WAV this reader supports"""
+    if os.path.splitext(path)[1].lower() != '.wav':
+        return None
+    try:
+        return MappedWav(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Memory-mapped WAV reader unavailable for {path}: {e}")
+        return None
+
+
+def frame_rms_zcr(source: Union[MappedWav, np.ndarray], sr: int, frame_length: int = 2048,
+                  hop_length: int = 512, source_sr: Optional[int] = None,
+                  block_frames: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Frame-wise RMS and zero-crossing rate, computed block by block.
+
+    Matches librosa.feature.rms / zero_crossing_rate (center=True) on the
+    frame grid of `sr` and `hop_length`. When the source is at another rate
+    (e.g. a 44.1 kHz WAV for a 22.05 kHz detector) the same time windows are
+    measured on the native samples instead of resampling the whole file.
+    Only one block of block_frames frames is held in memory at a time.
+    """
+    if isinstance(source, MappedWav):
+        native_sr = source.sample_rate
+        total = source.frames
+        read = source.read_block
+    else:
+        native_sr = source_sr or sr
+        audio = np.asarray(source, dtype=np.float32)
+        total = audio.shape[-1]
+        read = lambda start, stop: audio[max(0, start):max(0, stop)]
+
+    ratio = native_sr / sr
+    n_target = int(round(total / ratio))
+    n_frames = 1 + n_target // hop_length
+    window = int(round(frame_length * ratio))
+
+    rms = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32)
+
+    for k0 in range(0, n_frames, block_frames):
+        k = np.arange(k0, min(k0 + block_frames, n_frames))
+        starts = np.round((k * hop_length - frame_length // 2) * ratio).astype(np.int64)
+        ends = starts + window
+
+        block_start = max(0, int(starts[0]))
+        block_end = min(total, int(ends[-1]))
+        x = read(block_start, block_end)
+
+        # Prefix sums: tổng bình phương và số lần đổi dấu cho mọi cửa sổ trong block
+        sq = np.concatenate(([0.0], np.cumsum(np.square(x, dtype=np.float64))))
+        negative = x < -_ZCR_THRESHOLD
+        crossings = np.concatenate(([0, 0], np.cumsum(negative[1:] != negative[:-1])))
+
+        s = np.clip(starts - block_start, 0, len(x))
+        e = np.clip(ends - block_start, 0, len(x))
+        # Phần cửa sổ nằm ngoài file là padding 0 (như center=True của librosa)
+        rms[k] = np.sqrt(np.maximum(sq[e] - sq[s], 0.0) / window)
+        zcr[k] = (crossings[e] - crossings[np.minimum(s + 1, e)]) / frame_length
+
+    return rms, zcr
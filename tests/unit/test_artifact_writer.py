@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Artifact Writer - ghi file ở background, flush/wait, báo lỗi
+"""
+
+import os
+import sys
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import soundfile as sf
+
+from src.core.artifact_writer import ArtifactWriter
+
+
+def test_wait_blocks_until_written(tmp_path):
+    path = str(tmp_path / "out" / "slice.wav")
+    audio = np.zeros(22050, dtype=np.float32)
+
+    with ArtifactWriter() as writer:
+        assert writer.write_audio(path, audio, 22050) == path
+        assert writer.wait() == {}
+
+    data, sr = sf.read(path)
+    assert sr == 22050 and len(data) == 22050
+
+
+def test_failures_are_reported_by_name():
+    def fail():
+        raise IOError("disk full")
+
+    with ArtifactWriter() as writer:
+        writer.submit("vocals.mp3", fail)
+        writer.submit("ok", lambda: None)
+        errors = writer.wait()
+
+    assert list(errors) == ["vocals.mp3"]
+    assert "disk full" in errors["vocals.mp3"]
+
+
+def test_queue_is_bounded():
+    """submit() chờ khi hàng đợi đầy"""
+    release = threading.Event()
+    writer = ArtifactWriter(max_pending=1)
+    writer.submit("busy", release.wait)   # worker đang chạy job này
+    writer.submit("queued", lambda: None)  # chiếm chỗ duy nhất trong hàng đợi
+
+    blocked = threading.Thread(target=writer.submit, args=("third", lambda: None))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert writer.wait() == {}
+    writer.close()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Audio Cache - decode một lần, LRU theo dung lượng
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import soundfile as sf
+
+from src.core.audio_cache import AudioCache, load_audio, get_audio_cache
+
+
+def _write_tone(path, sr=22050, duration=1.0, freq=440.0):
+    t = np.linspace(0, duration, int(sr * duration), False)
+    sf.write(path, 0.5 * np.sin(2 * np.pi * freq * t), sr)
+
+
+def test_load_audio_decodes_once(tmp_path):
+    """Lần load thứ hai phải lấy từ cache"""
+    path = str(tmp_path / "tone.wav")
+    _write_tone(path)
+
+    cache = get_audio_cache()
+    cache.clear()
+    misses_before = cache.stats()['misses']
+
+    audio1, sr1 = load_audio(path, sr=22050)
+    audio2, sr2 = load_audio(path, sr=22050)
+
+    assert sr1 == sr2 == 22050
+    assert audio1 is audio2
+    assert cache.stats()['misses'] == misses_before + 1
+    assert not audio1.flags.writeable
+
+
+def test_cache_key_changes_with_file(tmp_path):
+    """Ghi đè file phải làm key thay đổi"""
+    path = str(tmp_path / "tone.wav")
+    _write_tone(path, duration=1.0)
+    key1 = AudioCache.make_key(path, 22050, True)
+
+    _write_tone(path, duration=2.0)
+    key2 = AudioCache.make_key(path, 22050, True)
+
+    assert key1 != key2
+
+
+def test_lru_eviction_respects_max_bytes():
+    """Entry cũ nhất bị loại khi vượt giới hạn"""
+    block = np.zeros(1000, dtype=np.float32)  # 4000 bytes
+    cache = AudioCache(max_bytes=10000)
+
+    cache.put(('a',), block.copy(), 22050)
+    cache.put(('b',), block.copy(), 22050)
+    cache.get(('a',))
+    cache.put(('c',), block.copy(), 22050)
+
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) is not None
+    assert cache.get(('c',)) is not None
+    assert cache.stats()['bytes'] <= 10000
+
+
+def test_range_decode_matches_full_decode(tmp_path):
+    """Decode theo khoảng phải khớp với cắt từ bản decode đầy đủ"""
+    from src.core.audio_io import read_range
+
+    path = str(tmp_path / "long.wav")
+    sr = 22050
+    _write_tone(path, sr=sr, duration=5.0)
+
+    full, _ = read_range(path)
+    part, part_sr = read_range(path, offset=1.5, duration=2.0)
+
+    start = int(1.5 * sr)
+    assert part_sr == sr
+    assert len(part) == int(2.0 * sr)
+    assert np.allclose(part, full[start:start + len(part)], atol=1e-6)
+
+
+def test_range_decode_past_end_is_empty(tmp_path):
+    """Offset vượt quá độ dài file trả về mảng rỗng"""
+    from src.core.audio_io import read_range
+
+    path = str(tmp_path / "short.wav")
+    _write_tone(path, duration=1.0)
+
+    audio, _ = read_range(path, offset=10.0, duration=2.0)
+    assert len(audio) == 0
+
+
+def test_probe_reads_header_without_decode(tmp_path):
+    """probe() trả về metadata từ header và cache theo file"""
+    from src.core.audio_io import probe
+
+    path = str(tmp_path / "tone.wav")
+    _write_tone(path, sr=16000, duration=2.0)
+
+    info = probe(path)
+    assert info['sample_rate'] == 16000
+    assert info['channels'] == 1
+    assert info['frames'] == 32000
+    assert abs(info['duration'] - 2.0) < 1e-6
+
+    # Bản sao: sửa kết quả không ảnh hưởng cache
+    info['duration'] = -1
+    assert probe(path)['duration'] > 0
+
+
+def test_probe_mp3_frame_scan(tmp_path):
+    """Quét header MP3 (không có Xing) đếm đúng số frame"""
+    from src.core.audio_io import _scan_mp3
+
+    # MPEG1 Layer III, 128kbps, 44100Hz, không padding -> frame 417 bytes
+    frame = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+    path = tmp_path / "silence.mp3"
+    path.write_bytes(frame * 100)
+
+    info = _scan_mp3(str(path))
+    assert info['sample_rate'] == 44100
+    assert info['frames'] == 100 * 1152
+    assert abs(info['duration'] - 100 * 1152 / 44100) < 1e-9
+
+
+def test_each_rate_decoded_and_derived_once(tmp_path):
+    """Mỗi sample rate decode + resample một lần; bản gốc chỉ được cache khi load sr=None"""
+    path = str(tmp_path / "tone44k.wav")
+    _write_tone(path, sr=44100, duration=1.0)
+
+    cache = get_audio_cache()
+    cache.clear()
+    misses_before = cache.stats()['misses']
+
+    a16, sr16 = load_audio(path, sr=16000)
+    a22, sr22 = load_audio(path, sr=22050)
+    native, native_sr = load_audio(path, sr=None)
+    load_audio(path, sr=16000)
+
+    assert (sr16, sr22, native_sr) == (16000, 22050, 44100)
+    assert len(a16) == 16000 and len(a22) == 22050
+    # native + 16000 + 22050, lần gọi lại 16000 là cache hit
+    assert cache.stats()['misses'] == misses_before + 3
+    # Không giữ bản gốc ẩn bên cạnh các sample rate đã resample
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['bytes'] == a16.nbytes + a22.nbytes + native.nbytes
+
+
+def test_native_rate_load_keeps_one_entry(tmp_path):
+    """File 22.05kHz load ở sr=22050: một entry, bytes tính một lần"""
+    path = str(tmp_path / "tone.wav")
+    _write_tone(path, sr=22050)
+
+    cache = get_audio_cache()
+    cache.clear()
+    audio, _ = load_audio(path, sr=22050)
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == audio.nbytes
+
+    # Bản gốc (sr=None) và sr=22050 dùng chung một mảng
+    cache.clear()
+    native, _ = load_audio(path, sr=None)
+    audio, _ = load_audio(path, sr=22050)
+    assert audio is native
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] == native.nbytes
+
+
+def test_buffer_resample_is_memoized():
+    from src.core.audio_buffer import AudioBuffer
+
+    buffer = AudioBuffer(np.zeros(44100, dtype=np.float32), 44100)
+    assert buffer.resample(22050) is buffer.resample(22050)
+    assert len(buffer.resample(16000).audio) == 16000
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Batch Features - chroma/MFCC/RMS theo batch so với librosa từng clip
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+import pytest
+
+from src.core.batch_features import extract_batch_features
+
+
+def _clip(sr=22050, duration=1.5, root=261.63, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * duration)) / sr
+    audio = sum(0.3 * np.sin(2 * np.pi * root * r * t) for r in (1.0, 1.26, 1.5))
+    return (audio + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def test_batch_matches_per_clip_librosa():
+    """Clip có độ dài khác nhau: frame hợp lệ khớp librosa, frame padding bị mask"""
+    clips = [_clip(duration=1.5), _clip(duration=0.7, root=220.0, seed=1), _clip(duration=2.1, seed=2)]
+    features = extract_batch_features(clips, 22050, batch_size=2)
+
+    assert len(features) == 3
+    for audio, clip_features, mask in zip(clips, features.clips(), features.mask):
+        chroma = librosa.feature.chroma_stft(y=audio, sr=22050)
+        mfcc = librosa.feature.mfcc(y=audio, sr=22050, n_mfcc=13)
+        rms = librosa.feature.rms(y=audio)[0]
+
+        assert clip_features.n_frames == chroma.shape[1] == mask.sum()
+        assert np.allclose(clip_features.chroma, chroma, atol=1e-3)
+        assert np.allclose(clip_features.mfcc, mfcc, atol=1e-2)
+        assert np.allclose(clip_features.rms, rms, atol=1e-5)
+
+    assert np.all(features.chroma[1][:, ~features.mask[1]] == 0)
+
+
+def test_rejects_mixed_rates():
+    class Buffer:
+        def __init__(self, audio, sr):
+            self.audio, self.sr = audio, sr
+
+    with pytest.raises(ValueError):
+        extract_batch_features([Buffer(_clip(), 22050), Buffer(_clip(), 44100)], 22050)
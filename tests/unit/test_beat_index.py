@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Beat Index - phân tích beat tính sẵn, tra theo path / hash / PCM, chấm điểm không phân tích lại beat
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.core import beat_index
+from src.core.beat_index import BeatIndex, analyze_beat, pcm_fingerprint
+from src.core.scoring_system import KaraokeScoringSystem
+
+
+def _write_beat(path, sr=22050, duration=4.0, freq=220.0):
+    t = np.arange(int(sr * duration)) / sr
+    audio = 0.4 * np.sin(2 * np.pi * freq * t)
+    # Click mỗi 0.5s để có lưới beat
+    audio[::sr // 2] += 0.9
+    sf.write(str(path), audio, sr)
+    return str(path)
+
+
+def test_save_load_and_lookup(tmp_path):
+    beat = _write_beat(tmp_path / "beat.wav")
+    entry = analyze_beat(beat)
+    entry.key = {'key': 'A', 'scale': 'minor', 'confidence': 0.8, 'method': 'Hybrid'}
+
+    index_path = str(tmp_path / "index.npz")
+    index = BeatIndex(index_path)
+    index.add(entry)
+    index.save()
+
+    loaded = BeatIndex(index_path)
+    hit = loaded.lookup(beat)
+    assert len(loaded) == 1 and hit is not None
+    assert hit.key == entry.key and hit.tempo == entry.tempo and hit.duration == entry.duration
+    assert np.array_equal(hit.beat_frames, entry.beat_frames)
+    assert np.allclose(hit.chroma_mean, entry.chroma_mean)
+    assert np.array_equal(hit.f0, entry.f0, equal_nan=True)
+    assert loaded.get(entry.digest) is hit and loaded.get(entry.pcm_digest) is hit
+
+    # Cùng nội dung ở path khác: tra theo hash
+    moved = tmp_path / "moved.wav"
+    moved.write_bytes(open(beat, 'rb').read())
+    assert loaded.lookup(str(moved)) is hit
+    # Nội dung khác: miss
+    assert loaded.lookup(_write_beat(tmp_path / "other.wav", freq=330.0)) is None
+
+
+def test_pcm_lookup(tmp_path):
+    beat = _write_beat(tmp_path / "beat.wav")
+    index = BeatIndex(None)
+    index.add(analyze_beat(beat))
+
+    audio, _ = sf.read(beat, dtype='float32')
+    assert index.lookup_audio(audio) is not None
+    assert pcm_fingerprint(audio) != pcm_fingerprint(audio[1:])
+
+
+def test_index_from_other_version_is_ignored(tmp_path, monkeypatch):
+    index_path = str(tmp_path / "index.npz")
+    index = BeatIndex(index_path)
+    index.add(analyze_beat(_write_beat(tmp_path / "beat.wav")))
+    index.save()
+
+    monkeypatch.setattr(beat_index, 'key_cache_version', lambda: 'other')
+    assert len(BeatIndex(index_path)) == 0
+
+
+def test_scoring_with_index_matches_audio(tmp_path):
+    beat = _write_beat(tmp_path / "beat.wav")
+    vocals = _write_beat(tmp_path / "vocals.wav", duration=3.0, freq=246.94)
+    beat_audio, _ = sf.read(beat, dtype='float32')
+    vocals_audio, _ = sf.read(vocals, dtype='float32')
+    entry = analyze_beat(beat)
+
+    scoring = KaraokeScoringSystem()
+    from_audio = scoring.calculate_overall_score_arrays(vocals_audio, beat_audio.copy(), vocals_audio)
+    from_index = scoring.calculate_overall_score_arrays(vocals_audio, None, vocals_audio, beat_analysis=entry)
+    assert from_index['detailed_scores'] == pytest.approx(from_audio['detailed_scores'], abs=0.01)
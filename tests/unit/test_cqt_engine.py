@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test CQT Engine - kernel cache và chroma_cqt/chroma_cens dùng chung một CQT
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+
+from src.core.cqt_engine import cqt, get_cqt_kernel
+from src.core.feature_bank import FeatureBank
+
+
+def _chord(sr=22050, duration=2.0):
+    t = np.arange(int(sr * duration)) / sr
+    return sum(0.3 * np.sin(2 * np.pi * f * t) for f in (261.63, 329.63, 392.0)).astype(np.float32)
+
+
+def test_cqt_matches_librosa_chroma_defaults():
+    audio = _chord()
+    expected = np.abs(librosa.cqt(audio, sr=22050, hop_length=512, n_bins=252, bins_per_octave=36))
+    result = np.abs(cqt(audio, 22050, hop_length=512, n_bins=252, bins_per_octave=36))
+
+    assert result.shape == expected.shape
+    assert np.allclose(result, expected, atol=1e-3 * expected.max())
+
+
+def test_kernel_cached_per_configuration():
+    kernel = get_cqt_kernel(22050, 512, n_bins=252, bins_per_octave=36, tuning=0.001)
+    assert get_cqt_kernel(22050, 512, n_bins=252, bins_per_octave=36, tuning=0.0) is kernel
+    assert get_cqt_kernel(22050, 256, n_bins=252, bins_per_octave=36) is not kernel
+
+
+def test_feature_bank_chroma_cqt_and_cens():
+    audio = _chord()
+    bank = FeatureBank(audio, 22050)
+
+    chroma = bank.chroma_cqt(hop_length=512)
+    cens = bank.chroma_cens(hop_length=512)
+
+    assert np.allclose(chroma, librosa.feature.chroma_cqt(y=audio, sr=22050, hop_length=512), atol=1e-2)
+    assert np.allclose(cens, librosa.feature.chroma_cens(y=audio, sr=22050, hop_length=512), atol=1e-2)
+    # Một CQT cho cả hai
+    assert bank.cqt_magnitude(512, 252, 36) is bank.cqt_magnitude(512, 252, 36)
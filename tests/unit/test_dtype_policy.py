@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Dtype Policy - float32/complex64 ở ranh giới các bước, feature float16 tùy chọn
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+from scipy import signal
+
+from src.core.dtype_policy import filtfilt, with_phase_of
+from src.core.feature_bank import FeatureBank
+from src.ai.advanced_key_detector import AdvancedKeyDetector
+
+
+def _tone(sr=22050, duration=2.0):
+    t = np.arange(int(sr * duration)) / sr
+    return (0.5 * np.sin(2 * np.pi * 440.0 * t) + 0.2 * np.sin(2 * np.pi * 660.0 * t)).astype(np.float32)
+
+
+def test_filtfilt_and_phase_keep_single_precision():
+    audio = _tone()
+    b, a = signal.butter(4, 0.3)
+    assert filtfilt(b, a, audio).dtype == np.float32
+
+    stft = librosa.stft(audio)
+    rebuilt = with_phase_of(np.abs(stft) * 0.5, stft)
+    assert rebuilt.dtype == np.complex64
+    assert np.allclose(rebuilt, 0.5 * np.abs(stft) * np.exp(1j * np.angle(stft)), atol=1e-4)
+
+
+def test_preprocessing_stays_float32():
+    # Không gọi __init__ để khỏi kiểm tra Essentia/Docker
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+    audio = _tone()
+
+    assert detector._preprocess_vocals_audio(audio, 22050).dtype == np.float32
+    assert detector._preprocess_beat_audio(audio, 22050).dtype == np.float32
+    assert detector._apply_spectral_gating(audio, 22050).dtype == np.float32
+
+
+def test_feature_bank_dtypes():
+    bank = FeatureBank(_tone().astype(np.float64), 22050)
+    assert bank.stft().dtype == np.complex64
+    assert bank.power().dtype == np.float32
+
+    compact = FeatureBank(_tone(), 22050, feature_dtype='float16')
+    chroma = compact.chroma_stft()
+    assert chroma.dtype == np.float16
+    assert compact.mfcc().dtype == np.float16
+    assert compact.power().dtype == np.float32
+    assert np.allclose(chroma, bank.chroma_stft(), atol=1e-2)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Feature Bank - đặc trưng phổ dùng chung một STFT
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+
+from src.core import feature_bank
+from src.core.feature_bank import FeatureBank, get_feature_bank
+
+
+def _tone(sr=22050, duration=2.0):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sr * duration)) / sr
+    return (0.4 * np.sin(2 * np.pi * 261.63 * t) + 0.2 * np.sin(2 * np.pi * 392.0 * t)
+            + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def test_features_match_librosa():
+    """Kết quả khớp librosa khi tính trực tiếp từ y"""
+    audio = _tone()
+    bank = FeatureBank(audio, 22050)
+
+    assert np.allclose(bank.chroma_stft(), librosa.feature.chroma_stft(y=audio, sr=22050), atol=1e-5)
+    assert np.allclose(bank.spectral_centroid(), librosa.feature.spectral_centroid(y=audio, sr=22050)[0],
+                       rtol=1e-4)
+    assert np.allclose(bank.spectral_rolloff(), librosa.feature.spectral_rolloff(y=audio, sr=22050)[0],
+                       rtol=1e-4)
+    assert np.allclose(bank.spectral_bandwidth(), librosa.feature.spectral_bandwidth(y=audio, sr=22050)[0],
+                       rtol=1e-4)
+    assert np.allclose(bank.mfcc(n_mfcc=13), librosa.feature.mfcc(y=audio, sr=22050, n_mfcc=13),
+                       atol=1e-3)
+    assert np.allclose(bank.chroma_stft(n_fft=4096, hop_length=1024),
+                       librosa.feature.chroma_stft(y=audio, sr=22050, n_fft=4096, hop_length=1024), atol=1e-5)
+
+
+def test_stft_computed_once_per_resolution(monkeypatch):
+    calls = []
+    real_stft = librosa.stft
+
+    def counting_stft(*args, **kwargs):
+        calls.append(kwargs.get('n_fft'))
+        return real_stft(*args, **kwargs)
+
+    monkeypatch.setattr(feature_bank.librosa, 'stft', counting_stft)
+    bank = FeatureBank(_tone(), 22050)
+
+    bank.chroma_stft()
+    bank.spectral_centroid()
+    bank.spectral_rolloff()
+    bank.mfcc()
+    assert calls == [2048]
+
+    bank.chroma_stft(n_fft=1024, hop_length=256)
+    assert calls == [2048, 1024]
+
+
+def test_registry_shares_bank_per_array():
+    audio = _tone()
+    bank = get_feature_bank(audio, 22050)
+
+    assert get_feature_bank(audio, 22050) is bank
+    assert get_feature_bank(audio.copy(), 22050) is not bank
+    assert get_feature_bank(audio, 44100) is not bank
+
+
+def test_hpss_matches_librosa_and_is_memoized():
+    audio = _tone()
+    bank = FeatureBank(audio, 22050)
+
+    harmonic, percussive = bank.hpss(margin=4)
+    expected_h, expected_p = librosa.effects.hpss(audio, margin=4)
+
+    assert np.allclose(harmonic, expected_h, atol=1e-5)
+    assert np.allclose(percussive, expected_p, atol=1e-5)
+    assert bank.hpss(margin=(4, 4))[0] is harmonic
+    assert not harmonic.flags.writeable
+
+
+def test_approximate_hpss_close_to_exact():
+    """Chế độ xấp xỉ giữ gần như toàn bộ năng lượng harmonic của tone"""
+    audio = _tone()
+    bank = FeatureBank(audio, 22050)
+
+    exact, _ = bank.hpss()
+    approx, approx_perc = bank.hpss(approximate=True, decimate=4)
+
+    assert approx.shape == exact.shape
+    assert np.corrcoef(approx, exact)[0, 1] > 0.95
+    assert np.sum(approx_perc ** 2) < 0.1 * np.sum(approx ** 2)
+
+
+def test_registry_releases_bank_with_array():
+    audio = _tone()
+    get_feature_bank(audio, 22050).chroma_stft()
+    key = id(audio)
+
+    del audio
+    assert key not in feature_bank._banks
+
+
+def test_beats_and_beat_sync_match_librosa():
+    """Lưới beat giống beat_track; beat_sync giống librosa.util.sync(aggregate=mean)"""
+    sr = 22050
+    clicks = librosa.clicks(times=np.arange(0.25, 4.0, 0.5), sr=sr, length=4 * sr)
+    audio = (clicks + 0.1 * _tone(sr, 4.0)).astype(np.float32)
+    bank = FeatureBank(audio, sr)
+
+    tempo, frames = bank.beats()
+    expected_tempo, expected_frames = librosa.beat.beat_track(y=audio, sr=sr)
+    assert np.isclose(tempo, np.atleast_1d(expected_tempo)[0])
+    assert np.array_equal(frames, expected_frames)
+    assert bank.beats() is bank.beats()
+
+    chroma = bank.chroma_stft()
+    synced = feature_bank.beat_sync(chroma, frames)
+    assert np.allclose(synced, librosa.util.sync(chroma, frames, aggregate=np.mean))
+    assert np.allclose(bank.beat_sync(chroma), synced)
+    # Lưới beat ở hop khác với hop của feature: đổi frame theo tỉ lệ hop
+    _, frames_256 = bank.beats(256)
+    assert np.allclose(bank.beat_sync(chroma, beat_hop=256), feature_bank.beat_sync(chroma, frames_256 // 2))
+
+
+def test_detector_beat_sync_uses_graph_hop(monkeypatch):
+    """_beat_synchronous đổi lưới beat theo hop_length của graph, không giả định 512"""
+    from src.core import feature_graph
+    from src.ai.advanced_key_detector import AdvancedKeyDetector
+
+    sr = 22050
+    clicks = librosa.clicks(times=np.arange(0.25, 4.0, 0.5), sr=sr, length=4 * sr)
+    audio = (clicks + 0.1 * _tone(sr, 4.0)).astype(np.float32)
+    monkeypatch.setitem(feature_graph.DEFAULT_PARAMS, 'hop_length', 256)
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+    detector.beat_sync = True
+
+    bank = get_feature_bank(audio, sr)
+    _, frames = bank.beats(256)
+    chroma = bank.chroma_stft(2048, 256)
+    assert np.allclose(detector._beat_synchronous(chroma, audio, sr, hop_length=256),
+                       feature_bank.beat_sync(chroma, frames))
+
+
+def test_concurrent_requests_compute_once(monkeypatch):
+    """Nhiều thread xin đặc trưng trên cùng bank: STFT chỉ tính một lần"""
+    import threading
+
+    calls = []
+    real_stft = librosa.stft
+
+    def counting_stft(*args, **kwargs):
+        calls.append(kwargs.get('n_fft'))
+        return real_stft(*args, **kwargs)
+
+    monkeypatch.setattr(feature_bank.librosa, 'stft', counting_stft)
+    bank = FeatureBank(_tone(), 22050)
+    threads = [threading.Thread(target=f) for f in (bank.chroma_stft, bank.spectral_centroid, bank.rms, bank.mfcc)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [2048]
+
+
+def test_registry_banks_respect_byte_budget(monkeypatch):
+    """Đặc trưng của các bank dùng chung bị giới hạn; bank ít dùng gần đây nhất bị clear"""
+    from src.core.config import CACHE_CONFIG
+
+    first, second = _tone(), _tone() * 0.5
+    bank1 = get_feature_bank(first, 22050)
+    stft_bytes = bank1.stft().nbytes
+    monkeypatch.setitem(CACHE_CONFIG, 'feature_bank_max_bytes', int(1.5 * stft_bytes))
+
+    bank2 = get_feature_bank(second, 22050)
+    bank2.stft()
+    assert bank1.nbytes == 0
+    assert bank2.nbytes == stft_bytes
+    assert feature_bank.feature_bank_stats()['bytes'] <= int(1.5 * stft_bytes)
+
+    # Bank bị clear vẫn tính lại được
+    assert np.allclose(bank1.stft(), librosa.stft(first))
+    assert bank2.nbytes == 0
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Feature Graph - thứ tự tính theo input khai báo, mỗi bước trung gian tính một lần
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+import pytest
+
+from src.core import feature_bank
+from src.core.feature_graph import get_feature_graph, plan
+
+
+def _tone(sr=22050, duration=2.0):
+    t = np.arange(int(sr * duration)) / sr
+    return (0.4 * np.sin(2 * np.pi * 261.63 * t) + 0.2 * np.sin(2 * np.pi * 392.0 * t)).astype(np.float32)
+
+
+def test_plan_orders_inputs_first():
+    assert plan('mfcc') == ['stft', 'magnitude', 'power', 'mel', 'mfcc']
+    order = plan('harmonic.chroma', 'rms')
+    assert order.index('harmonic') < order.index('harmonic.stft') < order.index('harmonic.chroma')
+    assert order.count('stft') == 1
+    with pytest.raises(KeyError):
+        plan('tempo')
+
+
+def test_full_request_computes_each_stft_once(monkeypatch):
+    calls = []
+    real_stft = librosa.stft
+
+    def counting_stft(*args, **kwargs):
+        calls.append(kwargs.get('n_fft'))
+        return real_stft(*args, **kwargs)
+
+    monkeypatch.setattr(feature_bank.librosa, 'stft', counting_stft)
+    audio = _tone()
+    graph = get_feature_graph(audio, 22050)
+
+    features = graph.request('chroma', 'centroid', 'rms', 'mfcc', 'harmonic.centroid', 'harmonic.chroma')
+    # Một STFT cho tín hiệu gốc, một cho thành phần harmonic
+    assert calls == [2048, 2048]
+
+    # Consumer khác trên cùng mảng (graph mới hoặc FeatureBank trực tiếp) không tính lại
+    assert get_feature_graph(audio, 22050)['chroma'] is features['chroma']
+    assert feature_bank.get_feature_bank(audio, 22050).spectral_centroid() is features['centroid']
+    assert calls == [2048, 2048]
+
+    assert np.allclose(features['chroma'], librosa.feature.chroma_stft(y=audio, sr=22050), atol=1e-5)
+
+
+def test_graph_parameters():
+    audio = _tone()
+    chroma = get_feature_graph(audio, 22050, n_fft=1024, hop_length=256)['chroma']
+    assert np.allclose(chroma, librosa.feature.chroma_stft(y=audio, sr=22050, n_fft=1024, hop_length=256),
+                       atol=1e-5)
+    with pytest.raises(ValueError):
+        get_feature_graph(audio, 22050, window='hamming')
+
+
+def test_cqt_computes_only_declared_stfts(monkeypatch):
+    """cqt phụ thuộc node tuning (STFT 2048 / 512), không phải magnitude của graph"""
+    assert plan('cqt') == ['tuning', 'cqt']
+    calls = []
+    real_stft = librosa.stft
+
+    def counting_stft(*args, **kwargs):
+        # STFT của kernel CQT (window='ones') không tính
+        if kwargs.get('window') != 'ones':
+            calls.append((kwargs.get('n_fft'), kwargs.get('hop_length')))
+        return real_stft(*args, **kwargs)
+
+    monkeypatch.setattr(feature_bank.librosa, 'stft', counting_stft)
+    audio = _tone()
+    graph = get_feature_graph(audio, 22050, n_fft=1024, hop_length=256)
+    graph['cqt']
+    assert calls == [(2048, 512)]
+    assert graph['tuning'] == feature_bank.get_feature_bank(audio, 22050).tuning()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test File Hash - hash đầy đủ / lấy mẫu, cache theo danh tính file
+"""
+
+import os
+import sys
+import hashlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.core.file_hash import FileHasher
+
+
+def test_full_hash_matches_hashlib(tmp_path):
+    """Hash đầy đủ khớp với blake2b đọc cả file"""
+    path = tmp_path / "data.bin"
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    path.write_bytes(data)
+
+    hasher = FileHasher(db_path=None)
+    assert hasher.hash_file(str(path)) == hashlib.blake2b(data).hexdigest()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b'')
+
+    assert FileHasher(db_path=None).hash_file(str(path)) == hashlib.blake2b(b'').hexdigest()
+
+
+def test_fast_fingerprint_detects_size_and_edge_changes(tmp_path):
+    """Fingerprint lấy mẫu thay đổi khi đầu file hoặc kích thước thay đổi"""
+    data = bytearray(os.urandom(8 * 1024 * 1024))
+    a = tmp_path / "a.bin"
+    b = tmp_path / "b.bin"
+    c = tmp_path / "c.bin"
+    a.write_bytes(bytes(data))
+    data[10] ^= 0xFF
+    b.write_bytes(bytes(data))
+    c.write_bytes(bytes(data) + b'\x00')
+
+    hasher = FileHasher(db_path=None)
+    fingerprints = {hasher.hash_file(str(p), fast=True) for p in (a, b, c)}
+    assert len(fingerprints) == 3
+
+
+def test_digest_persisted_by_identity(tmp_path):
+    """Digest được đọc lại từ bảng SQLite trong process mới"""
+    path = tmp_path / "data.bin"
+    path.write_bytes(os.urandom(1024))
+    db_path = str(tmp_path / "hashes.sqlite")
+
+    digest = FileHasher(db_path=db_path).hash_file(str(path))
+
+    # Hasher mới (RAM trống) phải lấy được digest từ bảng mà không cần đọc file
+    fresh = FileHasher(db_path=db_path)
+    key = fresh.identity(str(path)) + ('full',)
+    assert fresh._lookup(key) == digest
+
+
+def test_modified_file_is_rehashed(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b'first')
+    hasher = FileHasher(db_path=None)
+    first = hasher.hash_file(str(path))
+
+    path.write_bytes(b'second version')
+    assert hasher.hash_file(str(path)) != first
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Hybrid Executor - các method key detection chạy song song, quá hạn thì bị bỏ
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import time
+
+import pytest
+
+from src.core.config import KEY_CONFIG
+from src.ai.advanced_key_detector import AdvancedKeyDetector
+
+
+def _method(key, delay):
+    def run():
+        time.sleep(delay)
+        return {'key': key, 'scale': 'major', 'confidence': 0.5}
+    return run
+
+
+def _failing():
+    raise RuntimeError("boom")
+
+
+def test_parallel_methods_take_slowest_time(monkeypatch):
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', True)
+    monkeypatch.setitem(KEY_CONFIG, 'method_timeouts', {'default': 5.0})
+    # Không gọi __init__ để khỏi kiểm tra Essentia/Docker
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+
+    started = time.monotonic()
+    outputs = detector._run_hybrid_methods([('A', _method('C', 0.3)), ('B', _method('G', 0.3)),
+                                            ('C', _method('D', 0.3)), ('D', _failing)])
+    elapsed = time.monotonic() - started
+
+    assert {name: out['key'] for name, out in outputs.items()} == {'A': 'C', 'B': 'G', 'C': 'D'}
+    assert elapsed < 0.8
+
+
+def test_timed_out_method_is_excluded(monkeypatch):
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', True)
+    monkeypatch.setitem(KEY_CONFIG, 'method_timeouts', {'default': 5.0, 'Slow': 0.2})
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+
+    outputs = detector._run_hybrid_methods([('Fast', _method('C', 0.0)), ('Slow', _method('G', 1.0))])
+
+    assert list(outputs) == ['Fast']
+
+
+def test_deadline_starts_when_method_runs(monkeypatch):
+    """Method phải xếp hàng trong pool không bị tính thời gian chờ vào timeout"""
+    import concurrent.futures
+    from src.ai import advanced_key_detector
+
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', True)
+    monkeypatch.setitem(KEY_CONFIG, 'method_timeouts', {'default': 0.5})
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(advanced_key_detector, '_hybrid_executor', executor)
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+
+    # Chạy nối tiếp trên một worker: B bắt đầu sau 0.3s và vẫn xong trong hạn của nó
+    outputs = detector._run_hybrid_methods([('A', _method('C', 0.3)), ('B', _method('G', 0.3))])
+    executor.shutdown()
+
+    assert list(outputs) == ['A', 'B']
+
+
+def test_sequential_mode(monkeypatch):
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', False)
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+
+    outputs = detector._run_hybrid_methods([('A', _method('C', 0.0)), ('B', _failing)])
+
+    assert list(outputs) == ['A']
+
+
+def _cascade_detector(margin):
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+    detector.use_gpu = False
+    detector.docker_available = False
+    detector.calls = []
+
+    def template_match(audio, sr):
+        detector.calls.append('template')
+        return {'key': 'A', 'scale': 'minor', 'confidence': 0.9, 'method': 'Improved Traditional'}, margin
+
+    def expensive(name):
+        def run(*args, **kwargs):
+            detector.calls.append(name)
+            return {'key': 'C', 'scale': 'major', 'confidence': 0.6}
+        return run
+
+    detector._template_match = template_match
+    detector._detect_with_vocals_specific = expensive('vocals')
+    detector._detect_with_enhanced_chroma = expensive('chroma')
+    detector._detect_with_beat_harmonic_analysis = expensive('beat')
+    return detector
+
+
+def test_cascade_exits_early_when_unambiguous(monkeypatch):
+    monkeypatch.setitem(KEY_CONFIG, 'cascade_margin', 0.1)
+    detector = _cascade_detector(margin=0.3)
+
+    result = detector._detect_with_hybrid(None, None, 22050, 'beat', mode='cascade')
+
+    assert result['path'] == 'cascade:template'
+    assert (result['key'], result['scale']) == ('A', 'minor')
+    assert detector.calls == ['template']
+    # Cùng thang confidence với voting đầy đủ: một phiếu Traditional Librosa
+    voted = detector._weighted_voting([{'key': 'A', 'scale': 'minor', 'confidence': 0.9,
+                                        'method': 'Traditional Librosa', 'weight': 0.3}])
+    assert result['confidence'] == pytest.approx(voted['confidence'])
+    assert result['method'] == 'Hybrid (Traditional Librosa)'
+
+
+def test_cascade_runs_expensive_methods_when_ambiguous(monkeypatch):
+    monkeypatch.setitem(KEY_CONFIG, 'cascade_margin', 0.1)
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', False)
+    detector = _cascade_detector(margin=0.02)
+
+    result = detector._detect_with_hybrid(None, None, 22050, 'beat', mode='cascade')
+
+    assert result['path'] == 'cascade:full'
+    # Template match không bị chạy lại
+    assert sorted(detector.calls) == ['beat', 'chroma', 'template', 'vocals']
+
+
+def test_failed_method_is_reported_and_not_cached(monkeypatch, tmp_path):
+    """Voting thiếu method (lỗi / quá hạn) không được lưu vào key cache"""
+    from src.ai import advanced_key_detector
+    from src.core.key_cache import KeyResultCache
+
+    monkeypatch.setitem(KEY_CONFIG, 'parallel', False)
+    cache = KeyResultCache(db_path=None, version='test')
+    monkeypatch.setattr(advanced_key_detector, 'get_key_cache', lambda: cache)
+    detector = _cascade_detector(margin=0.0)
+    detector.detect_key_array = lambda audio, sr, audio_type, audio_path=None, mode=None: \
+        detector._detect_with_hybrid(audio_path, audio, sr, audio_type, mode=mode)
+    path = tmp_path / "beat.wav"
+    path.write_bytes(b'beat')
+    key = cache.key_for(str(path), 'beat', 'full')
+
+    detector._detect_with_beat_harmonic_analysis = lambda *args: _failing()
+    result = detector.detect_key_cached(str(path), 'beat', audio=[0.0], sr=22050, mode='full')
+    assert result['excluded_methods'] == ['Beat Harmonic Analysis']
+    assert cache.get(key) is None
+
+    # Đủ method: được cache (mode không có '+gpu' / '+docker' vì detector không dùng)
+    detector._detect_with_beat_harmonic_analysis = lambda *args: {'key': 'C', 'scale': 'major', 'confidence': 0.6}
+    result = detector.detect_key_cached(str(path), 'beat', audio=[0.0], sr=22050, mode='full')
+    assert result['excluded_methods'] == []
+    assert cache.get(key) == result
+
+
+def test_ranged_miss_decodes_only_the_range(monkeypatch, tmp_path):
+    """Cache miss với start / end: chỉ decode đoạn [start, end), không decode cả file"""
+    from src.ai import advanced_key_detector
+
+    monkeypatch.setattr(advanced_key_detector, 'get_key_cache', lambda: None)
+    decoded = []
+
+    def load_range(path, start_time, end_time=None, sr=None, mono=True):
+        decoded.append((path, start_time, end_time, sr))
+        return [0.0], sr
+
+    def load_whole(*args, **kwargs):
+        raise AssertionError("whole file decoded")
+
+    monkeypatch.setattr(advanced_key_detector, 'load_audio_range', load_range)
+    monkeypatch.setattr(advanced_key_detector, 'load_audio', load_whole)
+    detector = _cascade_detector(margin=0.0)
+    detector.detect_key_array = lambda audio, sr, audio_type, audio_path=None, mode=None: \
+        {'key': 'C', 'scale': 'major', 'confidence': 0.6, 'method': 'Hybrid'}
+    path = str(tmp_path / "beat.wav")
+
+    result = detector.detect_key_cached(path, 'beat', start=15.0, end=45.0, mode='full')
+    assert result['key'] == 'C'
+    assert decoded == [(path, 15.0, 45.0, 22050)]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Key Cache - kết quả key theo nội dung file, LRU + SQLite, bỏ kết quả khi đổi phiên bản
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+
+from src.core import key_cache
+from src.core.key_cache import KeyResultCache, slice_key
+
+RESULT = {'key': 'A', 'scale': 'minor', 'confidence': np.float32(0.75), 'method': 'Hybrid', 'path': 'full'}
+
+
+def _beat(tmp_path, data=b'beat-bytes'):
+    path = tmp_path / "beat.wav"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_persists_across_instances(tmp_path):
+    db = str(tmp_path / "keys.sqlite")
+    path = _beat(tmp_path)
+
+    cache = KeyResultCache(db_path=db, version='v1')
+    key = cache.key_for(path, 'beat', 'full')
+    assert cache.get(key) is None
+    cache.put(key, RESULT)
+
+    reopened = KeyResultCache(db_path=db, version='v1')
+    result = reopened.get(reopened.key_for(path, 'beat', 'full'))
+    assert result == {'key': 'A', 'scale': 'minor', 'confidence': 0.75, 'method': 'Hybrid', 'path': 'full'}
+    # Bản copy: caller sửa kết quả không làm hỏng cache
+    result['key'] = 'C'
+    assert reopened.get(key)['key'] == 'A'
+
+
+def test_key_includes_type_mode_and_slice(tmp_path):
+    path = _beat(tmp_path)
+    cache = KeyResultCache(db_path=None, version='v1')
+    cache.put(cache.key_for(path, 'beat', 'full'), RESULT)
+
+    assert cache.get(cache.key_for(path, 'instrumental', 'full')) is None
+    assert cache.get(cache.key_for(path, 'beat', 'cascade')) is None
+    assert cache.get(cache.key_for(path, 'beat', 'full', 15.0, 45.0)) is None
+    assert slice_key() == 'full' and slice_key(15, 45) == '15.000-45.000' and slice_key(12) == '12.000-'
+
+
+def test_content_change_misses(tmp_path):
+    cache = KeyResultCache(db_path=None, version='v1')
+    path = _beat(tmp_path)
+    cache.put(cache.key_for(path, 'beat', 'full'), RESULT)
+
+    path = _beat(tmp_path, b'another beat')
+    assert cache.get(cache.key_for(path, 'beat', 'full')) is None
+    assert cache.key_for(str(tmp_path / "missing.wav"), 'beat', 'full') is None
+
+
+def test_version_change_invalidates(tmp_path, monkeypatch):
+    db = str(tmp_path / "keys.sqlite")
+    path = _beat(tmp_path)
+    cache = KeyResultCache(db_path=db)
+    key = cache.key_for(path, 'beat', 'full')
+    cache.put(key, RESULT)
+    assert cache.get(key) is not None
+
+    # Đổi cấu hình ảnh hưởng kết quả -> miss; đổi cấu hình chạy song song thì không
+    monkeypatch.setitem(key_cache.KEY_CONFIG, 'max_workers', 16)
+    assert cache.get(key) is not None
+    monkeypatch.setitem(key_cache.KEY_CONFIG, 'cascade_margin', 0.5)
+    assert cache.get(key) is None
+
+    monkeypatch.setattr(key_cache, 'KEY_ALGORITHM_VERSION', 999)
+    KeyResultCache(db_path=db)
+    monkeypatch.undo()
+    # Phiên bản mới đã xóa hàng cũ khỏi bảng
+    assert KeyResultCache(db_path=db).get(key) is None
+
+
+def test_lru_evicts_memory_but_keeps_store(tmp_path):
+    db = str(tmp_path / "keys.sqlite")
+    cache = KeyResultCache(db_path=db, max_entries=2, version='v1')
+    keys = [('digest%d' % i, 'beat', 'full', 'full') for i in range(3)]
+    for key in keys:
+        cache.put(key, RESULT)
+
+    assert len(cache._memory) == 2
+    assert keys[0] + ('v1',) not in cache._memory
+    assert cache.get(keys[0])['key'] == 'A'
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Key Scoring - ma trận 24 key khớp vòng lặp np.roll + np.corrcoef
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import pytest
+import torch
+
+from src.core.key_scoring import KEY_NAMES, PROFILE_SETS, KeyScorer
+
+
+def _loop_correlations(chroma, major, minor):
+    """Cách tính cũ: 12 lần roll + corrcoef cho mỗi mode"""
+    major_corr = [np.corrcoef(chroma, np.roll(major, i))[0, 1] for i in range(12)]
+    minor_corr = [np.corrcoef(chroma, np.roll(minor, i))[0, 1] for i in range(12)]
+    return np.array(major_corr + minor_corr)
+
+
+def test_matches_loop_for_every_profile_set():
+    rng = np.random.default_rng(0)
+    chroma = rng.random((5, 12))
+    scorer = KeyScorer(('krumhansl', 'temperley', 'albrecht'))
+    corr = scorer.correlations(chroma)
+
+    assert corr.shape == (5, 3, 24)
+    for n in range(5):
+        for s, name in enumerate(scorer.profiles):
+            major, minor = (np.array(p) for p in PROFILE_SETS[name])
+            assert np.allclose(corr[n, s], _loop_correlations(chroma[n], major, minor))
+
+
+def test_estimate_picks_rotated_profile():
+    scorer = KeyScorer()
+    major, minor = (np.array(p) for p in PROFILE_SETS['krumhansl'])
+    chroma = np.stack([np.roll(major, 7), np.roll(minor, 9)])
+
+    results = scorer.estimate_batch(chroma, 'Test')
+    assert (results[0]['key'], results[0]['scale']) == (KEY_NAMES[7], 'major')
+    assert (results[1]['key'], results[1]['scale']) == (KEY_NAMES[9], 'minor')
+    assert results[0]['confidence'] == pytest.approx(1.0)
+    # Độ chính xác float phụ thuộc BLAS: so key/scale chính xác, confidence gần đúng
+    single = scorer.estimate(chroma[0])
+    assert (single['key'], single['scale']) == (results[0]['key'], results[0]['scale'])
+    assert single['confidence'] == pytest.approx(results[0]['confidence'])
+    assert 'method' not in single
+
+
+def test_torch_matches_numpy():
+    rng = np.random.default_rng(1)
+    chroma = rng.random((3, 12))
+    scorer = KeyScorer(('krumhansl', 'temperley'))
+
+    assert np.allclose(scorer.correlations(torch.tensor(chroma, dtype=torch.float32)),
+                       scorer.correlations(chroma), atol=1e-5)
+
+
+def test_unknown_profile_set():
+    with pytest.raises(ValueError):
+        KeyScorer(('bach',))
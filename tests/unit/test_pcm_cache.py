@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test PCM Cache - cache PCM trên đĩa theo hash nội dung
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import soundfile as sf
+
+from src.core.pcm_cache import PCMCache
+
+
+def _write_tone(path, sr=22050, duration=1.0, freq=440.0):
+    t = np.linspace(0, duration, int(sr * duration), False)
+    sf.write(path, 0.5 * np.sin(2 * np.pi * freq * t), sr)
+
+
+def test_warm_lookup_skips_decode(tmp_path):
+    """Lần thứ hai đọc từ .npy, không gọi decoder"""
+    path = str(tmp_path / "beat.wav")
+    _write_tone(path)
+    cache = PCMCache(cache_dir=str(tmp_path / "pcm"), max_bytes=10 * 1024 * 1024)
+
+    calls = []
+
+    def decoder():
+        calls.append(1)
+        audio, sr = sf.read(path, dtype='float32')
+        return audio, sr
+
+    cold, _ = cache.get_or_decode(path, decoder, 22050)
+    warm, sr = cache.get_or_decode(path, decoder, 22050)
+
+    assert len(calls) == 1
+    assert sr == 22050
+    assert isinstance(warm, np.memmap)
+    assert np.array_equal(cold, warm)
+
+
+def test_same_content_shares_entry(tmp_path):
+    """Hai file cùng nội dung dùng chung một entry"""
+    a = str(tmp_path / "a.wav")
+    b = str(tmp_path / "b.wav")
+    _write_tone(a)
+    _write_tone(b)
+    cache = PCMCache(cache_dir=str(tmp_path / "pcm"), max_bytes=10 * 1024 * 1024)
+
+    assert cache.entry_path(a, 22050) == cache.entry_path(b, 22050)
+
+
+def test_float16_storage_returns_float32(tmp_path):
+    """Lưu float16 nhưng trả về float32"""
+    path = str(tmp_path / "beat.wav")
+    _write_tone(path)
+    cache = PCMCache(cache_dir=str(tmp_path / "pcm"), max_bytes=10 * 1024 * 1024, dtype='float16')
+
+    cache.store(path, 22050, np.ones(100, dtype=np.float32))
+    audio = cache.lookup(path, 22050)
+
+    assert audio.dtype == np.float32
+    assert os.path.getsize(cache.entry_path(path, 22050)) < 100 * 4
+
+
+def test_eviction_respects_max_bytes(tmp_path):
+    """Entry cũ nhất bị xoá khi thư mục vượt giới hạn"""
+    cache_dir = tmp_path / "pcm"
+    cache = PCMCache(cache_dir=str(cache_dir), max_bytes=10000)
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"beat{i}.wav")
+        _write_tone(path, freq=220.0 * (i + 1))
+        paths.append(path)
+        cache.store(path, 22050, np.zeros(1000, dtype=np.float32))
+        os.utime(cache.entry_path(path, 22050), (i, i))
+
+    cache.evict()
+
+    total = sum(f.stat().st_size for f in cache_dir.glob('*.npy'))
+    assert total <= 10000
+    assert cache.lookup(paths[0], 22050) is None
+    assert cache.lookup(paths[2], 22050) is not None
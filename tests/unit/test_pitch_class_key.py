@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Pitch Class Key - histogram pitch class + chấm 24 scale bằng _SCALE_MASKS
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import pytest
+
+from src.ai.advanced_key_detector import AdvancedKeyDetector, _SCALE_MASKS
+
+# Nốt của scale C major / A natural minor bắt đầu từ C4 (MIDI 60)
+C_MAJOR = np.array([60, 62, 64, 65, 67, 69, 71])
+A_MINOR = np.array([57, 59, 60, 62, 64, 65, 67])
+
+
+def _detector():
+    # Bỏ qua __init__ (key scorer, GPU, Docker): chỉ cần key_names
+    detector = AdvancedKeyDetector.__new__(AdvancedKeyDetector)
+    detector.key_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+    return detector
+
+
+def test_scale_masks_layout():
+    assert _SCALE_MASKS.shape == (24, 12)
+    assert np.all(_SCALE_MASKS.sum(axis=1) == 7)
+    assert np.flatnonzero(_SCALE_MASKS[0]).tolist() == [0, 2, 4, 5, 7, 9, 11]
+    assert np.flatnonzero(_SCALE_MASKS[12 + 9]).tolist() == [0, 2, 4, 5, 7, 9, 11]
+    # Mỗi minor dùng cùng tập nốt với major tương ứng (relative major = minor + 3 semitone)
+    for root in range(12):
+        assert np.array_equal(_SCALE_MASKS[12 + root], _SCALE_MASKS[(root + 3) % 12])
+
+
+def test_histogram_wraps_octaves():
+    midi = np.array([48.0, 60.0, 72.0, 59.6, 61.4, 71.2, -1.0])
+    histogram = AdvancedKeyDetector._pitch_class_histogram(midi)
+    assert histogram.shape == (12,) and histogram.dtype == np.float64
+    expected = np.zeros(12)
+    expected[0] = 4   # C2, C4, C5 và 59.6 làm tròn lên C4
+    expected[1] = 1   # 61.4 -> C#
+    expected[11] = 2  # 71.2 -> B4, -1 -> B (mod 12 không âm)
+    assert np.array_equal(histogram, expected)
+
+    weighted = AdvancedKeyDetector._pitch_class_histogram(np.array([57.0, 69.0, 64.0]),
+                                                         weights=np.array([0.5, 1.5, 2.0]))
+    assert weighted[9] == pytest.approx(2.0) and weighted[4] == pytest.approx(2.0)
+    assert weighted.sum() == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize('notes, key', [
+    (C_MAJOR, 'C'),
+    (C_MAJOR + 2, 'D'),
+    (C_MAJOR - 3 + 24, 'A'),
+    (C_MAJOR + 6 - 12, 'F#'),
+])
+def test_major_scale_picks_its_key(notes, key):
+    histogram = AdvancedKeyDetector._pitch_class_histogram(np.concatenate([notes, notes + 12]))
+    result = _detector()._analyze_key_from_pitch_classes(histogram)
+    assert (result['key'], result['scale']) == (key, 'major')
+    assert result['confidence'] == pytest.approx(1.0)
+
+
+def test_relative_minor_scores_like_major_and_ties_go_to_major():
+    # A natural minor cùng tập nốt với C major: minor tốt nhất là A, bằng điểm C major
+    histogram = AdvancedKeyDetector._pitch_class_histogram(A_MINOR)
+    scores = _SCALE_MASKS @ histogram
+    assert int(np.argmax(scores[:12])) == 0
+    assert int(np.argmax(scores[12:])) == 9
+    assert scores[12 + 9] == scores[0]
+
+    result = _detector()._analyze_key_from_pitch_classes(histogram)
+    assert (result['key'], result['scale']) == ('C', 'major')
+
+
+def test_confidence_is_in_scale_share():
+    # Thêm một nốt ngoài scale (C#): 7 / 8 trọng số nằm trong C major
+    histogram = AdvancedKeyDetector._pitch_class_histogram(np.append(C_MAJOR, 61))
+    result = _detector()._analyze_key_from_pitch_classes(histogram)
+    assert (result['key'], result['scale']) == ('C', 'major')
+    assert result['confidence'] == pytest.approx(7 / 8)
+
+
+def test_empty_histogram_returns_none():
+    detector = _detector()
+    assert detector._analyze_key_from_pitch_classes(np.zeros(12)) is None
+    empty = AdvancedKeyDetector._pitch_class_histogram(np.array([]))
+    assert empty.shape == (12,) and not empty.any()
+    assert detector._analyze_key_from_pitch_classes(empty) is None
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Pitch Tracker - F0 dùng chung, chế độ voiced-only và decimate
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+
+from src.core.feature_bank import FeatureBank
+from src.core.pitch_tracker import track_f0, voiced_runs
+
+
+def _phrase(sr=22050):
+    """0.5s im lặng, 1s nốt A3, 0.5s im lặng, 1s nốt E4"""
+    t = np.arange(sr) / sr
+    silence = np.zeros(sr // 2, dtype=np.float32)
+    return np.concatenate([silence, 0.5 * np.sin(2 * np.pi * 220.0 * t), silence,
+                           0.5 * np.sin(2 * np.pi * 329.63 * t)]).astype(np.float32)
+
+
+def test_voiced_runs():
+    mask = np.array([0, 1, 1, 0, 0, 1, 0, 1], dtype=bool)
+    assert voiced_runs(mask) == [(1, 3), (5, 6), (7, 8)]
+
+
+def test_voiced_mode_matches_full_on_voiced_frames():
+    audio = _phrase()
+    full = librosa.yin(audio, fmin=50, fmax=1000, sr=22050)
+    voiced = track_f0(audio, 22050, 50, 1000, mode='voiced')
+
+    assert voiced.shape == full.shape
+    kept = ~np.isnan(voiced)
+    assert 0 < kept.sum() < len(voiced)
+    assert np.allclose(voiced[kept], full[kept])
+    # Giữa khoảng im lặng giữa hai nốt (1.5s-2.0s) không chạy YIN; frame ở 1.5s
+    # (center=True) vẫn chứa năng lượng của nốt A3 nên lấy điểm giữa 1.75s
+    assert np.isnan(voiced[int(1.75 * 22050 / 512)])
+
+
+def test_decimated_mode_same_grid():
+    audio = _phrase()
+    f0 = track_f0(audio, 22050, 50, 1000, decimate=2)
+    full = librosa.yin(audio, fmin=50, fmax=1000, sr=22050)
+
+    assert f0.shape == full.shape
+    middle_of_a3 = int(1.0 * 22050 / 512)
+    assert abs(f0[middle_of_a3] - 220.0) < 5.0
+
+
+def test_feature_bank_memoizes_track():
+    bank = FeatureBank(_phrase(), 22050)
+    f0 = bank.f0(fmin=50, fmax=1000)
+
+    assert bank.f0(fmin=50.0, fmax=1000.0) is f0
+    assert bank.f0(fmin=50, fmax=1000, mode='voiced') is not f0
+    assert not f0.flags.writeable
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Shared Audio - truyền mảng giữa các process qua shared memory
+"""
+
+import os
+import sys
+import concurrent.futures
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+
+from src.core.shared_audio import SharedAudioBuffer, resolve_audio_buffer
+
+
+def _sum_in_worker(handle):
+    shared = SharedAudioBuffer.attach(handle)
+    try:
+        return float(shared.array.sum()), shared.array.flags.writeable
+    finally:
+        shared.close()
+
+
+def test_worker_reads_shared_array_by_name():
+    """Worker attach theo tên và đọc đúng dữ liệu, không nhận bản copy pickle"""
+    audio = np.linspace(-1, 1, 22050, dtype=np.float32)
+    with SharedAudioBuffer.from_array(audio, sr=22050) as shared:
+        handle = shared.handle()
+        assert set(handle) == {'name', 'shape', 'dtype', 'sr'}
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            total, writeable = executor.submit(_sum_in_worker, handle).result()
+
+        assert np.isclose(total, float(audio.sum()), atol=1e-3)
+        assert not writeable
+
+
+def test_stft_matrix_roundtrip():
+    """Ma trận complex (STFT) giữ nguyên dtype và shape"""
+    stft = (np.random.randn(1025, 40) + 1j * np.random.randn(1025, 40)).astype(np.complex64)
+    with SharedAudioBuffer.from_array(stft) as shared:
+        attached = SharedAudioBuffer.attach(shared.handle())
+        assert attached.array.dtype == np.complex64
+        assert np.array_equal(attached.array, stft)
+        attached.close()
+
+
+def test_resolve_audio_buffer_from_handle():
+    audio = np.ones(100, dtype=np.float32)
+    with SharedAudioBuffer.from_array(audio, sr=16000) as shared:
+        buffer = resolve_audio_buffer(shared.handle())
+        assert buffer.sr == 16000
+        assert np.array_equal(buffer.audio, audio)
+        del buffer
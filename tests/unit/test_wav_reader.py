@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test WAV Reader - memory-map PCM, RMS/ZCR theo block
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+from src.core.wav_reader import MappedWav, open_wav, frame_rms_zcr
+
+
+def _noisy_tone(sr=22050, duration=3.0):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sr * duration)) / sr
+    return (0.4 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def test_mapped_wav_matches_soundfile(tmp_path):
+    """Giá trị đọc qua memmap khớp soundfile cho 16/24 bit và float"""
+    audio = np.stack([_noisy_tone(), -_noisy_tone()], axis=1) * 0.5
+    for subtype, atol in (('PCM_16', 1e-4), ('PCM_24', 1e-6), ('FLOAT', 0)):
+        path = str(tmp_path / f"{subtype}.wav")
+        sf.write(path, audio, 22050, subtype=subtype)
+
+        wav = MappedWav(path)
+        expected, _ = sf.read(path, dtype='float32')
+
+        assert wav.sample_rate == 22050 and wav.channels == 2
+        assert wav.frames == len(expected)
+        assert np.allclose(wav.read_block(1000, 5000), expected[1000:5000].mean(axis=1), atol=atol)
+
+
+def test_frame_view_is_zero_copy(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    sf.write(path, _noisy_tone(), 22050, subtype='PCM_16')
+
+    view = MappedWav(path).frame_view(0, 100)
+    assert isinstance(view, np.memmap) or isinstance(view.base, np.memmap)
+
+
+def test_open_wav_rejects_other_formats(tmp_path):
+    path = str(tmp_path / "tone.flac")
+    sf.write(path, _noisy_tone(), 22050)
+    assert open_wav(path) is None
+
+
+def test_blockwise_features_match_librosa():
+    """RMS/ZCR theo block khớp librosa (center=True) với mọi kích thước block"""
+    audio = _noisy_tone()
+    expected_rms = librosa.feature.rms(y=audio, frame_length=2048, hop_length=512)[0]
+    expected_zcr = librosa.feature.zero_crossing_rate(audio, frame_length=2048, hop_length=512)[0]
+
+    for block_frames in (7, 2048):
+        rms, zcr = frame_rms_zcr(audio, 22050, 2048, 512, block_frames=block_frames)
+        assert len(rms) == len(expected_rms)
+        assert np.allclose(rms, expected_rms, atol=1e-5)
+        assert np.allclose(zcr[2:-2], expected_zcr[2:-2], atol=1e-3)
+
+
+def test_native_rate_wav_uses_detector_frame_grid(tmp_path):
+    """WAV 44.1kHz cho ra cùng số frame và RMS như bản 22.05kHz"""
+    audio = _noisy_tone(sr=44100)
+    path = str(tmp_path / "tone44k.wav")
+    sf.write(path, audio, 44100, subtype='FLOAT')
+
+    rms, _ = frame_rms_zcr(MappedWav(path), 22050, 2048, 512)
+    resampled = librosa.resample(audio, orig_sr=44100, target_sr=22050)
+    expected = librosa.feature.rms(y=resampled, frame_length=2048, hop_length=512)[0]
+
+    assert len(rms) == len(expected)
+    assert np.allclose(rms[2:-2], expected[2:-2], atol=5e-3)